@@ -0,0 +1,211 @@
+import argparse
+import hashlib
+import json
+import os
+import time
+import numpy as np
+
+from almacen_rostros import empaquetar_rostros, cargar_rostros_empaquetados, dividir_validacion, INDICE_FILENAME, MANIFEST_FILENAME
+
+# ===============================================================
+# --- AÑADIR PERSONA: ajuste rápido de la cabeza densa ---
+# ===============================================================
+# Las capas convolucionales se congelan y sus salidas (la última MaxPooling) se guardan
+# en disco por recorte (CARACTERISTICAS_FILENAME, float16). Al añadir una identidad
+# solo se calculan las características de los recortes nuevos y se entrena únicamente
+# Flatten -> Dense(256) -> Dropout -> Dense(n_clases) sobre todas las clases, partiendo
+# de los pesos actuales: las filas de las clases existentes se conservan y la softmax
+# crece hasta la nueva lista de clase_indices.json.
+
+CARACTERISTICAS_FILENAME = "caracteristicas_rostros.npy"
+INDICE_CARACTERISTICAS = "caracteristicas_rostros.json"
+EPOCAS_CABEZA = 30
+
+
+def separar_modelo(modelo):
+    """(extractor convolucional, capas de la cabeza) cortando el modelo en su capa Flatten."""
+    from tensorflow.keras.models import Model
+    from tensorflow.keras.layers import Flatten
+    corte = next((i for i, capa in enumerate(modelo.layers) if isinstance(capa, Flatten)), None)
+    if corte is None:
+        raise ValueError("❌ El modelo no tiene una capa Flatten: no se puede separar la cabeza densa.")
+    return Model(modelo.inputs, modelo.layers[corte].input), modelo.layers[corte:]
+
+def _huella_pesos(extractor):
+    h = hashlib.sha256()
+    for peso in extractor.get_weights():
+        h.update(np.ascontiguousarray(peso).tobytes())
+    return h.hexdigest()[:16]
+
+def _claves_recortes(dataset_dir, archivos):
+    """Identidad de cada recorte: ruta relativa + hash de su foto de origen (manifiesto)."""
+    try:
+        with open(os.path.join(dataset_dir, MANIFEST_FILENAME), 'r', encoding='utf-8') as f:
+            origen = json.load(f)["archivos"]
+    except (OSError, ValueError, KeyError):
+        origen = {}
+    claves = []
+    for rel in archivos:
+        rel = rel.replace(os.sep, "/")
+        claves.append(f"{rel}:{origen.get(rel, {}).get('hash', '')}")
+    return claves
+
+
+def actualizar_caracteristicas(extractor, dataset_dir, tam_lote=64, cancelar=None):
+    """Devuelve (características memmap, etiquetas, class_indices, recortes recalculados).
+    Solo pasan por las capas convolucionales los recortes que no estaban en la caché."""
+    empaquetar_rostros(dataset_dir)
+    datos, etiquetas, class_indices = cargar_rostros_empaquetados(dataset_dir)
+    with open(os.path.join(dataset_dir, INDICE_FILENAME), 'r', encoding='utf-8') as f:
+        claves = _claves_recortes(dataset_dir, json.load(f)["archivos"])
+
+    ruta = os.path.join(dataset_dir, CARACTERISTICAS_FILENAME)
+    ruta_indice = os.path.join(dataset_dir, INDICE_CARACTERISTICAS)
+    huella = _huella_pesos(extractor)
+    forma = tuple(int(v) for v in extractor.output_shape[1:])
+
+    previas, fila_previa = None, {}
+    if os.path.exists(ruta) and os.path.exists(ruta_indice):
+        with open(ruta_indice, 'r', encoding='utf-8') as f:
+            indice = json.load(f)
+        if indice.get("huella_pesos") == huella and tuple(indice.get("forma", ())) == forma:
+            previas = np.load(ruta, mmap_mode='r')
+            fila_previa = {clave: i for i, clave in enumerate(indice["claves"])}
+
+    tmp = ruta + ".tmp.npy"
+    nuevas = np.lib.format.open_memmap(tmp, mode='w+', dtype=np.float16, shape=(len(claves), *forma))
+    por_calcular = []
+    for i, clave in enumerate(claves):
+        if clave in fila_previa:
+            nuevas[i] = previas[fila_previa[clave]]
+        else:
+            por_calcular.append(i)
+    for inicio in range(0, len(por_calcular), tam_lote):
+        if cancelar is not None and cancelar.is_set():
+            del nuevas
+            os.remove(tmp)
+            return None, None, None, 0
+        idx = por_calcular[inicio:inicio + tam_lote]
+        nuevas[idx] = extractor.predict(datos[idx], batch_size=len(idx), verbose=0).astype(np.float16)
+    nuevas.flush()
+    del nuevas, previas
+    os.replace(tmp, ruta)
+    with open(ruta_indice, 'w', encoding='utf-8') as f:
+        json.dump({"huella_pesos": huella, "forma": list(forma), "claves": claves}, f, ensure_ascii=False)
+    return np.load(ruta, mmap_mode='r'), etiquetas, class_indices, len(por_calcular)
+
+
+def _construir_cabeza(capas_cabeza, forma, clases_anteriores, class_indices):
+    """Cabeza densa con los pesos actuales; la capa de salida se amplía a las clases nuevas.
+    La regularización (L2 y dropout) se copia del modelo: puede venir de barrido_hiperparametros.py."""
+    from tensorflow.keras.models import Model
+    from tensorflow.keras.layers import Input, Flatten, Dense, Dropout
+    from tensorflow.keras import regularizers
+
+    densas = [capa for capa in capas_cabeza if isinstance(capa, Dense)]
+    oculta_previa, salida_previa = densas[-2], densas[-1]
+    tasa_dropout = next((capa.rate for capa in capas_cabeza if isinstance(capa, Dropout)), 0.0)
+    regularizador = oculta_previa.kernel_regularizer
+    entrada = Input(shape=forma)
+    oculta = Dense(
+        oculta_previa.units, activation=oculta_previa.activation,
+        kernel_regularizer=regularizers.get(regularizers.serialize(regularizador)) if regularizador is not None else None,
+    )
+    salida = Dense(len(class_indices), activation='softmax')
+    cabeza = Model(entrada, salida(Dropout(tasa_dropout)(oculta(Flatten()(entrada)))))
+
+    oculta.set_weights(oculta_previa.get_weights())
+    W_prev, b_prev = salida_previa.get_weights()
+    W, b = salida.get_weights()
+    for clase, j_prev in clases_anteriores.items():
+        if clase in class_indices:
+            W[:, class_indices[clase]] = W_prev[:, j_prev]
+            b[class_indices[clase]] = b_prev[j_prev]
+    salida.set_weights([W, b])
+    return cabeza
+
+
+def ajustar_nueva_persona(modelo, clases_anteriores, dataset_dir, epocas=EPOCAS_CABEZA, informar=print, cancelar=None):
+    """Reentrena solo la cabeza densa con las clases actuales de dataset_dir.
+    Devuelve (modelo completo, class_indices, informe) o None si se canceló."""
+    from tensorflow.keras.models import Model
+    from tensorflow.keras.callbacks import EarlyStopping, Callback
+    from tensorflow.keras.utils import to_categorical
+
+    inicio = time.perf_counter()
+    extractor, capas_cabeza = separar_modelo(modelo)
+    X, etiquetas, class_indices, recalculadas = actualizar_caracteristicas(extractor, dataset_dir, cancelar=cancelar)
+    if X is None:
+        return None
+    t_caracteristicas = time.perf_counter() - inicio
+    informar(f"Características: {recalculadas} recortes nuevos de {len(etiquetas)} ({t_caracteristicas:.1f}s)")
+
+    cabeza = _construir_cabeza(capas_cabeza, X.shape[1:], clases_anteriores, class_indices)
+    cabeza.compile(optimizer='adam', loss='categorical_crossentropy', metrics=['accuracy'])
+
+    train_idx, val_idx = dividir_validacion(etiquetas)
+    train_idx, val_idx = np.sort(train_idx), np.sort(val_idx)
+    num_clases = len(class_indices)
+    x_train, y_train = X[train_idx].astype(np.float32), to_categorical(etiquetas[train_idx], num_clases)
+    x_val, y_val = X[val_idx].astype(np.float32), to_categorical(etiquetas[val_idx], num_clases)
+    # Las identidades nuevas suelen tener pocas fotos: se compensa con pesos por clase
+    conteos = np.bincount(etiquetas[train_idx], minlength=num_clases)
+    pesos = {c: len(train_idx) / (num_clases * n) for c, n in enumerate(conteos) if n > 0}
+
+    class Cancelacion(Callback):
+        def on_train_batch_end(self, batch, logs=None):
+            if cancelar is not None and cancelar.is_set():
+                self.model.stop_training = True
+
+    t0 = time.perf_counter()
+    cabeza.fit(
+        x_train, y_train, validation_data=(x_val, y_val) if len(val_idx) else None, epochs=epocas, batch_size=32,
+        class_weight=pesos, callbacks=[EarlyStopping(patience=5, restore_best_weights=True), Cancelacion()], verbose=0,
+    )
+    if cancelar is not None and cancelar.is_set():
+        return None
+    t_cabeza = time.perf_counter() - t0
+
+    x = extractor.output
+    for capa in cabeza.layers[1:]:
+        x = capa(x)
+    modelo_completo = Model(extractor.inputs, x)
+
+    informe = {
+        "clases": num_clases,
+        "clases_nuevas": sorted(set(class_indices) - set(clases_anteriores)),
+        "recortes": int(len(etiquetas)),
+        "recortes_recalculados": int(recalculadas),
+        "caracteristicas_s": round(t_caracteristicas, 2),
+        "entrenamiento_cabeza_s": round(t_cabeza, 2),
+        "total_s": round(time.perf_counter() - inicio, 2),
+    }
+    if len(val_idx):
+        pred = np.argmax(cabeza.predict(x_val, verbose=0), axis=1)
+        aciertos = pred == etiquetas[val_idx]
+        existentes = np.isin(etiquetas[val_idx], [class_indices[c] for c in clases_anteriores if c in class_indices])
+        informe["val_acc"] = round(float(aciertos.mean()), 4)
+        if existentes.any():
+            informe["val_acc_clases_existentes"] = round(float(aciertos[existentes].mean()), 4)
+        if (~existentes).any():
+            informe["val_acc_clases_nuevas"] = round(float(aciertos[~existentes].mean()), 4)
+    return modelo_completo, class_indices, informe
+
+
+if __name__ == "__main__":
+    from main import (
+        cargar_modelo_entrenado, crear_dataset_rostros,
+        MODELO_FILENAME, CLASSES_FILENAME, INPUT_DIR, OUTPUT_DIR, NUM_WORKERS_DATASET,
+    )
+
+    parser = argparse.ArgumentParser(description="Añade identidades nuevas reentrenando solo la cabeza densa.")
+    parser.add_argument("--epocas", type=int, default=EPOCAS_CABEZA)
+    args = parser.parse_args()
+
+    crear_dataset_rostros(INPUT_DIR, OUTPUT_DIR, num_workers=NUM_WORKERS_DATASET)
+    modelo, clases_anteriores = cargar_modelo_entrenado(MODELO_FILENAME, CLASSES_FILENAME)
+    modelo, class_indices, informe = ajustar_nueva_persona(modelo, clases_anteriores, OUTPUT_DIR, args.epocas)
+    modelo.save(MODELO_FILENAME)
+    with open(CLASSES_FILENAME, 'w') as f:
+        json.dump(class_indices, f)
+    print(json.dumps(informe, ensure_ascii=False, indent=2))
@@ -0,0 +1,232 @@
+import numpy as np
+import os
+import json
+import time
+import hashlib
+from PIL import Image
+from tensorflow.keras.utils import Sequence, to_categorical
+
+# ===============================================================
+# --- ALMACÉN EMPAQUETADO DE ROSTROS (uint8 + memmap) ---
+# ===============================================================
+# Los recortes de dataset_rostros/ se decodifican una sola vez y se guardan en un
+# único arreglo contiguo (N, 150, 150, 3) uint8. Durante el entrenamiento se abre
+# con memmap, así cada época evita abrir y decodificar miles de JPEG/PNG.
+
+ALMACEN_FILENAME = "rostros_empaquetados.npy"
+INDICE_FILENAME = "rostros_empaquetados.json"
+EXTENSIONES_VALIDAS = ('.png', '.jpg', '.jpeg', '.bmp', '.ppm', '.tif', '.tiff')
+TAM_ROSTRO = 150
+MANIFEST_FILENAME = ".manifest_rostros.json"
+
+
+def huella_dataset(dataset_dir):
+    """Huella del manifiesto del dataset; si cambia, el almacén debe regenerarse.
+    Se calcula sobre su forma canónica (claves ordenadas): crear_dataset_rostros no
+    escribe las entradas siempre en el mismo orden y eso no es un cambio del dataset."""
+    path = os.path.join(dataset_dir, MANIFEST_FILENAME)
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return None
+    canonico = json.dumps(manifest, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(canonico.encode('utf-8')).hexdigest()
+
+def _listar_recortes(dataset_dir):
+    """Lista (clase, ruta) en el mismo orden que flow_from_directory (clases y archivos ordenados)."""
+    clases = sorted(c for c in os.listdir(dataset_dir) if os.path.isdir(os.path.join(dataset_dir, c)))
+    archivos = []
+    for clase in clases:
+        clase_dir = os.path.join(dataset_dir, clase)
+        for nombre in sorted(os.listdir(clase_dir)):
+            if nombre.lower().endswith(EXTENSIONES_VALIDAS):
+                archivos.append((clase, os.path.join(clase_dir, nombre)))
+    return clases, archivos
+
+
+def empaquetar_rostros(dataset_dir, destino_dir=None, forzar=False):
+    """Decodifica todos los recortes y los escribe en ALMACEN_FILENAME junto con su índice.
+    Si el almacén ya corresponde al dataset actual no se vuelve a generar.
+    Devuelve la ruta del índice."""
+    destino_dir = destino_dir or dataset_dir
+    almacen_path = os.path.join(destino_dir, ALMACEN_FILENAME)
+    indice_path = os.path.join(destino_dir, INDICE_FILENAME)
+
+    huella = huella_dataset(dataset_dir)
+    if not forzar and huella and os.path.exists(almacen_path) and os.path.exists(indice_path):
+        with open(indice_path, 'r', encoding='utf-8') as f:
+            if json.load(f).get("huella") == huella:
+                return indice_path
+
+    clases, archivos = _listar_recortes(dataset_dir)
+    class_indices = {clase: i for i, clase in enumerate(clases)}
+
+    tmp_path = almacen_path + ".tmp.npy"
+    datos = np.lib.format.open_memmap(
+        tmp_path, mode='w+', dtype=np.uint8, shape=(len(archivos), TAM_ROSTRO, TAM_ROSTRO, 3)
+    )
+    etiquetas = []
+    rutas = []
+    n = 0
+    for clase, ruta in archivos:
+        try:
+            img = Image.open(ruta).convert('RGB')
+            if img.size != (TAM_ROSTRO, TAM_ROSTRO):
+                img = img.resize((TAM_ROSTRO, TAM_ROSTRO), Image.NEAREST)
+            datos[n] = np.asarray(img, dtype=np.uint8)
+        except Exception as e:
+            print(f"❌ Error empaquetando {ruta}: {e}")
+            continue
+        etiquetas.append(class_indices[clase])
+        rutas.append(os.path.relpath(ruta, dataset_dir))
+        n += 1
+    datos.flush()
+    del datos
+
+    # Si hubo errores se recorta el arreglo a las n filas válidas
+    if n != len(archivos):
+        completo = np.load(tmp_path, mmap_mode='r')
+        recortado = np.lib.format.open_memmap(
+            almacen_path + ".tmp2.npy", mode='w+', dtype=np.uint8, shape=(n, TAM_ROSTRO, TAM_ROSTRO, 3)
+        )
+        recortado[:] = completo[:n]
+        recortado.flush()
+        del completo, recortado
+        os.replace(almacen_path + ".tmp2.npy", tmp_path)
+    os.replace(tmp_path, almacen_path)
+
+    indice = {
+        "huella": huella,
+        "class_indices": class_indices,
+        "etiquetas": etiquetas,
+        "archivos": rutas,
+    }
+    with open(indice_path, 'w', encoding='utf-8') as f:
+        json.dump(indice, f, ensure_ascii=False)
+    return indice_path
+
+
+def cargar_rostros_empaquetados(destino_dir):
+    """Abre el almacén en modo memmap (solo lectura). Devuelve (datos, etiquetas, class_indices)."""
+    with open(os.path.join(destino_dir, INDICE_FILENAME), 'r', encoding='utf-8') as f:
+        indice = json.load(f)
+    datos = np.load(os.path.join(destino_dir, ALMACEN_FILENAME), mmap_mode='r')
+    etiquetas = np.asarray(indice["etiquetas"], dtype=np.int64)
+    return datos, etiquetas, indice["class_indices"]
+
+
+def dividir_validacion(etiquetas, validation_split=0.2):
+    """Separa índices de entrenamiento y validación por clase, igual que
+    ImageDataGenerator(validation_split): el primer tramo de cada clase es validación."""
+    train_idx, val_idx = [], []
+    for clase in np.unique(etiquetas):
+        idx = np.flatnonzero(etiquetas == clase)
+        corte = int(validation_split * len(idx))
+        val_idx.extend(idx[:corte])
+        train_idx.extend(idx[corte:])
+    return np.asarray(train_idx), np.asarray(val_idx)
+
+
+class SecuenciaRostros(Sequence):
+    """Alimenta al modelo Keras por lotes desde el almacén memmap.
+    Si se pasa un ImageDataGenerator, aplica sus transformaciones aleatorias a cada rostro."""
+
+    def __init__(self, datos, etiquetas, indices, num_clases, batch_size=32, shuffle=True, datagen=None, **kwargs):
+        super().__init__(**kwargs)
+        self.datos = datos
+        self.etiquetas = etiquetas
+        self.indices = np.array(indices)
+        self.num_clases = num_clases
+        self.batch_size = batch_size
+        self.shuffle = shuffle
+        self.datagen = datagen
+        self.samples = len(self.indices)
+        self.on_epoch_end()
+
+    def __len__(self):
+        return int(np.ceil(self.samples / self.batch_size))
+
+    def __getitem__(self, i):
+        lote = self.indices[i * self.batch_size:(i + 1) * self.batch_size]
+        # Lectura ordenada: accesos más secuenciales sobre el memmap
+        orden = np.argsort(lote)
+        # uint8 tal cual: el modelo escala a [0, 1] en su grafo
+        x = self.datos[lote[orden]]
+        if self.datagen is not None:
+            x = x.astype(np.float32)
+            for j in range(len(x)):
+                x[j] = self.datagen.random_transform(x[j])
+        y = to_categorical(self.etiquetas[lote[orden]], num_classes=self.num_clases)
+        return x, y
+
+    def on_epoch_end(self):
+        if self.shuffle:
+            np.random.shuffle(self.indices)
+
+
+def crear_secuencias(dataset_dir, datagen=None, batch_size=32, validation_split=0.2):
+    """Empaqueta (si hace falta) y devuelve (train_seq, val_seq, class_indices)."""
+    empaquetar_rostros(dataset_dir)
+    datos, etiquetas, class_indices = cargar_rostros_empaquetados(dataset_dir)
+    train_idx, val_idx = dividir_validacion(etiquetas, validation_split)
+    num_clases = len(class_indices)
+    train_seq = SecuenciaRostros(datos, etiquetas, train_idx, num_clases, batch_size, shuffle=True, datagen=datagen)
+    val_seq = SecuenciaRostros(datos, etiquetas, val_idx, num_clases, batch_size, shuffle=False)
+    return train_seq, val_seq, class_indices
+
+
+# ===============================================================
+# --- MEDICIÓN: tiempo por época (directorio vs. almacén) ---
+# ===============================================================
+
+def medir_tiempo_por_epoca(dataset_dir, epocas=3):
+    """Entrena el mismo modelo con flow_from_directory y con el almacén memmap
+    e imprime el tiempo medio por época de cada uno."""
+    from tensorflow.keras.preprocessing.image import ImageDataGenerator
+    from tensorflow.keras.callbacks import Callback
+    from main import construir_modelo_cnn
+
+    class Cronometro(Callback):
+        def __init__(self):
+            super().__init__()
+            self.tiempos = []
+        def on_epoch_begin(self, epoch, logs=None):
+            self._inicio = time.perf_counter()
+        def on_epoch_end(self, epoch, logs=None):
+            self.tiempos.append(time.perf_counter() - self._inicio)
+
+    aumentos = dict(rotation_range=20, zoom_range=0.2, horizontal_flip=True)
+
+    # 1) Generador original (decodifica JPEG/PNG en cada época)
+    datagen = ImageDataGenerator(validation_split=0.2, **aumentos)
+    train_gen = datagen.flow_from_directory(
+        dataset_dir, target_size=(150, 150), batch_size=32, class_mode='categorical', subset="training"
+    )
+    val_gen = datagen.flow_from_directory(
+        dataset_dir, target_size=(150, 150), batch_size=32, class_mode='categorical', subset="validation"
+    )
+    cron_dir = Cronometro()
+    modelo = construir_modelo_cnn(len(train_gen.class_indices))
+    modelo.fit(train_gen, validation_data=val_gen, epochs=epocas, callbacks=[cron_dir], verbose=0)
+
+    # 2) Almacén empaquetado (memmap uint8)
+    t0 = time.perf_counter()
+    empaquetar_rostros(dataset_dir, forzar=True)
+    t_empaquetado = time.perf_counter() - t0
+    train_seq, val_seq, class_indices = crear_secuencias(dataset_dir, datagen=ImageDataGenerator(**aumentos))
+    cron_mm = Cronometro()
+    modelo = construir_modelo_cnn(len(class_indices))
+    modelo.fit(train_seq, validation_data=val_seq, epochs=epocas, callbacks=[cron_mm], verbose=0)
+
+    # Se descarta la primera época (incluye calentamiento de TensorFlow)
+    def media(t): return float(np.mean(t[1:] if len(t) > 1 else t))
+    t_dir, t_mm = media(cron_dir.tiempos), media(cron_mm.tiempos)
+    print(f"[ALMACÉN] Empaquetado único: {t_empaquetado:.1f}s ({len(train_seq.datos)} rostros)")
+    print(f"[ALMACÉN] flow_from_directory: {t_dir:.2f}s/época")
+    print(f"[ALMACÉN] memmap uint8:        {t_mm:.2f}s/época ({(t_dir - t_mm) / t_dir * 100:.1f}% menos)")
+    return {"directorio_s": t_dir, "memmap_s": t_mm, "empaquetado_s": t_empaquetado}
+
+
+if __name__ == "__main__":
+    medir_tiempo_por_epoca("./dataset_rostros/")
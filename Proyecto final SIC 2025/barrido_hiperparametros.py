@@ -0,0 +1,166 @@
+import argparse
+import csv
+import itertools
+import json
+import os
+import random
+import time
+import numpy as np
+
+# ===============================================================
+# --- BARRIDO DE HIPERPARÁMETROS EN PARALELO ---
+# ===============================================================
+# Entrena varias configuraciones (tasa de aprendizaje, peso L2, dropout e intensidad del
+# aumento de datos) en procesos 'spawn' independientes. Cada proceso limita los hilos
+# intra/inter-op de TensorFlow a su parte de los núcleos, así N procesos no compiten
+# por la CPU. El dataset se empaqueta una vez (almacén uint8) y cada proceso lo abre
+# con memmap de solo lectura: todos comparten las mismas páginas en memoria.
+# Poda por mediana: desde la época EPOCA_MIN_PODA, una configuración cuya val_accuracy
+# queda por debajo de la mediana de las demás en la misma época se detiene.
+
+RESULTADOS_FILENAME = "barrido_hiperparametros.csv"
+ESPACIO = {
+    "tasa_aprendizaje": [1e-3, 3e-4, 1e-4],
+    "peso_l2": [1e-3, 1e-4],
+    "dropout": [0.3, 0.5],
+    "aumento": [0.0, 0.5, 1.0],
+}
+EPOCAS_BARRIDO = 20
+EPOCA_MIN_PODA = 3
+MIN_RIVALES_PODA = 3
+
+
+def _iniciar_worker(hilos_intra, hilos_inter):
+    """Se ejecuta en cada proceso antes de que TensorFlow cree sus pools de hilos."""
+    os.environ["OMP_NUM_THREADS"] = str(hilos_intra)
+    import tensorflow as tf
+    tf.config.threading.set_intra_op_parallelism_threads(hilos_intra)
+    tf.config.threading.set_inter_op_parallelism_threads(hilos_inter)
+
+
+def crear_poda(historial, lock, epoca_min=EPOCA_MIN_PODA, min_rivales=MIN_RIVALES_PODA):
+    """Callback que registra val_accuracy por época en `historial` (dict compartido entre
+    procesos) y detiene fit() si queda por debajo de la mediana de las demás configuraciones."""
+    from tensorflow.keras.callbacks import Callback
+
+    class PodaMediana(Callback):
+        podada_en = None
+
+        def on_epoch_end(self, epoch, logs=None):
+            acc = (logs or {}).get("val_accuracy")
+            if acc is None:
+                return
+            with lock:
+                rivales = historial.get(epoch, [])
+                historial[epoch] = rivales + [float(acc)]
+            if epoch + 1 >= epoca_min and len(rivales) >= min_rivales and acc < np.median(rivales):
+                self.podada_en = epoch + 1
+                self.model.stop_training = True
+
+    return PodaMediana()
+
+
+def entrenar_configuracion(tarea):
+    """Entrena una configuración en el proceso actual y devuelve su fila de resultados."""
+    dataset_dir, config, epocas, semilla, historial, lock = tarea
+    import tensorflow as tf
+    from tensorflow.keras.preprocessing.image import ImageDataGenerator
+    from almacen_rostros import cargar_rostros_empaquetados, dividir_validacion, SecuenciaRostros
+    from main import construir_modelo_cnn
+
+    tf.keras.utils.set_random_seed(semilla)
+    datos, etiquetas, class_indices = cargar_rostros_empaquetados(dataset_dir)
+    train_idx, val_idx = dividir_validacion(etiquetas)
+    num_clases = len(class_indices)
+    aumento = config["aumento"]
+    datagen = None
+    if aumento > 0:
+        datagen = ImageDataGenerator(rotation_range=20 * aumento, zoom_range=0.2 * aumento, horizontal_flip=True)
+    train_seq = SecuenciaRostros(datos, etiquetas, train_idx, num_clases, 32, shuffle=True, datagen=datagen)
+    val_seq = SecuenciaRostros(datos, etiquetas, val_idx, num_clases, 32, shuffle=False)
+
+    modelo = construir_modelo_cnn(num_clases, config["tasa_aprendizaje"], config["peso_l2"], config["dropout"])
+    poda = crear_poda(historial, lock)
+    inicio = time.perf_counter()
+    historia = modelo.fit(train_seq, validation_data=val_seq, epochs=epocas, callbacks=[poda], verbose=0)
+    segundos = time.perf_counter() - inicio
+    tf.keras.backend.clear_session()
+
+    val_acc = historia.history.get("val_accuracy", [float("nan")])
+    val_loss = historia.history.get("val_loss", [float("nan")])
+    mejor = int(np.nanargmax(val_acc)) if not np.all(np.isnan(val_acc)) else 0
+    return {
+        **config,
+        "mejor_val_accuracy": round(float(val_acc[mejor]), 4),
+        "val_loss_en_mejor": round(float(val_loss[mejor]), 4),
+        "mejor_epoca": mejor + 1,
+        "epocas": len(val_acc),
+        "podada": poda.podada_en is not None,
+        "segundos": round(segundos, 1),
+        "pid": os.getpid(),
+    }
+
+
+def generar_configuraciones(espacio=ESPACIO, maximo=None, semilla=0):
+    claves = list(espacio)
+    configs = [dict(zip(claves, valores)) for valores in itertools.product(*(espacio[c] for c in claves))]
+    if maximo is not None and maximo < len(configs):
+        configs = random.Random(semilla).sample(configs, maximo)
+    return configs
+
+
+def ejecutar_barrido(dataset_dir, configs, num_workers, epocas=EPOCAS_BARRIDO, semilla=0, salida=RESULTADOS_FILENAME):
+    from almacen_rostros import empaquetar_rostros
+    from main import contexto_procesos
+
+    # Una única copia preprocesada: los workers solo la leen
+    empaquetar_rostros(dataset_dir)
+    nucleos = os.cpu_count() or 1
+    num_workers = max(1, min(num_workers, len(configs)))
+    hilos_intra = max(1, nucleos // num_workers)
+    hilos_inter = 1 if hilos_intra < 4 else 2
+    print(f"[BARRIDO] {len(configs)} configuraciones, {num_workers} procesos x {hilos_intra} hilos (intra) / {hilos_inter} (inter)")
+
+    ctx = contexto_procesos()
+    resultados = []
+    inicio = time.perf_counter()
+    with ctx.Manager() as gestor:
+        historial, lock = gestor.dict(), gestor.Lock()
+        tareas = [(dataset_dir, config, epocas, semilla, historial, lock) for config in configs]
+        with ctx.Pool(processes=num_workers, initializer=_iniciar_worker, initargs=(hilos_intra, hilos_inter)) as pool:
+            for fila in pool.imap_unordered(entrenar_configuracion, tareas):
+                resultados.append(fila)
+                estado = f"podada en época {fila['epocas']}" if fila["podada"] else f"{fila['epocas']} épocas"
+                print(f"[BARRIDO] {len(resultados)}/{len(configs)} | val_acc {fila['mejor_val_accuracy']:.4f} | {estado} | "
+                      f"{json.dumps({c: fila[c] for c in ESPACIO})}")
+    total = time.perf_counter() - inicio
+
+    resultados.sort(key=lambda f: (-f["mejor_val_accuracy"], f["val_loss_en_mejor"]))
+    for posicion, fila in enumerate(resultados, 1):
+        fila["puesto"] = posicion
+    columnas = ["puesto", *ESPACIO, "mejor_val_accuracy", "val_loss_en_mejor", "mejor_epoca", "epocas", "podada", "segundos", "pid"]
+    with open(salida, 'w', newline='', encoding='utf-8') as f:
+        escritor = csv.DictWriter(f, fieldnames=columnas)
+        escritor.writeheader()
+        escritor.writerows(resultados)
+    print(f"[BARRIDO] Total: {total:.1f}s. Podadas: {sum(f['podada'] for f in resultados)}/{len(resultados)}. Tabla: {salida}")
+    return resultados
+
+
+if __name__ == "__main__":
+    from main import OUTPUT_DIR
+
+    parser = argparse.ArgumentParser(description="Barrido de hiperparámetros en procesos paralelos con poda por mediana.")
+    parser.add_argument("--workers", type=int, default=max(1, (os.cpu_count() or 1) // 4))
+    parser.add_argument("--epocas", type=int, default=EPOCAS_BARRIDO)
+    parser.add_argument("--max-configs", type=int, help="Muestra aleatoria de la rejilla completa")
+    parser.add_argument("--semilla", type=int, default=0)
+    parser.add_argument("--salida", default=RESULTADOS_FILENAME)
+    args = parser.parse_args()
+
+    configs = generar_configuraciones(maximo=args.max_configs, semilla=args.semilla)
+    resultados = ejecutar_barrido(OUTPUT_DIR, configs, args.workers, args.epocas, args.semilla, args.salida)
+    for fila in resultados[:10]:
+        print(f"{fila['puesto']:>3}. val_acc {fila['mejor_val_accuracy']:.4f} | lr {fila['tasa_aprendizaje']:g} | "
+              f"l2 {fila['peso_l2']:g} | dropout {fila['dropout']} | aumento {fila['aumento']} | "
+              f"{'podada' if fila['podada'] else 'completa'} ({fila['epocas']} épocas)")
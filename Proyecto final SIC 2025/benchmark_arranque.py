@@ -0,0 +1,84 @@
+import time
+_INICIO = time.perf_counter()
+
+import argparse
+import os
+import sys
+
+from metricas_latencia import anadir_argumento_salida, guardar_informe
+
+# ===============================================================
+# --- BENCHMARK DE ARRANQUE ---
+# ===============================================================
+# Mide, en un proceso nuevo, el tiempo hasta que la ventana se muestra y el tiempo
+# hasta la primera predicción (cargar modelo + detectar y clasificar una imagen).
+# Como en la app, tras mostrar la ventana se lanza precalentar() (detector, TensorFlow y
+# clasificador con su predicción de prueba); "Solo Cargar Modelo" reutiliza lo precargado.
+# Con --max-ventana / --max-prediccion termina con código 1 si se supera el límite,
+# para detectar regresiones.
+
+
+def _primera_imagen(directorio):
+    for raiz, _, archivos in sorted(os.walk(directorio)):
+        for nombre in sorted(archivos):
+            if nombre.lower().endswith((".jpg", ".jpeg", ".png")):
+                return os.path.join(raiz, nombre)
+    return None
+
+
+def medir_arranque(imagen):
+    import tkinter as tk
+    import main
+
+    t_import = time.perf_counter() - _INICIO
+    root = tk.Tk()
+    app = main.DeteccionRostrosApp(root)
+    root.update()
+    t_ventana = time.perf_counter() - _INICIO
+    # En la app lo dispara master.after(200, ...): update() solo lo ejecuta si ya venció,
+    # así que se lanza aquí; precalentar() ignora la segunda llamada
+    app.precalentar()
+
+    # Primera predicción: mismo camino que el botón "Solo Cargar Modelo" + "Analizar Imagen"
+    exito, mensaje, _ = app.cargar_o_entrenar_modelo(load_only=True)
+    if not exito:
+        raise RuntimeError(mensaje)
+    t_modelo = time.perf_counter() - _INICIO
+    status, resultado, _ = app.detectar_y_clasificar(imagen)
+    if status == "ERROR":
+        raise RuntimeError(resultado)
+    t_prediccion = time.perf_counter() - _INICIO
+    root.destroy()
+
+    return {
+        "importar_main_s": round(t_import, 3),
+        "hasta_ventana_s": round(t_ventana, 3),
+        "hasta_modelo_cargado_s": round(t_modelo, 3),
+        "hasta_primera_prediccion_s": round(t_prediccion, 3),
+        "imagen": imagen,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Tiempo hasta la ventana y hasta la primera predicción.")
+    parser.add_argument("--imagen", help="Imagen para la primera predicción (por defecto, la primera de ./train/)")
+    anadir_argumento_salida(parser)
+    parser.add_argument("--max-ventana", type=float, help="Límite en segundos para mostrar la ventana")
+    parser.add_argument("--max-prediccion", type=float, help="Límite en segundos para la primera predicción")
+    args = parser.parse_args()
+
+    imagen = args.imagen or _primera_imagen("./train/")
+    if imagen is None:
+        print("❌ No hay imagen para medir la primera predicción.", file=sys.stderr)
+        sys.exit(2)
+
+    informe = medir_arranque(imagen)
+    guardar_informe(informe, args.salida)
+
+    regresion = (
+        (args.max_ventana is not None and informe["hasta_ventana_s"] > args.max_ventana)
+        or (args.max_prediccion is not None and informe["hasta_primera_prediccion_s"] > args.max_prediccion)
+    )
+    if regresion:
+        print("❌ Regresión de arranque: se superó el límite configurado.", file=sys.stderr)
+        sys.exit(1)
@@ -0,0 +1,58 @@
+import argparse
+import json
+import time
+import tracemalloc
+import numpy as np
+from PIL import Image
+
+from main import cargar_imagen_reducida, LADO_MAX_DETECCION
+from reconocimiento_lote import listar_fuentes
+
+# ===============================================================
+# --- BENCHMARK DE DECODIFICACIÓN (completa vs. reducida) ---
+# ===============================================================
+# Compara, por imagen, el tiempo y la memoria pico de decodificar a resolución
+# completa (camino anterior) frente a la decodificación reducida con draft JPEG.
+
+
+def _medir(funcion):
+    tracemalloc.start()
+    inicio = time.perf_counter()
+    resultado = funcion()
+    segundos = time.perf_counter() - inicio
+    _, pico = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return resultado, segundos, pico
+
+def comparar_decodificacion(fuentes, lado_max=LADO_MAX_DETECCION):
+    filas = []
+    for fuente in fuentes:
+        completa, t_completa, pico_completa = _medir(lambda: np.array(Image.open(fuente).convert('RGB')))
+        reducida, t_reducida, pico_reducida = _medir(lambda: cargar_imagen_reducida(fuente, lado_max)[0])
+        filas.append({
+            "fuente": fuente,
+            "tam_original": [int(completa.shape[1]), int(completa.shape[0])],
+            "tam_reducido": [int(reducida.shape[1]), int(reducida.shape[0])],
+            "ms_completa": round(t_completa * 1000, 2),
+            "ms_reducida": round(t_reducida * 1000, 2),
+            # Buffer del arreglo decodificado (la memoria interna de PIL no la registra tracemalloc)
+            "mb_pico_completa": round(max(pico_completa, completa.nbytes) / 2**20, 2),
+            "mb_pico_reducida": round(max(pico_reducida, reducida.nbytes) / 2**20, 2),
+        })
+    resumen = {
+        "imagenes": len(filas),
+        "ms_medio_completa": round(float(np.mean([f["ms_completa"] for f in filas])), 2) if filas else None,
+        "ms_medio_reducida": round(float(np.mean([f["ms_reducida"] for f in filas])), 2) if filas else None,
+        "mb_medio_completa": round(float(np.mean([f["mb_pico_completa"] for f in filas])), 2) if filas else None,
+        "mb_medio_reducida": round(float(np.mean([f["mb_pico_reducida"] for f in filas])), 2) if filas else None,
+    }
+    return {"resumen": resumen, "imagenes": filas}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Tiempo y memoria de la decodificación completa vs. reducida.")
+    parser.add_argument("entrada", help="Directorio, patrón glob o archivo .txt con rutas de imágenes locales")
+    parser.add_argument("--lado-max", type=int, default=LADO_MAX_DETECCION)
+    args = parser.parse_args()
+    informe = comparar_decodificacion(listar_fuentes(args.entrada), args.lado_max)
+    print(json.dumps(informe["resumen"], ensure_ascii=False, indent=2))
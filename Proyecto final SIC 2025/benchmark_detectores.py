@@ -0,0 +1,94 @@
+import argparse
+import os
+import random
+import time
+import numpy as np
+from PIL import Image
+
+from detectores import crear_detector, DETECTORES_DISPONIBLES
+from main import INPUT_DIR, MAX_SIZE_DATASET
+from metricas_latencia import anadir_argumento_salida, guardar_informe
+
+# ===============================================================
+# --- BENCHMARK DE DETECTORES ---
+# ===============================================================
+# Recorre imágenes de ./train/ (preprocesadas igual que crear_dataset_rostros),
+# toma la salida de MTCNN como referencia y mide para cada backend:
+# imágenes/s, detecciones/s y recall (cajas de referencia con IoU >= umbral).
+
+
+def _cargar_imagenes(input_dir, maximo, semilla=0):
+    rutas = []
+    for clase in sorted(os.listdir(input_dir)):
+        clase_path = os.path.join(input_dir, clase)
+        if os.path.isdir(clase_path):
+            rutas.extend(os.path.join(clase_path, n) for n in sorted(os.listdir(clase_path)))
+    random.Random(semilla).shuffle(rutas)
+    imagenes = []
+    for ruta in rutas[:maximo]:
+        try:
+            img_pil = Image.open(ruta)
+            if max(img_pil.size) > MAX_SIZE_DATASET:
+                img_pil.thumbnail((MAX_SIZE_DATASET, MAX_SIZE_DATASET))
+            imagenes.append(np.array(img_pil.convert('RGB')))
+        except Exception as e:
+            print(f"❌ Error procesando {os.path.basename(ruta)}: {e}")
+    return imagenes
+
+def _iou(a, b):
+    ax1, ay1, aw, ah = a
+    bx1, by1, bw, bh = b
+    ix = max(0, min(ax1 + aw, bx1 + bw) - max(ax1, bx1))
+    iy = max(0, min(ay1 + ah, by1 + bh) - max(ay1, by1))
+    inter = ix * iy
+    union = aw * ah + bw * bh - inter
+    return inter / union if union > 0 else 0.0
+
+def _ejecutar(detector, imagenes):
+    detector.detect_faces(imagenes[0])  # calentamiento
+    cajas = []
+    inicio = time.perf_counter()
+    for img in imagenes:
+        cajas.append([[abs(v) for v in d['box'][:2]] + list(d['box'][2:]) for d in detector.detect_faces(img)])
+    return cajas, time.perf_counter() - inicio
+
+def comparar_detectores(nombres, input_dir=INPUT_DIR, maximo=200, umbral_iou=0.5):
+    imagenes = _cargar_imagenes(input_dir, maximo)
+    referencia, t_ref = _ejecutar(crear_detector("mtcnn"), imagenes)
+    total_ref = sum(len(c) for c in referencia)
+
+    informe = {"imagenes": len(imagenes), "rostros_referencia": total_ref, "detectores": {}}
+    for nombre in nombres:
+        if nombre == "mtcnn":
+            cajas, segundos = referencia, t_ref
+        else:
+            try:
+                detector = crear_detector(nombre)
+            except Exception as e:
+                informe["detectores"][nombre] = {"error": str(e)}
+                continue
+            cajas, segundos = _ejecutar(detector, imagenes)
+        encontrados = sum(
+            1 for ref, det in zip(referencia, cajas) for r in ref if any(_iou(r, d) >= umbral_iou for d in det)
+        )
+        total_det = sum(len(c) for c in cajas)
+        informe["detectores"][nombre] = {
+            "imagenes_por_s": round(len(imagenes) / segundos, 2),
+            "detecciones_por_s": round(total_det / segundos, 2),
+            "ms_por_imagen": round(segundos / len(imagenes) * 1000, 2),
+            "detecciones": total_det,
+            "recall_vs_mtcnn": round(encontrados / total_ref, 4) if total_ref else None,
+        }
+    return informe
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Velocidad y recall de los detectores frente a MTCNN.")
+    parser.add_argument("--detectores", nargs="+", default=list(DETECTORES_DISPONIBLES), choices=DETECTORES_DISPONIBLES)
+    parser.add_argument("--max-imagenes", type=int, default=200)
+    parser.add_argument("--iou", type=float, default=0.5)
+    anadir_argumento_salida(parser)
+    args = parser.parse_args()
+
+    informe = comparar_detectores(args.detectores, INPUT_DIR, args.max_imagenes, args.iou)
+    guardar_informe(informe, args.salida)
@@ -0,0 +1,201 @@
+import argparse
+import contextlib
+import hashlib
+import os
+import shutil
+import subprocess
+import sys
+import time
+import numpy as np
+
+import main
+from metricas_latencia import anadir_argumento_salida, guardar_informe
+
+# ===============================================================
+# --- BENCHMARK DE ENTRENAMIENTO ---
+# ===============================================================
+# Ejecuta main.entrenar_modelo (sin ventana) sobre un subconjunto fijo de ./train/ (las primeras
+# N imágenes de las primeras K clases, en orden alfabético) y guarda un informe JSON con:
+# tiempo por fase, tiempo e imágenes/s por época, tiempo de entrada frente a cómputo
+# y memoria residente máxima. El modelo y el dataset del benchmark van a un directorio
+# aparte: el modelo real no se toca.
+
+DIR_BENCHMARK = "./.benchmark_entrenamiento/"
+
+
+class PerfilEntrenamiento:
+    """Se pasa a main.entrenar_modelo(perfil=...) para cronometrar cada fase."""
+
+    def __init__(self):
+        self.fases = {}
+        self.epocas = []
+        self.datos_entrenamiento = None
+        self.num_muestras = 0
+
+    @contextlib.contextmanager
+    def fase(self, nombre):
+        inicio = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.fases[nombre] = round(time.perf_counter() - inicio, 3)
+
+    def callback(self, datos_entrenamiento, num_muestras):
+        from tensorflow.keras.callbacks import Callback
+        self.datos_entrenamiento = datos_entrenamiento
+        self.num_muestras = num_muestras
+        epocas = self.epocas
+
+        class Cronometro(Callback):
+            def on_epoch_begin(self, epoch, logs=None):
+                self._inicio = time.perf_counter()
+
+            def on_train_batch_end(self, batch, logs=None):
+                self._fin_entrenamiento = time.perf_counter()
+
+            def on_epoch_end(self, epoch, logs=None):
+                fin = time.perf_counter()
+                t_entrenamiento = self._fin_entrenamiento - self._inicio
+                epocas.append({
+                    "epoca": epoch + 1,
+                    "total_s": round(fin - self._inicio, 3),
+                    "entrenamiento_s": round(t_entrenamiento, 3),
+                    "validacion_s": round(fin - self._fin_entrenamiento, 3),
+                    "imagenes_por_s": round(num_muestras / t_entrenamiento, 1) if t_entrenamiento > 0 else None,
+                })
+
+        return Cronometro()
+
+
+def _primer_lote(datos):
+    lote = next(iter(datos))
+    return np.asarray(lote[0]), np.asarray(lote[1])
+
+def medir_entrada_y_computo(datos, num_muestras, num_clases, batch_size=32):
+    """Separa una época en sus dos partes, cada una medida por separado:
+    entrada = recorrer el pipeline sin modelo; cómputo = pasos de entrenamiento
+    sobre un lote ya en memoria (sin leer datos)."""
+    pasos = int(np.ceil(num_muestras / batch_size))
+
+    inicio = time.perf_counter()
+    for i, _ in enumerate(datos):
+        if i + 1 >= pasos:
+            break
+    t_entrada = time.perf_counter() - inicio
+
+    x, y = _primer_lote(datos)
+    modelo = main.construir_modelo_cnn(num_clases)
+    modelo.train_on_batch(x, y)  # calentamiento (traza del grafo)
+    inicio = time.perf_counter()
+    for _ in range(pasos):
+        modelo.train_on_batch(x, y)
+    t_computo = time.perf_counter() - inicio
+    return round(t_entrada, 3), round(t_computo, 3)
+
+
+def preparar_subconjunto(input_dir, destino, max_clases, imagenes_por_clase):
+    """Copia un subconjunto determinista de input_dir y devuelve su huella (nombres + tamaños)."""
+    if os.path.isdir(destino):
+        shutil.rmtree(destino)
+    h = hashlib.sha256()
+    total = 0
+    clases = sorted(c for c in os.listdir(input_dir) if os.path.isdir(os.path.join(input_dir, c)))[:max_clases]
+    for clase in clases:
+        os.makedirs(os.path.join(destino, clase))
+        for nombre in sorted(os.listdir(os.path.join(input_dir, clase)))[:imagenes_por_clase]:
+            origen = os.path.join(input_dir, clase, nombre)
+            shutil.copy2(origen, os.path.join(destino, clase, nombre))
+            h.update(f"{clase}/{nombre}:{os.path.getsize(origen)}".encode('utf-8'))
+            total += 1
+    return {"clases": len(clases), "imagenes": total, "huella": h.hexdigest()[:16]}
+
+def _commit_actual():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except Exception:
+        return None
+
+def _rss_pico_mb():
+    """Memoria residente máxima del proceso y de sus hijos (workers del dataset). Solo Unix."""
+    try:
+        import resource
+    except ImportError:
+        return None, None
+    # ru_maxrss está en KB en Linux y en bytes en macOS
+    unidad = 1 if sys.platform == "darwin" else 1024
+    propio = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * unidad / 2**20
+    hijos = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss * unidad / 2**20
+    return round(propio, 1), round(hijos, 1)
+
+
+def ejecutar_benchmark(max_clases=5, imagenes_por_clase=20, epocas=5, semilla=0):
+    import tensorflow as tf
+    from checkpoints_entrenamiento import directorio_punto_control
+
+    subconjunto = preparar_subconjunto(main.INPUT_DIR, os.path.join(DIR_BENCHMARK, "train"), max_clases, imagenes_por_clase)
+    # Dataset reconstruido desde cero en cada ejecución para que la fase sea comparable
+    salida = os.path.join(DIR_BENCHMARK, "dataset_rostros")
+    if os.path.isdir(salida):
+        shutil.rmtree(salida)
+    main.INPUT_DIR = os.path.join(DIR_BENCHMARK, "train")
+    main.OUTPUT_DIR = salida
+    main.MODELO_FILENAME = os.path.join(DIR_BENCHMARK, "modelo.h5")
+    main.CLASSES_FILENAME = os.path.join(DIR_BENCHMARK, "clases.json")
+    main.EPOCAS_ENTRENAMIENTO = epocas
+    # Siempre desde la época 0: reanudar un benchmark interrumpido falsearía los tiempos por época
+    main.REANUDAR_ENTRENAMIENTO = False
+    shutil.rmtree(directorio_punto_control(main.MODELO_FILENAME), ignore_errors=True)
+    tf.keras.utils.set_random_seed(semilla)
+
+    perfil = PerfilEntrenamiento()
+    inicio = time.perf_counter()
+    exito, mensaje, resultado = main.entrenar_modelo(lambda m, tag: print(f"[{tag}] {m}"), perfil=perfil)
+    if not exito:
+        raise RuntimeError(mensaje)
+    modelo, class_indices, punto_control = resultado
+    main.guardar_modelo_entrenado(modelo, class_indices)
+    t_total = time.perf_counter() - inicio
+    punto_control.descartar()
+    num_clases = len(class_indices)
+
+    ritmos = [e["imagenes_por_s"] for e in perfil.epocas[1:] or perfil.epocas if e["imagenes_por_s"]]
+    t_entrada, t_computo = medir_entrada_y_computo(perfil.datos_entrenamiento, perfil.num_muestras, num_clases)
+    rss, rss_hijos = _rss_pico_mb()
+
+    return {
+        "commit": _commit_actual(),
+        "subconjunto": subconjunto,
+        "configuracion": {
+            "pipeline": main.PIPELINE_ENTRENAMIENTO,
+            "epocas": epocas,
+            "workers_dataset": main.NUM_WORKERS_DATASET,
+            "detector": main.DETECTOR_BACKEND,
+            "semilla": semilla,
+        },
+        "fases_s": perfil.fases,
+        "total_s": round(t_total, 3),
+        "imagenes_entrenamiento": perfil.num_muestras,
+        "epocas": perfil.epocas,
+        # Se descarta la primera época (traza del grafo y llenado de cachés)
+        "imagenes_por_s_media": round(float(np.mean(ritmos)), 1) if ritmos else None,
+        "entrada_s_por_epoca": t_entrada,
+        "computo_s_por_epoca": t_computo,
+        "limitado_por": "entrada" if t_entrada > t_computo else "computo",
+        "rss_pico_mb": rss,
+        "rss_pico_hijos_mb": rss_hijos,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Tiempos de entrenamiento por fase sobre un subconjunto fijo de ./train/.")
+    parser.add_argument("--clases", type=int, default=5, help="Número de clases del subconjunto")
+    parser.add_argument("--imagenes-por-clase", type=int, default=20)
+    parser.add_argument("--epocas", type=int, default=5)
+    parser.add_argument("--semilla", type=int, default=0)
+    anadir_argumento_salida(parser)
+    args = parser.parse_args()
+
+    informe = ejecutar_benchmark(args.clases, args.imagenes_por_clase, args.epocas, args.semilla)
+    guardar_informe(informe, args.salida)
@@ -0,0 +1,84 @@
+import argparse
+import json
+import time
+import tracemalloc
+import numpy as np
+from PIL import Image
+
+from main import construir_modelo_cnn, preparar_lote_rostros, TAM_ROSTRO
+
+# ===============================================================
+# --- BENCHMARK: preprocesado en el host vs. en el grafo ---
+# ===============================================================
+# Compara, con los mismos pesos, el camino anterior (img_to_array + /255 en float32
+# en el host, modelo sin capas de preprocesado) con el actual (lote uint8 y
+# Resizing + Rescaling dentro del modelo): memoria del lote, pico de memoria al
+# prepararlo, tiempo de preparación y latencia de predict por lote.
+
+
+def _preparar_float32(caras):
+    """Camino anterior de preparar_lote_rostros."""
+    from tensorflow.keras.preprocessing.image import img_to_array
+    return np.stack([img_to_array(Image.fromarray(cara).resize((TAM_ROSTRO, TAM_ROSTRO))) for cara in caras]) / 255.0
+
+def _medir(preparar, modelo, caras, repeticiones):
+    tracemalloc.start()
+    inicio = time.perf_counter()
+    lote = preparar(caras)
+    t_preparar = (time.perf_counter() - inicio) * 1000
+    _, pico = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    modelo.predict(lote, batch_size=len(lote), verbose=0)  # calentamiento
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        modelo.predict(lote, batch_size=len(lote), verbose=0)
+        tiempos.append((time.perf_counter() - inicio) * 1000)
+    return {
+        "dtype_lote": str(lote.dtype),
+        "lote_mb": round(lote.nbytes / 2**20, 2),
+        "pico_preparacion_mb": round(pico / 2**20, 2),
+        "preparacion_ms": round(t_preparar, 2),
+        "predict_ms_p50": round(float(np.percentile(tiempos, 50)), 2),
+        "predict_ms_p95": round(float(np.percentile(tiempos, 95)), 2),
+    }, lote
+
+
+def comparar(num_rostros=32, tam_recorte=180, repeticiones=20, num_clases=10, semilla=0):
+    from tensorflow.keras.models import Model
+    from tensorflow.keras.layers import Input, Rescaling
+
+    rng = np.random.default_rng(semilla)
+    caras = [rng.integers(0, 256, (tam_recorte, tam_recorte, 3), dtype=np.uint8) for _ in range(num_rostros)]
+
+    nuevo = construir_modelo_cnn(num_clases)
+    # Mismo modelo sin las capas de preprocesado: lo que se guardaba antes
+    inicio_red = next(i for i, capa in enumerate(nuevo.layers) if isinstance(capa, Rescaling)) + 1
+    entrada = Input(shape=(TAM_ROSTRO, TAM_ROSTRO, 3))
+    x = entrada
+    for capa in nuevo.layers[inicio_red:]:
+        x = capa(x)
+    anterior = Model(entrada, x)
+
+    res_anterior, lote_f32 = _medir(_preparar_float32, anterior, caras, repeticiones)
+    res_nuevo, lote_u8 = _medir(preparar_lote_rostros, nuevo, caras, repeticiones)
+    diferencia = np.abs(
+        anterior.predict(lote_f32, verbose=0) - nuevo.predict(lote_u8, verbose=0)
+    ).max()
+    return {
+        "rostros_por_lote": num_rostros,
+        "host_float32": res_anterior,
+        "grafo_uint8": res_nuevo,
+        "reduccion_memoria_lote": round(res_anterior["lote_mb"] / res_nuevo["lote_mb"], 2),
+        "max_diferencia_softmax": float(diferencia),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Memoria y latencia: preprocesado en el host vs. en el grafo.")
+    parser.add_argument("--rostros", type=int, default=32)
+    parser.add_argument("--tam-recorte", type=int, default=180)
+    parser.add_argument("--repeticiones", type=int, default=20)
+    args = parser.parse_args()
+    print(json.dumps(comparar(args.rostros, args.tam_recorte, args.repeticiones), ensure_ascii=False, indent=2))
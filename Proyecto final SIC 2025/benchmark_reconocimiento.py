@@ -0,0 +1,192 @@
+import argparse
+import json
+import os
+import time
+import numpy as np
+
+from main import (
+    cargar_modelo_entrenado, cargar_imagen, detectar_rostros, preparar_lote_rostros,
+    cargar_imagen_reducida, detectar_rostros_reducido,
+    MODELO_FILENAME, CLASSES_FILENAME, INPUT_DIR, OUTPUT_DIR, CLASE_NO_FAMILIAR, UMBRAL_CONF,
+    BACKEND_INFERENCIA, DECODIFICACION_REDUCIDA,
+)
+from almacen_rostros import _listar_recortes, dividir_validacion
+from metricas_latencia import anadir_argumento_salida, guardar_informe
+
+# ===============================================================
+# --- BENCHMARK DE RECONOCIMIENTO (detección -> clasificación) ---
+# ===============================================================
+# Toma el split de validación de dataset_rostros/ (incluida la clase "No familiar"), recorre las fotos originales de ./train/ por el camino
+# completo de la aplicación y guarda la salida softmax del rostro principal de cada una.
+# Con esa única pasada se calculan, de forma vectorizada, precisión de conjunto abierto,
+# tasa de falsa aceptación (FAR) y de falso rechazo (FRR) para un barrido de umbrales.
+# Ese split no es un conjunto de prueba independiente: el entrenamiento lo usa para
+# EarlyStopping (restore_best_weights) y ReduceLROnPlateau, así que las cifras son
+# métricas de validación y tienden a ser optimistas. El informe lo indica en "particion".
+# Las fotos en las que el detector no encuentra rostro no entran en las métricas del
+# clasificador (una foto "No familiar" sin rostro no es un acierto): se informan aparte.
+
+SALIDAS_FILENAME = "benchmark_reconocimiento_salidas.npz"
+
+
+def _percentiles(valores):
+    if len(valores) == 0:
+        return None
+    p50, p95, p99 = np.percentile(valores, [50, 95, 99])
+    return {"media": round(float(np.mean(valores)), 2), "p50": round(p50, 2), "p95": round(p95, 2), "p99": round(p99, 2)}
+
+def muestras_validacion(dataset_dir=OUTPUT_DIR, input_dir=INPUT_DIR, validation_split=0.2):
+    """(clase, foto original) del split de validación. Los recortes se llaman como su foto de origen.
+    Es el mismo split que guía EarlyStopping y ReduceLROnPlateau al entrenar: no es un conjunto de prueba."""
+    _, archivos = _listar_recortes(dataset_dir)
+    clases = sorted({clase for clase, _ in archivos})
+    etiquetas = np.array([clases.index(clase) for clase, _ in archivos])
+    _, val_idx = dividir_validacion(etiquetas, validation_split)
+    muestras = []
+    for i in np.sort(val_idx):
+        clase, ruta_recorte = archivos[i]
+        original = os.path.join(input_dir, clase, os.path.basename(ruta_recorte))
+        if os.path.exists(original):
+            muestras.append((clase, original))
+    return muestras
+
+
+def ejecutar_pasada(modelo, class_indices, muestras):
+    """Una sola pasada por el camino completo. Guarda la softmax del rostro principal
+    (el primero que devuelve el detector, como en crear_dataset_rostros) y los tiempos."""
+    num_clases = len(class_indices)
+    probs = np.full((len(muestras), num_clases), np.nan, dtype=np.float32)
+    etiquetas = np.array([class_indices.get(clase, -1) for clase, _ in muestras])
+    t_carga, t_deteccion, t_clasificacion, t_total, t_por_rostro = [], [], [], [], []
+    total_rostros = 0
+
+    for i, (_, ruta) in enumerate(muestras):
+        inicio = time.perf_counter()
+        if DECODIFICACION_REDUCIDA:
+            reducida = cargar_imagen_reducida(ruta)
+        else:
+            img = cargar_imagen(ruta)
+        t1 = time.perf_counter()
+        if DECODIFICACION_REDUCIDA:
+            _, _, caras = detectar_rostros_reducido(reducida)
+        else:
+            _, caras = detectar_rostros(img)
+        t2 = time.perf_counter()
+        if caras:
+            salida = modelo.predict(preparar_lote_rostros(caras), batch_size=len(caras), verbose=0)
+            probs[i] = salida[0]
+        t3 = time.perf_counter()
+
+        t_carga.append((t1 - inicio) * 1000)
+        t_deteccion.append((t2 - t1) * 1000)
+        t_total.append((t3 - inicio) * 1000)
+        if caras:
+            t_clasificacion.append((t3 - t2) * 1000)
+            t_por_rostro.append((t3 - t2) * 1000 / len(caras))
+            total_rostros += len(caras)
+
+    segundos = sum(t_total) / 1000
+    tiempos = {
+        "imagenes": len(muestras),
+        "rostros": total_rostros,
+        "rostros_por_s": round(total_rostros / segundos, 2) if segundos > 0 else None,
+        "imagenes_por_s": round(len(muestras) / segundos, 2) if segundos > 0 else None,
+        "latencia_imagen_ms": _percentiles(t_total),
+        "latencia_carga_ms": _percentiles(t_carga),
+        "latencia_deteccion_ms": _percentiles(t_deteccion),
+        "latencia_clasificacion_ms": _percentiles(t_clasificacion),
+        "latencia_por_rostro_ms": _percentiles(t_por_rostro),
+    }
+    return probs, etiquetas, tiempos
+
+
+def barrido_umbrales(probs, etiquetas, idx_no_familiar, umbrales):
+    """Métricas de conjunto abierto para cada umbral, sin bucles sobre las muestras.
+    Misma regla que clasificar_rostros: una clase conocida con confianza < umbral pasa a "No familiar".
+    Solo cuentan las fotos con rostro detectado (ver resumen_sin_rostro para el resto)."""
+    umbrales = np.asarray(umbrales, dtype=np.float32)
+    con_rostro = ~np.isnan(probs).any(axis=1)
+    probs, etiquetas = probs[con_rostro], etiquetas[con_rostro]
+    pred = np.argmax(probs, axis=1)
+    conf = probs[np.arange(len(probs)), pred]
+
+    # (U, N): clase final de cada muestra para cada umbral
+    rechazado = (conf[None, :] < umbrales[:, None]) & (pred[None, :] != idx_no_familiar)
+    final = np.where(rechazado, idx_no_familiar, pred[None, :])
+
+    desconocidos = etiquetas == idx_no_familiar
+    conocidos = ~desconocidos
+    aciertos = final == etiquetas[None, :]
+    aceptado = final != idx_no_familiar
+
+    resultados = []
+    for k, umbral in enumerate(umbrales):
+        fila = {
+            "umbral": round(float(umbral), 3),
+            "precision": round(float(aciertos[k].mean()), 4) if len(etiquetas) else None,
+            # FAR: desconocidos aceptados como alguien conocido
+            "far": round(float(aceptado[k, desconocidos].mean()), 4) if desconocidos.any() else None,
+            # FRR: conocidos rechazados como "No familiar"
+            "frr": round(float((~aceptado[k, conocidos]).mean()), 4) if conocidos.any() else None,
+            # Conocidos aceptados con la identidad equivocada
+            "confusion_identidad": round(float((aceptado[k] & ~aciertos[k])[conocidos].mean()), 4) if conocidos.any() else None,
+        }
+        resultados.append(fila)
+    return resultados
+
+def resumen_sin_rostro(probs, etiquetas, idx_no_familiar):
+    """Fotos en las que el detector no encontró rostro, separadas por conocidas / "No familiar"."""
+    sin_rostro = np.isnan(probs).any(axis=1)
+    desconocidos = etiquetas == idx_no_familiar
+    return {
+        "total": int(sin_rostro.sum()),
+        "conocidos": int((sin_rostro & ~desconocidos).sum()),
+        "no_familiar": int((sin_rostro & desconocidos).sum()),
+        "tasa": round(float(sin_rostro.mean()), 4) if len(etiquetas) else None,
+    }
+
+
+def ejecutar_benchmark(umbrales, desde_salidas=None, guardar_salidas=None):
+    if desde_salidas:
+        datos = np.load(desde_salidas, allow_pickle=False)
+        probs, etiquetas, idx_nf = datos["probs"], datos["etiquetas"], int(datos["idx_no_familiar"])
+        tiempos = json.loads(str(datos["tiempos"]))
+    else:
+        modelo, class_indices = cargar_modelo_entrenado(MODELO_FILENAME, CLASSES_FILENAME, BACKEND_INFERENCIA)
+        if CLASE_NO_FAMILIAR not in class_indices:
+            raise ValueError(f"❌ El modelo no tiene la clase '{CLASE_NO_FAMILIAR}': no se puede medir FAR.")
+        idx_nf = class_indices[CLASE_NO_FAMILIAR]
+        muestras = muestras_validacion()
+        if not muestras:
+            raise ValueError("❌ No hay muestras de validación con su foto original en ./train/.")
+        probs, etiquetas, tiempos = ejecutar_pasada(modelo, class_indices, muestras)
+        if guardar_salidas:
+            np.savez(guardar_salidas, probs=probs, etiquetas=etiquetas, idx_no_familiar=idx_nf, tiempos=json.dumps(tiempos))
+
+    barrido = barrido_umbrales(probs, etiquetas, idx_nf, umbrales)
+    return {
+        "particion": "validacion (la misma que guía EarlyStopping/ReduceLROnPlateau al entrenar; cifras optimistas, no de prueba)",
+        "muestras": int(len(etiquetas)),
+        "muestras_no_familiar": int(np.sum(etiquetas == idx_nf)),
+        # El barrido solo mide al clasificador: estas fotos quedan fuera de precisión, FAR y FRR
+        "muestras_evaluadas": int((~np.isnan(probs).any(axis=1)).sum()),
+        "sin_rostro_detectado": resumen_sin_rostro(probs, etiquetas, idx_nf),
+        "umbral_actual": UMBRAL_CONF,
+        "tiempos": tiempos,
+        "barrido": barrido,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Latencia y precisión de conjunto abierto (split de validación) para un barrido de umbrales.")
+    parser.add_argument("--umbral-min", type=float, default=0.50)
+    parser.add_argument("--umbral-max", type=float, default=0.99)
+    parser.add_argument("--pasos", type=int, default=50)
+    parser.add_argument("--guardar-salidas", nargs="?", const=SALIDAS_FILENAME, help="Guarda las softmax para repetir el barrido")
+    parser.add_argument("--desde-salidas", help="Recalcula el barrido desde un .npz guardado, sin volver a inferir")
+    anadir_argumento_salida(parser)
+    args = parser.parse_args()
+
+    umbrales = np.linspace(args.umbral_min, args.umbral_max, args.pasos)
+    informe = ejecutar_benchmark(umbrales, args.desde_salidas, args.guardar_salidas)
+    guardar_informe(informe, args.salida)
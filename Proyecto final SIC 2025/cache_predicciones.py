@@ -0,0 +1,78 @@
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+
+from descarga_imagenes import CacheDisco
+
+# ===============================================================
+# --- CACHÉ DE PREDICCIONES ---
+# ===============================================================
+# Guarda el resultado de detectar_y_clasificar (cajas, clases y confianzas) con clave
+# hash del contenido de la imagen + identidad del modelo. Así, volver a analizar la
+# misma ruta o URL no repite la detección ni la clasificación.
+# Al cambiar el modelo (entrenar o cargar) se vacía la parte en memoria; en disco las
+# entradas antiguas ya no coinciden con la clave y acaban expulsadas por LRU.
+
+CACHE_PREDICCIONES_DIR = ".cache_predicciones"
+CACHE_PREDICCIONES_MAX_BYTES = 20 * 1024 * 1024
+
+
+class CachePredicciones:
+    """LRU en memoria con tamaño máximo y, opcionalmente, persistencia en disco."""
+
+    def __init__(self, max_entradas=256, persistente=False, directorio=CACHE_PREDICCIONES_DIR):
+        self.max_entradas = max_entradas
+        self.lock = threading.Lock()
+        self._entradas = OrderedDict()
+        self.identidad_modelo = None
+        self._disco = CacheDisco(directorio, CACHE_PREDICCIONES_MAX_BYTES) if persistente else None
+
+    def fijar_modelo(self, identidad):
+        """Invalida lo guardado si el modelo (o su configuración) cambió."""
+        with self.lock:
+            if identidad != self.identidad_modelo:
+                self._entradas.clear()
+                self.identidad_modelo = identidad
+
+    def _clave(self, datos):
+        return f"{hashlib.sha256(datos).hexdigest()}|{self.identidad_modelo}"
+
+    def obtener(self, datos):
+        """Detecciones guardadas para estos bytes de imagen, o None."""
+        if self.identidad_modelo is None:
+            return None
+        clave = self._clave(datos)
+        with self.lock:
+            if clave in self._entradas:
+                self._entradas.move_to_end(clave)
+                return [dict(det) for det in self._entradas[clave]]
+        if self._disco is not None:
+            guardada = self._disco.leer("prediccion", clave)
+            if guardada is not None:
+                detecciones = [dict(det, box=tuple(det['box'])) for det in json.loads(guardada.decode('utf-8'))]
+                self._recordar(clave, detecciones)
+                return [dict(det) for det in detecciones]
+        return None
+
+    def guardar(self, datos, detecciones):
+        if self.identidad_modelo is None:
+            return
+        clave = self._clave(datos)
+        detecciones = [dict(det, box=tuple(int(v) for v in det['box'])) for det in detecciones]
+        self._recordar(clave, detecciones)
+        if self._disco is not None:
+            self._disco.escribir("prediccion", clave, json.dumps(detecciones, ensure_ascii=False).encode('utf-8'))
+
+    def _recordar(self, clave, detecciones):
+        with self.lock:
+            self._entradas[clave] = detecciones
+            self._entradas.move_to_end(clave)
+            while len(self._entradas) > self.max_entradas:
+                self._entradas.popitem(last=False)
+
+    def limpiar(self):
+        with self.lock:
+            self._entradas.clear()
+        if self._disco is not None:
+            self._disco.limpiar()
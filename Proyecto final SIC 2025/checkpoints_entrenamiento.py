@@ -0,0 +1,274 @@
+import argparse
+import contextlib
+import glob
+import json
+import os
+import shutil
+import subprocess
+import sys
+import time
+import numpy as np
+
+from metricas_latencia import anadir_argumento_salida, guardar_informe
+
+# ===============================================================
+# --- PUNTOS DE CONTROL DEL ENTRENAMIENTO ---
+# ===============================================================
+# Cada época completa se guardan pesos y estado del optimizador (tf.train.Checkpoint),
+# la tasa de aprendizaje actual, los contadores de EarlyStopping y ReduceLROnPlateau
+# (y los mejores pesos de EarlyStopping), class_indices y la huella del dataset.
+# Si el proceso muere, el siguiente entrenamiento con el mismo dataset continúa desde la
+# última época guardada (fit(initial_epoch=...)). Al terminar, el punto de control se borra.
+# El estado se escribe después de los pesos y con os.replace: un corte a mitad de escritura
+# deja siempre el punto de control anterior intacto.
+
+ESTADO_FILENAME = "estado.json"
+EJECUCION_FILENAME = "ejecucion.json"
+MEJORES_PESOS_FILENAME = "mejores_pesos.npz"
+ATRIBUTOS_CALLBACK = ("wait", "best", "best_epoch", "stopped_epoch", "cooldown_counter")
+
+
+def directorio_punto_control(modelo_path):
+    """Los puntos de control van junto al modelo que producirá el entrenamiento."""
+    return f"{os.path.splitext(modelo_path)[0]}_checkpoint"
+
+def leer_estado(directorio):
+    try:
+        with open(os.path.join(directorio, ESTADO_FILENAME), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def _escribir_json(ruta, datos):
+    tmp = ruta + ".tmp"
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(datos, f, ensure_ascii=False)
+    os.replace(tmp, ruta)
+
+def _estado_callback(callback):
+    estado = {}
+    for atributo in ATRIBUTOS_CALLBACK:
+        valor = getattr(callback, atributo, None)
+        if isinstance(valor, (int, float, np.number)):
+            estado[atributo] = valor.item() if isinstance(valor, np.number) else valor
+    return estado
+
+
+def crear_punto_control(directorio, class_indices, huella, callbacks_con_estado, cada=1):
+    """Callback de Keras que guarda el punto de control cada `cada` épocas.
+    Debe ir el último en la lista, para guardar los contadores ya actualizados de la época.
+    restaurar(modelo) carga pesos y optimizador y devuelve la época desde la que continuar."""
+    import tensorflow as tf
+    from tensorflow.keras.callbacks import Callback
+
+    class PuntoControl(Callback):
+        def __init__(self):
+            super().__init__()
+            self._pendiente = None
+            self._mejores_guardados = None
+
+        def _compatible(self, estado):
+            return estado is not None and estado.get("class_indices") == class_indices and estado.get("huella") == huella
+
+        def restaurar(self, modelo):
+            estado = leer_estado(directorio)
+            if not self._compatible(estado):
+                return 0
+            optimizador = modelo.optimizer
+            try:
+                # Los optimizadores de Keras crean sus variables al primer paso; se crean ya para poder cargarlas
+                optimizador.build(modelo.trainable_variables)
+            except AttributeError:
+                pass
+            tf.train.Checkpoint(modelo=modelo, optimizador=optimizador).read(
+                os.path.join(directorio, estado["pesos"])
+            ).expect_partial()
+            tf.keras.backend.set_value(optimizador.learning_rate, estado["lr"])
+            # Los callbacks reinician sus contadores en on_train_begin: se reponen después
+            self._pendiente = estado
+            return estado["epoca"]
+
+        def on_train_begin(self, logs=None):
+            if self._pendiente is None:
+                return
+            estado, self._pendiente = self._pendiente, None
+            for callback, valores in zip(callbacks_con_estado, estado["callbacks"]):
+                for atributo, valor in valores.items():
+                    setattr(callback, atributo, valor)
+            ruta_mejores = os.path.join(directorio, MEJORES_PESOS_FILENAME)
+            if os.path.exists(ruta_mejores):
+                with np.load(ruta_mejores) as datos:
+                    mejores = [datos[f"arr_{i}"] for i in range(len(datos.files))]
+                for callback in callbacks_con_estado:
+                    if hasattr(callback, "best_weights"):
+                        callback.best_weights = mejores
+                        self._mejores_guardados = id(mejores)
+
+        def on_epoch_end(self, epoch, logs=None):
+            # Época interrumpida (cancelación) o final por EarlyStopping: no hay nada que reanudar
+            if self.model.stop_training or (epoch + 1) % cada:
+                return
+            os.makedirs(directorio, exist_ok=True)
+            prefijo = f"pesos-{epoch + 1}"
+            tf.train.Checkpoint(modelo=self.model, optimizador=self.model.optimizer).write(
+                os.path.join(directorio, prefijo)
+            )
+            for callback in callbacks_con_estado:
+                mejores = getattr(callback, "best_weights", None)
+                if mejores is not None and id(mejores) != self._mejores_guardados:
+                    tmp = os.path.join(directorio, "mejores_pesos.tmp.npz")
+                    np.savez(tmp, *mejores)
+                    os.replace(tmp, os.path.join(directorio, MEJORES_PESOS_FILENAME))
+                    self._mejores_guardados = id(mejores)
+            _escribir_json(os.path.join(directorio, ESTADO_FILENAME), {
+                "epoca": epoch + 1,
+                "pesos": prefijo,
+                "lr": float(tf.keras.backend.get_value(self.model.optimizer.learning_rate)),
+                "callbacks": [_estado_callback(c) for c in callbacks_con_estado],
+                "class_indices": class_indices,
+                "huella": huella,
+            })
+            for anterior in glob.glob(os.path.join(directorio, "pesos-*")):
+                if not os.path.basename(anterior).startswith(prefijo + "."):
+                    os.remove(anterior)
+
+        def descartar(self):
+            shutil.rmtree(directorio, ignore_errors=True)
+
+    return PuntoControl()
+
+
+# ===============================================================
+# --- REANUDACIÓN Y VERIFICACIÓN (sin ventana) ---
+# ===============================================================
+
+def entrenar_sin_ventana(directorio=None, epocas=None, semilla=None):
+    """Entrena (o reanuda si hay punto de control) con la configuración de main.py.
+    Con `directorio`, todo (train, dataset, modelo y punto de control) queda aislado ahí.
+    No crea ninguna ventana: sirve en un servidor sin pantalla, donde suele reanudarse.
+    Devuelve las épocas que fit() ejecutó realmente: {"epoca_inicial", "epoca_final"}."""
+    import main
+
+    if directorio is not None:
+        main.INPUT_DIR = os.path.join(directorio, "train")
+        main.OUTPUT_DIR = os.path.join(directorio, "dataset_rostros")
+        main.MODELO_FILENAME = os.path.join(directorio, "modelo.h5")
+        main.CLASSES_FILENAME = os.path.join(directorio, "clases.json")
+    if epocas is not None:
+        main.EPOCAS_ENTRENAMIENTO = epocas
+    if semilla is not None:
+        import tensorflow as tf
+        tf.keras.utils.set_random_seed(semilla)
+
+    exito, mensaje, resultado = main.entrenar_modelo(lambda m, tag: print(f"[{tag}] {m}"))
+    if not exito:
+        raise RuntimeError(mensaje)
+    modelo, class_indices, punto_control = resultado
+    main.guardar_modelo_entrenado(modelo, class_indices)
+    punto_control.descartar()
+    # History registra los números de época tal como los recorrió fit (desde initial_epoch)
+    epocas_ejecutadas = modelo.history.epoch
+    return {
+        "epoca_inicial": epocas_ejecutadas[0] if epocas_ejecutadas else None,
+        "epoca_final": epocas_ejecutadas[-1] + 1 if epocas_ejecutadas else None,
+    }
+
+
+def _leer_ejecucion(directorio):
+    try:
+        with open(os.path.join(directorio, EJECUCION_FILENAME), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _evaluar(directorio):
+    """Pérdida y precisión del modelo guardado sobre el split de validación de su dataset."""
+    from tensorflow.keras.models import load_model
+    from tensorflow.keras.utils import to_categorical
+    from almacen_rostros import empaquetar_rostros, cargar_rostros_empaquetados, dividir_validacion
+
+    dataset = os.path.join(directorio, "dataset_rostros")
+    empaquetar_rostros(dataset)
+    datos, etiquetas, class_indices = cargar_rostros_empaquetados(dataset)
+    _, val_idx = dividir_validacion(etiquetas)
+    val_idx = np.sort(val_idx)
+    modelo = load_model(os.path.join(directorio, "modelo.h5"))
+    perdida, precision = modelo.evaluate(
+        datos[val_idx], to_categorical(etiquetas[val_idx], len(class_indices)), verbose=0
+    )
+    return {"val_loss": round(float(perdida), 4), "val_accuracy": round(float(precision), 4)}
+
+
+def verificar_reanudacion(base_dir, epocas=10, matar_en=4, max_clases=3, imagenes_por_clase=20, semilla=0, tolerancia=0.1):
+    """Entrena un subconjunto sin interrupción y, aparte, lo mismo matando el proceso
+    (SIGKILL) tras la época `matar_en` y reanudándolo. Comprueba que la segunda ejecución
+    empezó en la época guardada y compara ambos modelos finales."""
+    import main
+    from benchmark_entrenamiento import preparar_subconjunto
+
+    def hijo(nombre):
+        return [sys.executable, os.path.abspath(__file__), "--directorio", os.path.join(base_dir, nombre),
+                "--epocas", str(epocas), "--semilla", str(semilla)]
+
+    for nombre in ("continuo", "reanudado"):
+        preparar_subconjunto(main.INPUT_DIR, os.path.join(base_dir, nombre, "train"), max_clases, imagenes_por_clase)
+        for previo in ("dataset_rostros", "modelo_checkpoint"):
+            shutil.rmtree(os.path.join(base_dir, nombre, previo), ignore_errors=True)
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(os.path.join(base_dir, nombre, EJECUCION_FILENAME))
+
+    subprocess.run(hijo("continuo"), check=True)
+
+    checkpoint = directorio_punto_control(os.path.join(base_dir, "reanudado", "modelo.h5"))
+    proceso = subprocess.Popen(hijo("reanudado"))
+    while proceso.poll() is None:
+        estado = leer_estado(checkpoint)
+        if estado is not None and estado["epoca"] >= matar_en:
+            proceso.kill()
+            break
+        time.sleep(0.2)
+    proceso.wait()
+    estado = leer_estado(checkpoint)
+    if estado is None:
+        raise RuntimeError("❌ El proceso terminó sin dejar punto de control: aumente --epocas o reduzca --matar-en.")
+    subprocess.run(hijo("reanudado"), check=True)
+
+    ejecucion_continuo = _leer_ejecucion(os.path.join(base_dir, "continuo"))
+    ejecucion_reanudado = _leer_ejecucion(os.path.join(base_dir, "reanudado"))
+    # Si la huella o las clases no coincidieran, restaurar() volvería en silencio a la época 0
+    reanudo = ejecucion_continuo.get("epoca_inicial") == 0 and ejecucion_reanudado.get("epoca_inicial") == estado["epoca"]
+    continuo, reanudado = _evaluar(os.path.join(base_dir, "continuo")), _evaluar(os.path.join(base_dir, "reanudado"))
+    diferencia = abs(continuo["val_accuracy"] - reanudado["val_accuracy"])
+    return {
+        "epocas": epocas,
+        "punto_control_en_epoca": estado["epoca"],
+        "reanudado_desde_epoca": ejecucion_reanudado.get("epoca_inicial"),
+        "reanudo_desde_punto_control": reanudo,
+        "continuo": continuo,
+        "reanudado": reanudado,
+        "diferencia_val_accuracy": round(diferencia, 4),
+        "punto_control_borrado": not os.path.isdir(checkpoint),
+        "equivalente": reanudo and diferencia <= tolerancia,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Reanuda el entrenamiento desde el último punto de control.")
+    parser.add_argument("--verificar", action="store_true", help="Mata un entrenamiento a mitad, lo reanuda y lo compara con uno continuo")
+    parser.add_argument("--directorio", help="Entrena aislado en este directorio (train/, dataset, modelo)")
+    parser.add_argument("--epocas", type=int)
+    parser.add_argument("--matar-en", type=int, default=4)
+    parser.add_argument("--semilla", type=int)
+    anadir_argumento_salida(parser)
+    args = parser.parse_args()
+
+    if args.verificar:
+        informe = verificar_reanudacion("./.verificacion_checkpoint/", args.epocas or 10, args.matar_en, semilla=args.semilla or 0)
+        guardar_informe(informe, args.salida)
+        sys.exit(0 if informe["equivalente"] else 1)
+    ejecucion = entrenar_sin_ventana(args.directorio, args.epocas, args.semilla)
+    print(f"[REANUDACIÓN] Épocas ejecutadas: {ejecucion['epoca_inicial']} -> {ejecucion['epoca_final']}")
+    if args.directorio:
+        # verificar_reanudacion lo lee para comprobar desde qué época continuó fit()
+        _escribir_json(os.path.join(args.directorio, EJECUCION_FILENAME), ejecucion)
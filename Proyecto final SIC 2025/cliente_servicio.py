@@ -0,0 +1,33 @@
+# ===============================================================
+# --- CLIENTE DEL SERVICIO DE RECONOCIMIENTO ---
+# ===============================================================
+# Habla con servicio_reconocimiento.py por HTTP. No importa TensorFlow ni el detector:
+# lo usan la aplicación Tk y reconocimiento_lote.py cuando hay un servicio en marcha.
+
+class ClienteServicio:
+    """Cliente HTTP de servicio_reconocimiento.py."""
+
+    def __init__(self, url, timeout=(2, 60)):
+        import requests
+        self.url = url.rstrip("/")
+        self.session = requests.Session()
+        self.timeout = timeout
+
+    def _post(self, ruta, datos=b""):
+        r = self.session.post(f"{self.url}{ruta}", data=datos, timeout=self.timeout,
+                              headers={"Content-Type": "application/octet-stream"})
+        cuerpo = r.json()
+        if r.status_code != 200:
+            raise RuntimeError(cuerpo.get("error", f"HTTP {r.status_code}"))
+        return cuerpo
+
+    def estado(self):
+        r = self.session.get(f"{self.url}/estado", timeout=self.timeout)
+        r.raise_for_status()
+        return r.json()
+
+    def reconocer(self, datos):
+        return self._post("/reconocer", datos)
+
+    def recargar(self):
+        return self._post("/recargar")
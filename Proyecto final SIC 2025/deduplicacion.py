@@ -0,0 +1,175 @@
+import argparse
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from PIL import Image
+
+from metricas_latencia import anadir_argumento_salida, guardar_informe
+
+# ===============================================================
+# --- DEDUPLICACIÓN PERCEPTUAL DE ./train/ ---
+# ===============================================================
+# Antes de crear_dataset_rostros se calcula un dHash de 64 bits por foto (decodificando
+# en modo draft, con varios hilos) y se agrupan las casi duplicadas de cada clase.
+# La búsqueda por distancia de Hamming usa índices por bloques (multi-index hashing):
+# con umbral d, el hash se parte en d+1 bloques y dos hashes a distancia <= d comparten
+# al menos un bloque idéntico, así que solo se comparan los que coinciden en algún bloque.
+# De cada grupo se conserva la foto de mayor resolución; las demás no se procesan
+# (y su recorte anterior se elimina), pero ./train/ no se modifica.
+
+PHASH_FILENAME = ".phash_rostros.json"
+UMBRAL_HAMMING = 4
+EXTENSIONES_VALIDAS = ('.png', '.jpg', '.jpeg', '.bmp', '.ppm', '.tif', '.tiff', '.gif', '.webp')
+
+
+def dhash(ruta, tam=8):
+    """dHash (diferencias horizontales) de tam*tam bits y tamaño original de la imagen."""
+    img = Image.open(ruta)
+    tam_original = img.size
+    img.draft('L', ((tam + 1) * 4, tam * 4))
+    gris = np.asarray(img.convert('L').resize((tam + 1, tam), Image.BILINEAR), dtype=np.int16)
+    bits = (gris[:, 1:] > gris[:, :-1]).flatten()
+    return int.from_bytes(np.packbits(bits).tobytes(), 'big'), tam_original
+
+
+def _cargar_cache(ruta):
+    try:
+        with open(ruta, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def _guardar_cache(ruta, cache):
+    tmp = ruta + ".tmp"
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(cache, f)
+    os.replace(tmp, ruta)
+
+def calcular_hashes(archivos, cache, num_hilos=8):
+    """archivos: [(clave, ruta)]. Reutiliza el hash si tamaño y fecha no cambiaron.
+    Devuelve {clave: (hash, (ancho, alto), bytes)} y la caché actualizada."""
+    resultado, pendientes, nueva_cache = {}, [], {}
+    for clave, ruta in archivos:
+        try:
+            st = os.stat(ruta)
+        except OSError:
+            continue
+        previa = cache.get(clave)
+        if previa and previa["tam"] == st.st_size and previa["mtime"] == st.st_mtime:
+            resultado[clave] = (int(previa["hash"], 16), tuple(previa["dim"]), st.st_size)
+            nueva_cache[clave] = previa
+        else:
+            pendientes.append((clave, ruta, st))
+
+    def calcular(item):
+        clave, ruta, st = item
+        try:
+            return clave, st, dhash(ruta)
+        except Exception as e:
+            print(f"❌ Error calculando hash de {os.path.basename(ruta)}: {e}")
+            return clave, st, None
+
+    with ThreadPoolExecutor(max_workers=num_hilos) as pool:
+        for clave, st, calculado in pool.map(calcular, pendientes):
+            if calculado is None:
+                continue
+            h, dim = calculado
+            resultado[clave] = (h, dim, st.st_size)
+            nueva_cache[clave] = {"hash": f"{h:016x}", "dim": list(dim), "tam": st.st_size, "mtime": st.st_mtime}
+    return resultado, nueva_cache
+
+
+def _bloques(bits_total, umbral):
+    """Desplazamientos y máscaras de los umbral+1 bloques en que se parte el hash."""
+    limites = np.linspace(0, bits_total, umbral + 2).astype(int)
+    return [(int(ini), (1 << int(fin - ini)) - 1) for ini, fin in zip(limites[:-1], limites[1:])]
+
+def agrupar_duplicados(hashes, umbral=UMBRAL_HAMMING, bits_total=64):
+    """Grupos (listas de índices, tamaño >= 2) de hashes a distancia de Hamming <= umbral."""
+    padre = list(range(len(hashes)))
+
+    def raiz(i):
+        while padre[i] != i:
+            padre[i] = padre[padre[i]]
+            i = padre[i]
+        return i
+
+    comparados = set()
+    for desplazamiento, mascara in _bloques(bits_total, umbral):
+        cubetas = {}
+        for i, h in enumerate(hashes):
+            cubetas.setdefault((h >> desplazamiento) & mascara, []).append(i)
+        for indices in cubetas.values():
+            for a in range(len(indices)):
+                for b in range(a + 1, len(indices)):
+                    i, j = indices[a], indices[b]
+                    if (i, j) in comparados:
+                        continue
+                    comparados.add((i, j))
+                    if bin(hashes[i] ^ hashes[j]).count("1") <= umbral:
+                        padre[raiz(i)] = raiz(j)
+
+    grupos = {}
+    for i in range(len(hashes)):
+        grupos.setdefault(raiz(i), []).append(i)
+    return [g for g in grupos.values() if len(g) > 1]
+
+
+def buscar_duplicados(input_dir, cache_dir, umbral=UMBRAL_HAMMING, num_hilos=8):
+    """Devuelve (claves 'clase/archivo' a excluir, informe)."""
+    archivos = []
+    for clase in sorted(os.listdir(input_dir)):
+        clase_path = os.path.join(input_dir, clase)
+        if os.path.isdir(clase_path):
+            archivos.extend(
+                (f"{clase}/{nombre}", os.path.join(clase_path, nombre))
+                for nombre in sorted(os.listdir(clase_path)) if nombre.lower().endswith(EXTENSIONES_VALIDAS)
+            )
+
+    ruta_cache = os.path.join(cache_dir, PHASH_FILENAME)
+    hashes, cache = calcular_hashes(archivos, _cargar_cache(ruta_cache), num_hilos)
+    os.makedirs(cache_dir, exist_ok=True)
+    _guardar_cache(ruta_cache, cache)
+
+    claves = sorted(hashes)
+    grupos = agrupar_duplicados([hashes[c][0] for c in claves], umbral)
+    excluir, grupos_informe, entre_clases = set(), [], 0
+    for grupo in grupos:
+        miembros = [claves[i] for i in grupo]
+        # Solo se fusionan duplicados de la misma clase; entre clases distintas es un conflicto de etiqueta
+        por_clase = {}
+        for clave in miembros:
+            por_clase.setdefault(clave.split("/", 1)[0], []).append(clave)
+        if len(por_clase) > 1:
+            entre_clases += 1
+        for misma_clase in por_clase.values():
+            if len(misma_clase) < 2:
+                continue
+            # Se conserva la de mayor resolución (y, a igualdad, el archivo más grande)
+            misma_clase.sort(key=lambda c: (hashes[c][1][0] * hashes[c][1][1], hashes[c][2]), reverse=True)
+            excluir.update(misma_clase[1:])
+            grupos_informe.append({"conservada": misma_clase[0], "descartadas": misma_clase[1:]})
+
+    total = len(hashes)
+    informe = {
+        "imagenes": total,
+        "grupos": len(grupos_informe),
+        "descartadas": len(excluir),
+        "ahorro_por_epoca_pct": round(len(excluir) / total * 100, 1) if total else 0.0,
+        "grupos_entre_clases": entre_clases,
+        "detalle": grupos_informe,
+    }
+    return excluir, informe
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Busca fotos casi duplicadas en ./train/ (dHash + Hamming indexado).")
+    parser.add_argument("--entrada", default="./train/")
+    parser.add_argument("--umbral", type=int, default=UMBRAL_HAMMING, help="Distancia de Hamming máxima (bits de 64)")
+    anadir_argumento_salida(parser)
+    args = parser.parse_args()
+
+    # La caché de hashes se guarda junto al manifiesto del dataset, como en crear_dataset_rostros
+    _, informe = buscar_duplicados(args.entrada, "./dataset_rostros/", args.umbral)
+    guardar_informe(informe, args.salida)
@@ -0,0 +1,362 @@
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# ===============================================================
+# --- DESCARGA DE IMÁGENES (sesión compartida + caché en disco) ---
+# ===============================================================
+# Todas las descargas comparten una sesión HTTP con pool de conexiones y timeout.
+# Las resoluciones página Wikimedia -> URL de imagen y los bytes de cada imagen se
+# guardan en una caché en disco con límite de tamaño (se expulsan los menos usados).
+
+CACHE_DIR = ".cache_imagenes"
+CACHE_MAX_BYTES = 500 * 1024 * 1024
+TIMEOUT = (5, 30)  # (conexión, lectura) en segundos
+TAM_POOL = 16
+HEADERS = {"User-Agent": "Mozilla/5.0"}
+
+
+def es_url_imagen(url):
+    extensiones = (".jpg", ".jpeg", ".png", ".bmp", ".gif", ".webp")
+    return url.lower().endswith(extensiones)
+
+
+class CacheDisco:
+    """Caché clave -> bytes en un directorio, con expulsión LRU cuando supera max_bytes.
+    La fecha de modificación de cada archivo marca su último uso."""
+
+    def __init__(self, directorio=CACHE_DIR, max_bytes=CACHE_MAX_BYTES):
+        self.directorio = directorio
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        os.makedirs(directorio, exist_ok=True)
+        self.tam_total = sum(e.stat().st_size for e in os.scandir(directorio) if e.is_file())
+
+    def _ruta(self, espacio, clave):
+        digest = hashlib.sha256(clave.encode("utf-8")).hexdigest()
+        return os.path.join(self.directorio, f"{espacio}_{digest}")
+
+    def leer(self, espacio, clave):
+        ruta = self._ruta(espacio, clave)
+        try:
+            with open(ruta, 'rb') as f:
+                datos = f.read()
+            os.utime(ruta)
+            return datos
+        except OSError:
+            return None
+
+    def ruta_existente(self, espacio, clave):
+        """Ruta del archivo en caché (marcándolo como usado) o None; para quien necesita el archivo, no los bytes."""
+        ruta = self._ruta(espacio, clave)
+        try:
+            os.utime(ruta)
+            return ruta
+        except OSError:
+            return None
+
+    def escribir(self, espacio, clave, datos):
+        if len(datos) > self.max_bytes:
+            return
+        ruta = self._ruta(espacio, clave)
+        tmp = f"{ruta}.{threading.get_ident()}.tmp"
+        with open(tmp, 'wb') as f:
+            f.write(datos)
+        with self.lock:
+            # Si la clave ya existía, su tamaño anterior deja de contar
+            try:
+                anterior = os.path.getsize(ruta)
+            except OSError:
+                anterior = 0
+            os.replace(tmp, ruta)
+            self.tam_total += len(datos) - anterior
+            if self.tam_total > self.max_bytes:
+                self._expulsar()
+
+    def _expulsar(self):
+        """Borra los archivos menos usados hasta quedar por debajo del 90% del límite."""
+        entradas = sorted(
+            (e for e in os.scandir(self.directorio) if e.is_file() and not e.name.endswith(".tmp")),
+            key=lambda e: e.stat().st_mtime,
+        )
+        total = sum(e.stat().st_size for e in entradas)
+        objetivo = self.max_bytes * 0.9
+        for e in entradas:
+            if total <= objetivo:
+                break
+            try:
+                tam = e.stat().st_size
+                os.remove(e.path)
+                total -= tam
+            except OSError:
+                pass
+        self.tam_total = total
+
+    def limpiar(self):
+        with self.lock:
+            for e in os.scandir(self.directorio):
+                if e.is_file():
+                    os.remove(e.path)
+            self.tam_total = 0
+
+
+class ClienteImagenes:
+    def __init__(self, cache=None, usar_cache=True, timeout=TIMEOUT, tam_pool=TAM_POOL):
+        # requests se importa aquí para no retrasar el arranque de la aplicación
+        import requests
+        from requests.adapters import HTTPAdapter
+        self.session = requests.Session()
+        self.session.headers.update(HEADERS)
+        adapter = HTTPAdapter(pool_connections=tam_pool, pool_maxsize=tam_pool, max_retries=2)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.timeout = timeout
+        self.tam_pool = tam_pool
+        self.cache = (cache or CacheDisco()) if usar_cache else None
+
+    def _get(self, url):
+        response = self.session.get(url, timeout=self.timeout)
+        response.raise_for_status()
+        return response
+
+    def resolver_wikimedia(self, url):
+        """URL de la imagen principal de una página de Wikimedia Commons."""
+        if self.cache is not None:
+            guardada = self.cache.leer("pagina", url)
+            if guardada is not None:
+                return guardada.decode("utf-8")
+
+        from bs4 import BeautifulSoup
+        html = self._get(url).text
+        soup = BeautifulSoup(html, "html.parser")
+        candidates = soup.find_all("img")
+        for tag in candidates:
+            src = tag.get("src")
+            if src and ("upload.wikimedia.org" in src or src.startswith("//upload")):
+                if src.startswith("//"): src = "https:" + src
+                if self.cache is not None:
+                    self.cache.escribir("pagina", url, src.encode("utf-8"))
+                return src
+        raise ValueError("❌ No se pudo extraer la imagen de Wikimedia.")
+
+    def obtener_bytes(self, url):
+        """Bytes de la imagen de una URL directa o de una página de Wikimedia."""
+        if es_url_imagen(url):
+            url_img = url
+        elif "commons.wikimedia.org/wiki/" in url:
+            url_img = self.resolver_wikimedia(url)
+        else:
+            raise ValueError("❌ La URL no es una imagen directa ni página compatible.")
+
+        if self.cache is not None:
+            guardada = self.cache.leer("imagen", url_img)
+            if guardada is not None:
+                return guardada
+        datos = self._get(url_img).content
+        if self.cache is not None:
+            self.cache.escribir("imagen", url_img, datos)
+        return datos
+
+    def obtener_varias(self, urls, max_concurrentes=8):
+        """Descarga varias URLs con concurrencia acotada (no más que el pool de conexiones).
+        Devuelve [(url, bytes o None, error o None)] en el mismo orden de entrada."""
+        def descargar(url):
+            try:
+                return url, self.obtener_bytes(url), None
+            except Exception as e:
+                return url, None, e
+
+        with ThreadPoolExecutor(max_workers=max(1, min(max_concurrentes, self.tam_pool))) as pool:
+            return list(pool.map(descargar, urls))
+
+
+_cliente = None
+_cliente_lock = threading.Lock()
+
+def obtener_cliente():
+    """Cliente compartido por toda la aplicación (una sola sesión y pool de conexiones)."""
+    global _cliente
+    with _cliente_lock:
+        if _cliente is None:
+            _cliente = ClienteImagenes()
+        return _cliente
+
+
+# ===============================================================
+# --- VERIFICACIÓN CON UN SERVIDOR HTTP LOCAL ---
+# ===============================================================
+# python descarga_imagenes.py --verificar levanta un http.server en 127.0.0.1 que sirve
+# imágenes falsas y una página tipo Wikimedia, y comprueba contra él el comportamiento
+# del cliente: reutilización de conexiones, timeout con reintento, concurrencia acotada
+# de obtener_varias, aciertos y fallos de caché, y expulsión por tamaño.
+
+TAM_IMAGEN_PRUEBA = 10 * 1024
+
+
+def _crear_servidor_prueba():
+    """Servidor local que cuenta peticiones por ruta, conexiones y descargas simultáneas
+    (estas últimas solo en /concurrente_*, para no mezclar las peticiones colgadas de otras pruebas)."""
+    from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+    estado = {"peticiones": {}, "puertos": set(), "en_curso": 0, "max_en_curso": 0, "lock": threading.Lock()}
+
+    class Manejador(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"  # keep-alive: el cliente puede reutilizar la conexión
+
+        def log_message(self, *args):
+            pass
+
+        def do_GET(self):
+            concurrente = self.path.startswith("/concurrente")
+            with estado["lock"]:
+                n = estado["peticiones"].get(self.path, 0) + 1
+                estado["peticiones"][self.path] = n
+                estado["puertos"].add(self.client_address[1])
+                if concurrente:
+                    estado["en_curso"] += 1
+                    estado["max_en_curso"] = max(estado["max_en_curso"], estado["en_curso"])
+            try:
+                if self.path.startswith("/colgada"):
+                    time.sleep(2.0)
+                elif self.path.startswith("/lenta") and n == 1:
+                    # Solo la primera petición supera el timeout de lectura: el reintento responde
+                    time.sleep(2.0)
+                elif concurrente:
+                    time.sleep(0.2)
+                if self.path.startswith("/wiki/"):
+                    cuerpo = (f'<html><body><img src="http://127.0.0.1:{self.server.server_port}'
+                              f'/upload.wikimedia.org/foto.jpg"></body></html>').encode("utf-8")
+                    tipo = "text/html"
+                else:
+                    cuerpo, tipo = bytes(TAM_IMAGEN_PRUEBA), "image/jpeg"
+                try:
+                    self.send_response(200)
+                    self.send_header("Content-Type", tipo)
+                    self.send_header("Content-Length", str(len(cuerpo)))
+                    self.end_headers()
+                    self.wfile.write(cuerpo)
+                except OSError:
+                    pass  # el cliente ya cerró la conexión por timeout
+            finally:
+                if concurrente:
+                    with estado["lock"]:
+                        estado["en_curso"] -= 1
+
+    servidor = ThreadingHTTPServer(("127.0.0.1", 0), Manejador)
+    servidor.daemon_threads = True
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    return servidor, estado
+
+
+def verificar_cliente():
+    """Ejecuta las comprobaciones y devuelve {nombre: {"ok": bool, ...detalles}}."""
+    servidor, estado = _crear_servidor_prueba()
+    base = f"http://127.0.0.1:{servidor.server_port}"
+    directorio = tempfile.mkdtemp(prefix="verificacion_descargas_")
+    resultados = {}
+
+    def peticiones(ruta):
+        with estado["lock"]:
+            return estado["peticiones"].get(ruta, 0)
+
+    try:
+        # 1) Varias descargas seguidas con la misma sesión usan una sola conexión TCP
+        cliente = ClienteImagenes(usar_cache=False)
+        with estado["lock"]:
+            estado["puertos"].clear()
+        for i in range(5):
+            cliente.obtener_bytes(f"{base}/reutilizada_{i}.jpg")
+        with estado["lock"]:
+            conexiones = len(estado["puertos"])
+        resultados["reutilizacion_conexion"] = {"ok": conexiones == 1, "descargas": 5, "conexiones": conexiones}
+
+        # 2) Timeout de lectura: el primer intento expira y el reintento obtiene la imagen
+        cliente = ClienteImagenes(usar_cache=False, timeout=(1, 0.5))
+        datos = cliente.obtener_bytes(f"{base}/lenta.jpg")
+        resultados["timeout_con_reintento"] = {
+            "ok": len(datos) == TAM_IMAGEN_PRUEBA and peticiones("/lenta.jpg") == 2,
+            "intentos": peticiones("/lenta.jpg"),
+        }
+        # ... y si el servidor nunca responde, se rinde tras los reintentos sin colgarse
+        inicio = time.perf_counter()
+        try:
+            cliente.obtener_bytes(f"{base}/colgada.jpg")
+            fallo = False
+        except Exception:
+            fallo = True
+        resultados["timeout_agotado"] = {
+            "ok": fallo and peticiones("/colgada.jpg") == 3,
+            "intentos": peticiones("/colgada.jpg"),
+            "segundos": round(time.perf_counter() - inicio, 2),
+        }
+
+        # 3) obtener_varias no supera max_concurrentes descargas simultáneas
+        cliente = ClienteImagenes(usar_cache=False)
+        with estado["lock"]:
+            estado["max_en_curso"] = 0
+        urls = [f"{base}/concurrente_{i}.jpg" for i in range(12)]
+        salida = cliente.obtener_varias(urls, max_concurrentes=3)
+        with estado["lock"]:
+            maximo = estado["max_en_curso"]
+        resultados["concurrencia_acotada"] = {
+            "ok": maximo <= 3 and all(e is None for _, _, e in salida) and [u for u, _, _ in salida] == urls,
+            "max_simultaneas": maximo,
+            "limite": 3,
+        }
+
+        # 4) Caché: la página y la imagen se piden una vez; la segunda consulta sale del disco
+        cliente = ClienteImagenes(cache=CacheDisco(os.path.join(directorio, "cache")))
+        pagina = f"{base}/wiki/Pagina_prueba"
+        primera = cliente.resolver_wikimedia(pagina)
+        segunda = cliente.resolver_wikimedia(pagina)
+        resultados["cache_resolucion_pagina"] = {
+            "ok": primera == segunda and peticiones("/wiki/Pagina_prueba") == 1,
+            "peticiones_pagina": peticiones("/wiki/Pagina_prueba"),
+        }
+        url_img = f"{base}/cacheada.jpg"
+        a, b = cliente.obtener_bytes(url_img), cliente.obtener_bytes(url_img)
+        resultados["cache_bytes"] = {"ok": a == b and peticiones("/cacheada.jpg") == 1, "peticiones_imagen": peticiones("/cacheada.jpg")}
+        cliente.obtener_bytes(f"{base}/otra.jpg")
+        resultados["cache_fallo"] = {"ok": peticiones("/otra.jpg") == 1, "peticiones_imagen": peticiones("/otra.jpg")}
+
+        # 5) Expulsión por tamaño y contabilidad correcta al sobrescribir una clave
+        limite = 5 * TAM_IMAGEN_PRUEBA
+        cache = CacheDisco(os.path.join(directorio, "expulsion"), max_bytes=limite)
+        for _ in range(3):
+            cache.escribir("imagen", "repetida", bytes(TAM_IMAGEN_PRUEBA))
+        repetida_ok = cache.tam_total == TAM_IMAGEN_PRUEBA
+        for i in range(10):
+            cache.escribir("imagen", f"clave_{i}", bytes(TAM_IMAGEN_PRUEBA))
+            time.sleep(0.01)  # fechas de modificación distintas para el orden LRU
+        en_disco = sum(e.stat().st_size for e in os.scandir(cache.directorio) if e.is_file())
+        resultados["expulsion_por_tamano"] = {
+            "ok": repetida_ok and en_disco <= limite and cache.tam_total == en_disco
+                  and cache.leer("imagen", "clave_9") is not None and cache.leer("imagen", "clave_0") is None,
+            "limite_bytes": limite,
+            "bytes_en_disco": en_disco,
+            "tam_total_contado": cache.tam_total,
+            "sobrescritura_sin_doble_conteo": repetida_ok,
+        }
+    finally:
+        servidor.shutdown()
+        shutil.rmtree(directorio, ignore_errors=True)
+    return resultados
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Cliente de descargas de imágenes.")
+    parser.add_argument("--verificar", action="store_true", help="Comprueba el cliente contra un servidor HTTP local")
+    args = parser.parse_args()
+
+    if args.verificar:
+        resultados = verificar_cliente()
+        print(json.dumps(resultados, ensure_ascii=False, indent=2))
+        sys.exit(0 if all(r["ok"] for r in resultados.values()) else 1)
+    parser.print_help()
@@ -0,0 +1,147 @@
+import argparse
+import os
+import time
+import numpy as np
+
+from almacen_rostros import empaquetar_rostros, cargar_rostros_empaquetados, dividir_validacion
+from metricas_latencia import anadir_argumento_salida, guardar_informe
+
+# ===============================================================
+# --- DESTILACIÓN: estudiante compacto a partir del modelo .h5 ---
+# ===============================================================
+# El modelo actual pasa un mapa de 17x17x128 por Flatten -> Dense(256): ahí están casi
+# todos sus parámetros. El estudiante usa convoluciones separables en profundidad
+# (depthwise + pointwise) y GlobalAveragePooling, y aprende de las salidas suavizadas
+# del maestro (temperatura T) además de las etiquetas reales:
+#   pérdida = ALFA * CE(etiqueta, softmax(z)) + (1 - ALFA) * T² * KL(maestro_T, softmax(z / T))
+# Las salidas del maestro se calculan una vez sobre el almacén uint8 de dataset_rostros/.
+# Se guarda como <modelo>_estudiante.h5 y se usa con BACKEND_INFERENCIA = "estudiante".
+
+TEMPERATURA = 4.0
+ALFA = 0.3
+EPOCAS_DESTILACION = 60
+
+
+def ruta_estudiante(modelo_path):
+    return f"{os.path.splitext(modelo_path)[0]}_estudiante.h5"
+
+
+def construir_estudiante(num_clases, tam_rostro, temperatura=TEMPERATURA):
+    """Devuelve (modelo de entrenamiento con salidas 'probs' y 'probs_t', modelo de inferencia con 'probs')."""
+    from tensorflow.keras.models import Model
+    from tensorflow.keras.layers import (
+        Input, Resizing, Rescaling, Conv2D, SeparableConv2D, BatchNormalization, MaxPooling2D,
+        GlobalAveragePooling2D, Dropout, Dense, ReLU, Softmax, Lambda,
+    )
+
+    entrada = Input(shape=(None, None, 3))
+    x = Rescaling(1./255)(Resizing(tam_rostro, tam_rostro)(entrada))
+    x = Conv2D(16, (3, 3), strides=2, padding='same', activation='relu')(x)
+    for filtros in (32, 64, 128):
+        x = SeparableConv2D(filtros, (3, 3), padding='same', use_bias=False)(x)
+        x = BatchNormalization()(x)
+        x = MaxPooling2D(2, 2)(ReLU()(x))
+    x = Dropout(0.2)(GlobalAveragePooling2D()(x))
+    logits = Dense(num_clases)(x)
+    probs = Softmax(name='probs')(logits)
+    probs_t = Softmax(name='probs_t')(Lambda(lambda z: z / temperatura)(logits))
+    return Model(entrada, [probs, probs_t]), Model(entrada, probs)
+
+
+def suavizar(probs, temperatura=TEMPERATURA):
+    """softmax(log(p) / T): equivale a dividir los logits del maestro por T."""
+    logits = np.log(np.clip(probs, 1e-7, 1.0)) / temperatura
+    logits -= logits.max(axis=1, keepdims=True)
+    exp = np.exp(logits)
+    return (exp / exp.sum(axis=1, keepdims=True)).astype(np.float32)
+
+
+def _latencia_por_rostro(modelo, datos, repeticiones=10, tam_lote=32):
+    """ms por rostro con un solo rostro y con un lote (mediana de las repeticiones)."""
+    lote = np.asarray(datos[:tam_lote])
+    resultado = {}
+    for nombre, entrada in (("1_rostro", lote[:1]), (f"lote_{len(lote)}", lote)):
+        modelo.predict(entrada, batch_size=len(entrada), verbose=0)  # calentamiento
+        tiempos = []
+        for _ in range(repeticiones):
+            inicio = time.perf_counter()
+            modelo.predict(entrada, batch_size=len(entrada), verbose=0)
+            tiempos.append((time.perf_counter() - inicio) * 1000 / len(entrada))
+        resultado[nombre] = round(float(np.median(tiempos)), 3)
+    return resultado
+
+def describir_modelo(modelo, ruta, datos_val, etiquetas_val):
+    pred = np.argmax(modelo.predict(datos_val, batch_size=64, verbose=0), axis=1)
+    return {
+        "parametros": int(modelo.count_params()),
+        "archivo_mb": round(os.path.getsize(ruta) / 2**20, 2),
+        "latencia_ms_por_rostro": _latencia_por_rostro(modelo, datos_val),
+        "val_accuracy": round(float(np.mean(pred == etiquetas_val)), 4) if len(etiquetas_val) else None,
+    }, pred
+
+
+def destilar(modelo_path, classes_path, dataset_dir, epocas=EPOCAS_DESTILACION, temperatura=TEMPERATURA, alfa=ALFA, informar=print):
+    """Entrena el estudiante con el maestro de modelo_path, lo guarda y devuelve el informe comparativo."""
+    from tensorflow.keras.callbacks import EarlyStopping
+    from tensorflow.keras.losses import KLDivergence
+    from tensorflow.keras.utils import to_categorical
+    from main import cargar_modelo_entrenado, TAM_ROSTRO
+
+    maestro, class_indices = cargar_modelo_entrenado(modelo_path, classes_path)
+    empaquetar_rostros(dataset_dir)
+    datos, etiquetas, clases_dataset = cargar_rostros_empaquetados(dataset_dir)
+    if clases_dataset != class_indices:
+        raise ValueError("❌ Las clases de dataset_rostros/ no coinciden con las del modelo: vuelva a entrenarlo primero.")
+    num_clases = len(class_indices)
+
+    train_idx, val_idx = dividir_validacion(etiquetas)
+    train_idx, val_idx = np.sort(train_idx), np.sort(val_idx)
+    x_train, x_val = np.asarray(datos[train_idx]), np.asarray(datos[val_idx])
+    informar(f"Calculando salidas del maestro para {len(train_idx)} rostros...")
+    suaves_train = suavizar(maestro.predict(x_train, batch_size=64, verbose=0), temperatura)
+    suaves_val = suavizar(maestro.predict(x_val, batch_size=64, verbose=0), temperatura)
+
+    entrenamiento, estudiante = construir_estudiante(num_clases, TAM_ROSTRO, temperatura)
+    entrenamiento.compile(
+        optimizer='adam',
+        loss={'probs': 'categorical_crossentropy', 'probs_t': KLDivergence()},
+        loss_weights={'probs': alfa, 'probs_t': (1 - alfa) * temperatura ** 2},
+        metrics={'probs': 'accuracy'},
+    )
+    inicio = time.perf_counter()
+    entrenamiento.fit(
+        x_train, {'probs': to_categorical(etiquetas[train_idx], num_clases), 'probs_t': suaves_train},
+        validation_data=(x_val, {'probs': to_categorical(etiquetas[val_idx], num_clases), 'probs_t': suaves_val}),
+        epochs=epocas, batch_size=32, verbose=2,
+        callbacks=[EarlyStopping(monitor='val_loss', patience=10, restore_best_weights=True)],
+    )
+    t_entrenamiento = time.perf_counter() - inicio
+
+    destino = ruta_estudiante(modelo_path)
+    estudiante.save(destino)
+    info_maestro, pred_maestro = describir_modelo(maestro, modelo_path, x_val, etiquetas[val_idx])
+    info_estudiante, pred_estudiante = describir_modelo(estudiante, destino, x_val, etiquetas[val_idx])
+    return {
+        "temperatura": temperatura,
+        "alfa": alfa,
+        "entrenamiento_s": round(t_entrenamiento, 1),
+        "maestro": info_maestro,
+        "estudiante": info_estudiante,
+        "reduccion_parametros": round(info_maestro["parametros"] / info_estudiante["parametros"], 1),
+        "acuerdo_con_maestro": round(float(np.mean(pred_maestro == pred_estudiante)), 4) if len(val_idx) else None,
+        "modelo_estudiante": destino,
+    }
+
+
+if __name__ == "__main__":
+    from main import MODELO_FILENAME, CLASSES_FILENAME, OUTPUT_DIR
+
+    parser = argparse.ArgumentParser(description="Destila el modelo .h5 en un estudiante compacto y compara ambos.")
+    parser.add_argument("--epocas", type=int, default=EPOCAS_DESTILACION)
+    parser.add_argument("--temperatura", type=float, default=TEMPERATURA)
+    parser.add_argument("--alfa", type=float, default=ALFA)
+    anadir_argumento_salida(parser)
+    args = parser.parse_args()
+
+    informe = destilar(MODELO_FILENAME, CLASSES_FILENAME, OUTPUT_DIR, args.epocas, args.temperatura, args.alfa)
+    guardar_informe(informe, args.salida)
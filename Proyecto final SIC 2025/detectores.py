@@ -0,0 +1,123 @@
+import numpy as np
+import os
+import threading
+
+# ===============================================================
+# --- DETECTORES DE ROSTROS INTERCAMBIABLES ---
+# ===============================================================
+# Todos los backends exponen detect_faces(img) con el mismo formato que MTCNN:
+# una lista de {'box': [x, y, w, h], 'confidence': float}, ordenada de modo que
+# el primer elemento sea el rostro principal (el que usa crear_dataset_rostros).
+
+DETECTORES_DISPONIBLES = ("mtcnn", "piramide", "haar", "dnn")
+
+# Modelo SSD de OpenCV (res10). No viene con OpenCV: hay que descargar ambos archivos.
+DNN_PROTOTXT = "deploy.prototxt"
+DNN_CAFFEMODEL = "res10_300x300_ssd_iter_140000.caffemodel"
+
+
+class DetectorMTCNN:
+    nombre = "mtcnn"
+
+    def __init__(self):
+        from mtcnn import MTCNN
+        self._mtcnn = MTCNN()
+
+    def detect_faces(self, img):
+        return self._mtcnn.detect_faces(img)
+
+
+class DetectorPiramide:
+    """MTCNN sobre una versión reducida de la imagen; las cajas se reescalan al tamaño original."""
+    nombre = "piramide"
+
+    def __init__(self, lado_max=640, base=None):
+        self.lado_max = lado_max
+        self._base = base or DetectorMTCNN()
+
+    def detect_faces(self, img):
+        from PIL import Image
+        alto, ancho = img.shape[:2]
+        escala = self.lado_max / max(alto, ancho)
+        if escala >= 1.0:
+            return self._base.detect_faces(img)
+        reducida = np.array(Image.fromarray(img).resize((round(ancho * escala), round(alto * escala)), Image.BILINEAR))
+        detecciones = self._base.detect_faces(reducida)
+        for det in detecciones:
+            det['box'] = [int(round(v / escala)) for v in det['box']]
+            if 'keypoints' in det:
+                det['keypoints'] = {k: (int(round(x / escala)), int(round(y / escala))) for k, (x, y) in det['keypoints'].items()}
+        return detecciones
+
+
+class DetectorHaar:
+    """Cascada Haar de OpenCV (frontal). Muy rápida en CPU, menos robusta a poses y oclusiones."""
+    nombre = "haar"
+
+    def __init__(self, factor_escala=1.1, vecinos_min=5, tam_min=(30, 30)):
+        import cv2
+        self._cv2 = cv2
+        self._cascada = cv2.CascadeClassifier(os.path.join(cv2.data.haarcascades, "haarcascade_frontalface_default.xml"))
+        self.factor_escala = factor_escala
+        self.vecinos_min = vecinos_min
+        self.tam_min = tam_min
+
+    def detect_faces(self, img):
+        gris = self._cv2.cvtColor(np.ascontiguousarray(img[..., :3]), self._cv2.COLOR_RGB2GRAY)
+        cajas = self._cascada.detectMultiScale(
+            gris, scaleFactor=self.factor_escala, minNeighbors=self.vecinos_min, minSize=self.tam_min
+        )
+        # Sin puntuación de confianza: el rostro más grande va primero
+        cajas = sorted((tuple(int(v) for v in c) for c in cajas), key=lambda c: c[2] * c[3], reverse=True)
+        return [{'box': list(c), 'confidence': 1.0} for c in cajas]
+
+
+class DetectorDNN:
+    """Detector SSD (ResNet-10) del módulo dnn de OpenCV.
+    setInput + forward modifican el estado de la red: se serializan con un lock para poder
+    compartir el detector entre hilos (p. ej. las peticiones de servicio_reconocimiento.py)."""
+    nombre = "dnn"
+
+    def __init__(self, prototxt=DNN_PROTOTXT, caffemodel=DNN_CAFFEMODEL, umbral=0.6):
+        import cv2
+        if not (os.path.exists(prototxt) and os.path.exists(caffemodel)):
+            raise FileNotFoundError(
+                f"❌ Faltan los archivos del detector DNN ('{prototxt}', '{caffemodel}'). Descárguelos de OpenCV."
+            )
+        self._cv2 = cv2
+        self._red = cv2.dnn.readNetFromCaffe(prototxt, caffemodel)
+        self._lock = threading.Lock()
+        self.umbral = umbral
+
+    def detect_faces(self, img):
+        alto, ancho = img.shape[:2]
+        bgr = self._cv2.cvtColor(np.ascontiguousarray(img[..., :3]), self._cv2.COLOR_RGB2BGR)
+        blob = self._cv2.dnn.blobFromImage(self._cv2.resize(bgr, (300, 300)), 1.0, (300, 300), (104.0, 177.0, 123.0))
+        with self._lock:
+            self._red.setInput(blob)
+            salida = self._red.forward()[0, 0].copy()
+        detecciones = []
+        for _, _, conf, x1, y1, x2, y2 in salida:
+            if conf < self.umbral:
+                continue
+            # El SSD puede devolver coordenadas fuera de [0, 1]: se recortan a la imagen
+            x1, y1 = max(0, int(x1 * ancho)), max(0, int(y1 * alto))
+            x2, y2 = min(ancho, int(x2 * ancho)), min(alto, int(y2 * alto))
+            if x2 <= x1 or y2 <= y1:
+                continue
+            detecciones.append({'box': [x1, y1, x2 - x1, y2 - y1], 'confidence': float(conf)})
+        detecciones.sort(key=lambda d: d['confidence'], reverse=True)
+        return detecciones
+
+
+def crear_detector(nombre="mtcnn"):
+    """Construye el backend de detección indicado."""
+    if nombre == "mtcnn":
+        return DetectorMTCNN()
+    if nombre == "piramide":
+        return DetectorPiramide()
+    if nombre == "haar":
+        return DetectorHaar()
+    if nombre == "dnn":
+        return DetectorDNN()
+    raise ValueError(f"❌ Detector desconocido: '{nombre}'. Opciones: {', '.join(DETECTORES_DISPONIBLES)}")
@@ -0,0 +1,148 @@
+import numpy as np
+import os
+import sys
+import time
+
+# ===============================================================
+# --- GALERÍA DE EMBEDDINGS (reconocimiento sin reentrenar) ---
+# ===============================================================
+# Cada rostro se convierte en un vector de longitud fija (la capa Dense de 256
+# unidades de la CNN, normalizada L2). La galería guarda los vectores de cada
+# persona en disco y el reconocimiento es una búsqueda del vecino más cercano
+# (similitud coseno) con rechazo a "No familiar" por debajo de un umbral.
+
+GALERIA_FILENAME = "galeria_rostros.npz"
+UMBRAL_SIMILITUD = 0.80
+
+
+def crear_extractor_embeddings(modelo):
+    """Devuelve un modelo que corta la CNN en su última capa Dense oculta."""
+    from tensorflow.keras.models import Model
+    from tensorflow.keras.layers import Dense
+    if not hasattr(modelo, "layers"):
+        raise ValueError("❌ La galería de embeddings necesita el modelo Keras (BACKEND_INFERENCIA = \"keras\").")
+    capas_dense = [capa for capa in modelo.layers[:-1] if isinstance(capa, Dense)]
+    if not capas_dense:
+        raise ValueError("❌ El modelo no tiene una capa Dense oculta para extraer embeddings.")
+    return Model(inputs=modelo.inputs, outputs=capas_dense[-1].output)
+
+
+class GaleriaEmbeddings:
+    def __init__(self, modelo, ruta=GALERIA_FILENAME, huella_modelo="", informar=print):
+        self.extractor = crear_extractor_embeddings(modelo)
+        self.ruta = ruta
+        self.huella_modelo = huella_modelo
+        self.informar = informar
+        self.embeddings = np.zeros((0, self.extractor.output_shape[-1]), dtype=np.float32)
+        self.nombres = np.zeros((0,), dtype=object)
+        if os.path.exists(ruta):
+            self.cargar()
+
+    # --- Persistencia ---
+    def cargar(self):
+        with np.load(self.ruta, allow_pickle=False) as datos:
+            embeddings = datos["embeddings"].astype(np.float32)
+            nombres = datos["nombres"].astype(object)
+            huella = str(datos["huella_modelo"]) if "huella_modelo" in datos.files else ""
+        if embeddings.shape[1] != self.embeddings.shape[1]:
+            raise ValueError(
+                f"❌ La galería '{self.ruta}' tiene dimensión {embeddings.shape[1]}, "
+                f"el modelo actual produce {self.embeddings.shape[1]}."
+            )
+        if self.huella_modelo and huella != self.huella_modelo:
+            # Los embeddings dependen de los pesos: compararlos con los del modelo nuevo no tiene
+            # sentido y podría aceptar a la persona equivocada. Se empieza con la galería vacía
+            self.informar(
+                f"⚠️ La galería '{self.ruta}' se generó con otro modelo: se descartan sus "
+                f"{len(embeddings)} rostros. Vuelva a inscribir a las personas."
+            )
+            return
+        self.embeddings, self.nombres = embeddings, nombres
+
+    def guardar(self):
+        """Guarda la galería de forma atómica (archivo temporal + replace)."""
+        tmp = self.ruta + ".tmp.npz"
+        np.savez(tmp, embeddings=self.embeddings, nombres=self.nombres.astype(str),
+                 huella_modelo=np.array(self.huella_modelo))
+        os.replace(tmp, self.ruta)
+
+    # --- Embeddings ---
+    def embeber(self, lote):
+        """lote: (N, 150, 150, 3) uint8 en 0-255 (el modelo escala en su grafo). Devuelve (N, D) con norma L2 = 1."""
+        vectores = np.asarray(self.extractor.predict(lote, batch_size=len(lote), verbose=0), dtype=np.float32)
+        normas = np.linalg.norm(vectores, axis=1, keepdims=True)
+        return vectores / np.maximum(normas, 1e-12)
+
+    def personas(self):
+        return sorted(set(self.nombres.tolist()))
+
+    def inscribir(self, nombre, lote, reemplazar=False):
+        """Añade los rostros de una persona. El resto de identidades no se modifica."""
+        nuevos = self.embeber(lote)
+        if reemplazar:
+            self.eliminar(nombre, guardar=False)
+        self.embeddings = np.concatenate([self.embeddings, nuevos])
+        self.nombres = np.concatenate([self.nombres, np.full(len(nuevos), nombre, dtype=object)])
+        self.guardar()
+        return len(nuevos)
+
+    def eliminar(self, nombre, guardar=True):
+        mantener = self.nombres != nombre
+        self.embeddings, self.nombres = self.embeddings[mantener], self.nombres[mantener]
+        if guardar:
+            self.guardar()
+
+    def reconocer(self, lote, umbral=UMBRAL_SIMILITUD):
+        """Vecino más cercano vectorizado para todos los rostros del lote.
+        Devuelve [(nombre_original, similitud, aceptado)] por rostro."""
+        if len(self.embeddings) == 0:
+            raise ValueError("❌ La galería está vacía. Inscriba al menos una persona.")
+        consultas = self.embeber(lote)
+        similitudes = consultas @ self.embeddings.T
+        mejores = np.argmax(similitudes, axis=1)
+        valores = similitudes[np.arange(len(consultas)), mejores]
+        return [(self.nombres[i], float(v), bool(v >= umbral)) for i, v in zip(mejores, valores)]
+
+
+# ===============================================================
+# --- INSCRIPCIÓN DESDE LÍNEA DE COMANDOS ---
+# ===============================================================
+
+def inscribir_desde_carpeta(nombre, carpeta, reemplazar=False):
+    """Detecta el primer rostro de cada imagen de la carpeta y lo inscribe en la galería."""
+    from PIL import Image
+    from tensorflow.keras.models import load_model
+    from main import obtener_detector, preparar_lote_rostros, envolver_preprocesado, huella_modelo, MODELO_FILENAME
+
+    # Igual que en la app: los modelos antiguos se envuelven para recibir uint8 en 0-255
+    modelo = envolver_preprocesado(load_model(MODELO_FILENAME))
+    galeria = GaleriaEmbeddings(modelo, huella_modelo=huella_modelo(MODELO_FILENAME))
+    caras = []
+    for img_name in sorted(os.listdir(carpeta)):
+        try:
+            img = np.array(Image.open(os.path.join(carpeta, img_name)).convert('RGB'))
+        except Exception as e:
+            print(f"❌ Error procesando {img_name}: {e}")
+            continue
+        detecciones = obtener_detector().detect_faces(img)
+        if len(detecciones) == 0: continue
+        x1, y1, w, h = detecciones[0]['box']
+        x1, y1 = abs(x1), abs(y1)
+        caras.append(img[y1:y1 + h, x1:x1 + w])
+
+    if not caras:
+        print(f"❌ No se detectaron rostros en '{carpeta}'.")
+        return 0
+
+    inicio = time.perf_counter()
+    n = galeria.inscribir(nombre, preparar_lote_rostros(caras), reemplazar=reemplazar)
+    print(f"[GALERÍA] '{nombre}' inscrito con {n} rostros en {time.perf_counter() - inicio:.3f}s. "
+          f"Personas en galería: {', '.join(galeria.personas())}")
+    return n
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 3:
+        print("Uso: python galeria_embeddings.py \"Nombre Persona\" carpeta_con_fotos [--reemplazar]")
+        sys.exit(1)
+    inscribir_desde_carpeta(sys.argv[1], sys.argv[2], reemplazar="--reemplazar" in sys.argv[3:])
@@ -0,0 +1,239 @@
+import numpy as np
+import os
+import json
+import time
+import argparse
+import sys
+import threading
+
+from metricas_latencia import anadir_argumento_salida, guardar_informe
+
+# ===============================================================
+# --- INFERENCIA LIGERA (TFLite cuantizado) ---
+# ===============================================================
+# Exporta la CNN de Keras a TFLite cuantizado (int8 o float16) y ofrece
+# ClasificadorTFLite, que expone el mismo predict() que un modelo Keras para
+# poder usarse directamente en clasificar_rostros / detectar_y_clasificar.
+
+MODOS_CUANTIZACION = ("int8", "float16")
+
+
+def ruta_tflite(modelo_path, modo):
+    return f"{os.path.splitext(modelo_path)[0]}_{modo}.tflite"
+
+def ruta_metadatos(ruta):
+    """Archivo junto al .tflite que indica la escala de entrada con que se exportó."""
+    return ruta + ".json"
+
+def _escala_entrada(ruta):
+    """Factor por el que multiplicar los píxeles 0-255 antes de invocar el intérprete.
+    Los .tflite exportados antes del preprocesado en el grafo no tienen metadatos y esperan [0, 1]."""
+    try:
+        with open(ruta_metadatos(ruta), 'r', encoding='utf-8') as f:
+            return 255.0 / float(json.load(f)["rango_entrada"])
+    except FileNotFoundError:
+        print(f"⚠️ '{ruta}' se exportó sin preprocesado en el grafo: la entrada se escala a [0, 1] al predecir.")
+        return 1.0 / 255.0
+    except (OSError, ValueError, KeyError) as e:
+        raise ValueError(f"❌ Metadatos de entrada ilegibles para '{ruta}': {e}. Vuelva a exportar el modelo.")
+
+def _crear_interprete(ruta, num_hilos=None):
+    """Usa tflite_runtime si está instalado (más ligero); si no, el intérprete de TensorFlow."""
+    try:
+        from tflite_runtime.interpreter import Interpreter
+    except ImportError:
+        from tensorflow.lite import Interpreter
+    return Interpreter(model_path=ruta, num_threads=num_hilos)
+
+
+class ClasificadorTFLite:
+    """Envoltorio de un modelo .tflite con la interfaz predict() de Keras."""
+
+    def __init__(self, ruta, num_hilos=None):
+        self.ruta = ruta
+        self.interprete = _crear_interprete(ruta, num_hilos)
+        self.interprete.allocate_tensors()
+        self._entrada = self.interprete.get_input_details()[0]
+        self._salida = self.interprete.get_output_details()[0]
+        self._forma_actual = tuple(int(v) for v in self._entrada['shape'])
+        self._escala = _escala_entrada(ruta)
+
+    def predict(self, lote, batch_size=None, verbose=0):
+        if self._escala != 1.0:
+            lote = np.asarray(lote, dtype=np.float32) * np.float32(self._escala)
+        # Sin conversiones de más: un lote uint8 solo se convierte si el intérprete pide otro tipo
+        lote = np.asarray(lote, dtype=self._entrada['dtype'])
+        # La entrada admite lote y tamaño de imagen variables (Resizing está en el grafo)
+        if lote.shape != self._forma_actual:
+            self.interprete.resize_tensor_input(self._entrada['index'], list(lote.shape))
+            self.interprete.allocate_tensors()
+            self._forma_actual = lote.shape
+        self.interprete.set_tensor(self._entrada['index'], lote)
+        self.interprete.invoke()
+        return self.interprete.get_tensor(self._salida['index']).copy()
+
+
+def exportar_tflite(modelo, destino, modo="int8", datos_calibracion=None):
+    """Convierte el modelo Keras a TFLite cuantizado y lo guarda en destino.
+    int8 necesita datos_calibracion: arreglo (N, 150, 150, 3) con píxeles en 0-255
+    (el escalado forma parte del grafo del modelo)."""
+    import tensorflow as tf
+
+    if modo not in MODOS_CUANTIZACION:
+        raise ValueError(f"❌ Modo de cuantización no soportado: {modo}")
+    converter = tf.lite.TFLiteConverter.from_keras_model(modelo)
+    converter.optimizations = [tf.lite.Optimize.DEFAULT]
+    if modo == "float16":
+        converter.target_spec.supported_types = [tf.float16]
+    else:
+        if datos_calibracion is None or len(datos_calibracion) == 0:
+            raise ValueError("❌ La cuantización int8 necesita imágenes de calibración.")
+
+        def representative_dataset():
+            for i in range(len(datos_calibracion)):
+                yield [np.asarray(datos_calibracion[i:i + 1], dtype=np.float32)]
+
+        converter.representative_dataset = representative_dataset
+        # Pesos y activaciones en int8; entrada y salida siguen en float32 (misma interfaz que Keras)
+        converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS_INT8]
+
+    tmp = destino + ".tmp"
+    with open(tmp, 'wb') as f:
+        f.write(converter.convert())
+    os.replace(tmp, destino)
+    # El .tflite espera píxeles en 0-255 (Rescaling va en el grafo); los anteriores esperaban [0, 1]
+    with open(ruta_metadatos(destino), 'w', encoding='utf-8') as f:
+        json.dump({"rango_entrada": 255}, f)
+    return destino
+
+
+# ===============================================================
+# --- INFORME: precisión, latencia y memoria (Keras vs TFLite) ---
+# ===============================================================
+
+def _evaluar(modelo, x, y, lote_latencia=200):
+    """Precisión sobre (x, y) y latencia media por rostro (lote de 1, como en una foto individual)."""
+    probs = np.concatenate([modelo.predict(x[i:i + 32], batch_size=32, verbose=0) for i in range(0, len(x), 32)])
+    precision = float(np.mean(np.argmax(probs, axis=1) == y))
+    n = min(lote_latencia, len(x))
+    modelo.predict(x[:1], batch_size=1, verbose=0)
+    inicio = time.perf_counter()
+    for i in range(n):
+        modelo.predict(x[i:i + 1], batch_size=1, verbose=0)
+    latencia_ms = (time.perf_counter() - inicio) / n * 1000
+    return precision, latencia_ms, probs
+
+def _rss_actual_mb():
+    """Memoria residente actual del proceso (Linux, /proc); None si no está disponible."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except (OSError, ValueError, AttributeError):
+        return None
+
+def _pico_rss_durante(funcion):
+    """(RSS antes, pico de RSS mientras se ejecuta funcion) en MB, muestreando cada milisegundo.
+    Sin /proc se usa ru_maxrss (solo Unix), que solo sube: vale si el pico previo era menor."""
+    base = _rss_actual_mb()
+    if base is None:
+        import resource
+        unidad = 1 if sys.platform == "darwin" else 1024
+        base = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * unidad / 2**20
+        funcion()
+        return base, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * unidad / 2**20
+
+    pico = [base]
+    terminado = threading.Event()
+
+    def muestrear():
+        while not terminado.is_set():
+            pico[0] = max(pico[0], _rss_actual_mb())
+            time.sleep(0.001)
+
+    hilo = threading.Thread(target=muestrear, daemon=True)
+    hilo.start()
+    try:
+        funcion()
+    finally:
+        terminado.set()
+        hilo.join()
+    return base, max(pico[0], _rss_actual_mb())
+
+def _medir_memoria_backend(modelo_path, classes_path, backend, lote):
+    """Se ejecuta en un proceso nuevo por backend, para que uno no herede la memoria del otro.
+    Devuelve MB por rostro del pico de RSS al predecir un rostro y un lote completo."""
+    from main import cargar_modelo_entrenado
+    # cargar_modelo_entrenado ya hace una predicción de calentamiento: la memoria de carga queda fuera
+    modelo, _ = cargar_modelo_entrenado(modelo_path, classes_path, backend)
+    resultado = {}
+    for nombre, entrada in (("1_rostro", lote[:1]), (f"lote_{len(lote)}", lote)):
+        base, pico = _pico_rss_durante(lambda: modelo.predict(entrada, batch_size=len(entrada), verbose=0))
+        resultado[nombre] = round((pico - base) / len(entrada), 3)
+    resultado["rss_modelo_cargado_mb"] = round(base, 1)
+    return resultado
+
+def medir_memoria_por_rostro(modelo_path, classes_path, backend, lote):
+    from concurrent.futures import ProcessPoolExecutor
+    from main import contexto_procesos
+    with ProcessPoolExecutor(max_workers=1, mp_context=contexto_procesos()) as pool:
+        return pool.submit(_medir_memoria_backend, modelo_path, classes_path, backend, lote).result()
+
+def generar_informe(modelo_path, classes_path, dataset_dir, modo="int8", max_calibracion=200):
+    """Exporta el modelo y compara Keras vs TFLite sobre el split de validación."""
+    from main import cargar_modelo_entrenado
+    from almacen_rostros import empaquetar_rostros, cargar_rostros_empaquetados, dividir_validacion
+
+    modelo, class_indices = cargar_modelo_entrenado(modelo_path, classes_path)
+    empaquetar_rostros(dataset_dir)
+    datos, etiquetas, indices_almacen = cargar_rostros_empaquetados(dataset_dir)
+    if indices_almacen != class_indices:
+        raise ValueError("❌ Las clases del dataset no coinciden con las del modelo. Reentrene o reconstruya el dataset.")
+    train_idx, val_idx = dividir_validacion(etiquetas)
+    val_idx = np.sort(val_idx)
+    x_val = datos[val_idx]
+    y_val = etiquetas[val_idx]
+    calibracion = datos[np.sort(train_idx)[:max_calibracion]].astype(np.float32)
+
+    destino = ruta_tflite(modelo_path, modo)
+    inicio = time.perf_counter()
+    exportar_tflite(modelo, destino, modo, calibracion)
+    t_export = time.perf_counter() - inicio
+
+    prec_keras, lat_keras, probs_keras = _evaluar(modelo, x_val, y_val)
+    ligero = ClasificadorTFLite(destino)
+    prec_tflite, lat_tflite, probs_tflite = _evaluar(ligero, x_val, y_val)
+
+    bytes_entrada = int(np.prod(x_val.shape[1:])) * x_val.itemsize
+    lote_memoria = np.asarray(x_val[:32])
+    memoria_keras = medir_memoria_por_rostro(modelo_path, classes_path, "keras", lote_memoria)
+    memoria_tflite = medir_memoria_por_rostro(modelo_path, classes_path, modo, lote_memoria)
+    return {
+        "modo": modo,
+        "archivo": destino,
+        "exportacion_s": round(t_export, 2),
+        "rostros_validacion": int(len(y_val)),
+        "precision_keras": round(prec_keras, 4),
+        "precision_tflite": round(prec_tflite, 4),
+        "delta_precision": round(prec_tflite - prec_keras, 4),
+        "acuerdo_top1": round(float(np.mean(np.argmax(probs_keras, 1) == np.argmax(probs_tflite, 1))), 4),
+        "latencia_keras_ms_por_rostro": round(lat_keras, 3),
+        "latencia_tflite_ms_por_rostro": round(lat_tflite, 3),
+        "tam_modelo_keras_mb": round(os.path.getsize(modelo_path) / 2**20, 2),
+        "tam_modelo_tflite_mb": round(os.path.getsize(destino) / 2**20, 2),
+        "entrada_kb_por_rostro": round(bytes_entrada / 1024, 1),
+        # Pico de RSS sobre el modelo ya cargado al predecir, dividido entre los rostros del lote
+        "memoria_keras_mb_por_rostro": memoria_keras,
+        "memoria_tflite_mb_por_rostro": memoria_tflite,
+    }
+
+
+if __name__ == "__main__":
+    from main import MODELO_FILENAME, CLASSES_FILENAME, OUTPUT_DIR
+
+    parser = argparse.ArgumentParser(description="Exporta la CNN a TFLite cuantizado y compara con Keras.")
+    parser.add_argument("--modo", choices=MODOS_CUANTIZACION, default="int8")
+    anadir_argumento_salida(parser)
+    args = parser.parse_args()
+
+    informe = generar_informe(MODELO_FILENAME, CLASSES_FILENAME, OUTPUT_DIR, args.modo)
+    guardar_informe(informe, args.salida)
@@ -1,31 +1,34 @@
 import numpy as np
 import os
 import shutil
-import requests
 import json 
 import tkinter as tk
 from tkinter import messagebox, scrolledtext
 from io import BytesIO
-from bs4 import BeautifulSoup
-from mtcnn import MTCNN
-import matplotlib.pyplot as plt
 from PIL import Image, ImageTk, ImageDraw, ImageFont
-from tensorflow.keras.preprocessing.image import ImageDataGenerator, img_to_array
-from tensorflow.keras.models import Sequential, load_model 
-from tensorflow.keras.layers import Conv2D, MaxPooling2D, Flatten, Dense, Dropout
-from tensorflow.keras.callbacks import EarlyStopping, ReduceLROnPlateau
-from tensorflow.keras.regularizers import l2
-import pyttsx3 
+from descarga_imagenes import obtener_cliente
+from galeria_embeddings import GaleriaEmbeddings, GALERIA_FILENAME, UMBRAL_SIMILITUD
+from cache_predicciones import CachePredicciones
+from metricas_latencia import LATENCIAS, LATENCIAS_FILENAME
+from voz import TrabajadorVoz
+from deduplicacion import buscar_duplicados, UMBRAL_HAMMING
 import threading 
+import queue
+import multiprocessing
+import time
+import hashlib
+import contextlib
+
+# TensorFlow/Keras, MTCNN, matplotlib y pyttsx3 se importan en la primera función que
+# los usa: así la ventana aparece sin esperar a cargarlos (ver precalentar()).
 
 # ===============================================================
 # --- 1. CONFIGURACIÓN GLOBAL Y FUNCIONES CORE ---
 # ===============================================================
 
-detector = MTCNN()
-
-# La inicialización del motor de audio se hará dentro del hilo para aislar recursos.
-engine = None 
+# El detector de rostros se construye al primer uso (obtener_detector)
+_detector = None
+_detector_lock = threading.Lock()
 
 MODELO_FILENAME = "modelo_deteccion_rostros.h5"
 CLASSES_FILENAME = "clase_indices.json"
@@ -34,78 +37,698 @@ OUTPUT_DIR = "./dataset_rostros/"
 UMBRAL_CONF = 0.90
 CLASE_NO_FAMILIAR = 'No familiar'
 LOGO_FILENAME = "VisualSupportLOGO.jpeg" 
+# Motor de reconocimiento: "cnn" (softmax entrenada) o "galeria" (embeddings + vecino más cercano)
+MOTOR_RECONOCIMIENTO = "cnn"
+# Backend de inferencia del clasificador: "keras" (.h5), un modelo TFLite cuantizado
+# exportado con inferencia_tflite.py ("int8" o "float16") o el estudiante compacto
+# destilado con destilacion.py ("estudiante")
+BACKEND_INFERENCIA = "keras"
+# Backend de detección de rostros: "mtcnn", "piramide" (MTCNN sobre imagen reducida),
+# "haar" o "dnn" (OpenCV). Ver detectores.py y benchmark_detectores.py
+DETECTOR_BACKEND = "mtcnn"
+# Procesos para extraer rostros del dataset (1 = modo serie, sin pool)
+NUM_WORKERS_DATASET = max(1, (os.cpu_count() or 1) - 1)
+TAM_LOTE_DATASET = 16
+# Parámetros de preprocesado del dataset (si cambian, el manifiesto se invalida)
+MAX_SIZE_DATASET = 1000
+TAM_ROSTRO = 150
+MANIFEST_FILENAME = ".manifest_rostros.json"
+# Decodificación reducida: los JPEG se decodifican directamente cerca del tamaño de
+# trabajo (modo draft: escalado 1/2, 1/4 o 1/8 dentro del decodificador)
+DECODIFICACION_REDUCIDA = True
+LADO_MAX_DETECCION = 1000
+# Antes de detectar, descarta fotos casi duplicadas dentro de cada clase (dHash, ver deduplicacion.py)
+DEDUPLICAR_DATASET = True
+# Entrada del entrenamiento: "tfdata" (decodificación y aumento en paralelo, caché y prefetch),
+# "almacen" (arreglo uint8 empaquetado leído con memmap) o "directorio" (flow_from_directory)
+PIPELINE_ENTRENAMIENTO = "tfdata"
+EPOCAS_ENTRENAMIENTO = 100
+# Puntos de control por época (ver checkpoints_entrenamiento.py): si el proceso muere,
+# el siguiente entrenamiento con el mismo dataset continúa desde la última época guardada
+REANUDAR_ENTRENAMIENTO = True
+CHECKPOINT_CADA_EPOCAS = 1
+# Caché de predicciones (hash de la imagen + identidad del modelo); en disco es opcional
+CACHE_PREDICCIONES = True
+CACHE_PREDICCIONES_DISCO = False
+MAX_PREDICCIONES_CACHE = 256
+# Si se indica (p. ej. "http://127.0.0.1:8765"), la app actúa como cliente de
+# servicio_reconocimiento.py en lugar de cargar TensorFlow y el detector
+SERVICIO_URL = None
+# Tiempos por etapa (carga, decodificación, detección, preprocesado, predicción, visualización)
+MEDIR_LATENCIAS = True
+LATENCIAS.activo = MEDIR_LATENCIAS
+
+
+def obtener_detector():
+    """Devuelve el detector compartido (DETECTOR_BACKEND), creándolo la primera vez."""
+    global _detector
+    with _detector_lock:
+        if _detector is None:
+            from detectores import crear_detector
+            _detector = crear_detector(DETECTOR_BACKEND)
+        return _detector
+
+
+def _extraer_rostro(detector_local, img_path, output_path):
+    """Detecta el primer rostro de img_path y guarda el recorte 150x150 en output_path.
+    Devuelve True si se guardó un rostro."""
+    img_pil = Image.open(img_path)
+    if DECODIFICACION_REDUCIDA:
+        img_pil.draft('RGB', (MAX_SIZE_DATASET, MAX_SIZE_DATASET))
+    
+    if max(img_pil.size) > MAX_SIZE_DATASET:
+        img_pil.thumbnail((MAX_SIZE_DATASET, MAX_SIZE_DATASET))
+        
+    if img_pil.mode in ('RGBA', 'P', 'L', 'CMYK'):
+        img_pil = img_pil.convert('RGB')
+        
+    img = np.array(img_pil) 
+    detecciones = detector_local.detect_faces(img)
+    if len(detecciones) == 0: return False
+
+    x1, y1, w, h = detecciones[0]['box']
+    x1, y1 = abs(x1), abs(y1)
+    x2, y2 = x1 + w, y1 + h
 
+    rostro = img[y1:y2, x1:x2]
+    rostro = Image.fromarray(rostro).resize((TAM_ROSTRO, TAM_ROSTRO))
+    rostro.save(output_path)
+    return True
 
-def crear_dataset_rostros(input_dir, output_dir):
-    """Procesa imágenes en INPUT_DIR y guarda rostros detectados en OUTPUT_DIR."""
+def _procesar_tareas(detector_local, lote, cancelar=None):
+    """Extrae los rostros de un lote [(img_path, output_path), ...].
+    Devuelve [(img_path, resultado)] con resultado True/False, o None si hubo error."""
+    resultados = []
+    for img_path, output_path in lote:
+        if cancelar is not None and cancelar.is_set(): break
+        try:
+            resultados.append((img_path, _extraer_rostro(detector_local, img_path, output_path)))
+        except Exception as e:
+            print(f"❌ Error procesando {os.path.basename(img_path)}: {e}")
+            resultados.append((img_path, None))
+    return resultados
+
+
+# --- Extracción en paralelo (cada proceso tiene su propio MTCNN) ---
+_detector_worker = None
+
+def contexto_procesos():
+    """Contexto de multiprocessing para todos los pools del proyecto (dataset, barrido, medición).
+    'spawn' arranca cada proceso desde cero: con 'fork' heredaría los hilos y el estado de
+    TensorFlow del proceso padre, y TF no es seguro tras un fork."""
+    return multiprocessing.get_context("spawn")
+
+def _iniciar_worker_dataset():
+    """Inicializador de cada proceso del pool: crea su propia instancia del detector."""
+    global _detector_worker
+    from detectores import crear_detector
+    _detector_worker = crear_detector(DETECTOR_BACKEND)
+
+def _procesar_lote_worker(lote):
+    """Procesa un fragmento [(img_path, output_path), ...] de una carpeta de clase."""
+    inicio = time.perf_counter()
+    resultados = _procesar_tareas(_detector_worker, lote)
+    return os.getpid(), resultados, time.perf_counter() - inicio
+
+def _dividir_en_lotes(tareas, tam_lote):
+    """Divide la lista de tareas de cada clase en fragmentos de tam_lote imágenes."""
+    lotes = []
+    for clase_tareas in tareas:
+        for i in range(0, len(clase_tareas), tam_lote):
+            lotes.append(clase_tareas[i:i + tam_lote])
+    return lotes
+
+def _extraer_en_paralelo(tareas, num_workers, tam_lote=TAM_LOTE_DATASET, cancelar=None):
+    """Reparte los fragmentos entre num_workers procesos e informa progreso y rendimiento."""
+    lotes = _dividir_en_lotes(tareas, tam_lote)
+    total = sum(len(lote) for lote in lotes)
+    if total == 0:
+        return []
+
+    ctx = contexto_procesos()
+    stats = {}
+    todos = []
+    inicio = time.perf_counter()
+    with ctx.Pool(processes=num_workers, initializer=_iniciar_worker_dataset) as pool:
+        for pid, resultados, segundos in pool.imap_unordered(_procesar_lote_worker, lotes):
+            acum = stats.setdefault(pid, [0, 0, 0.0])
+            acum[0] += len(resultados)
+            acum[1] += sum(1 for _, r in resultados if r)
+            acum[2] += segundos
+            todos.extend(resultados)
+            print(f"[DATASET] {len(todos)}/{total} imágenes procesadas ({100 * len(todos) / total:.1f}%)")
+            if cancelar is not None and cancelar.is_set():
+                # Al salir del bloque with se terminan los procesos del pool
+                break
+
+    total_seg = time.perf_counter() - inicio
+    for pid, (n, guardados, segundos) in sorted(stats.items()):
+        ritmo = n / segundos if segundos > 0 else 0.0
+        print(f"[DATASET] Worker {pid}: {n} imágenes, {guardados} rostros, {ritmo:.2f} img/s")
+    print(f"[DATASET] Total: {total} imágenes en {total_seg:.1f}s ({total / total_seg:.2f} img/s)")
+    return todos
+
+
+# --- Manifiesto incremental del dataset ---
+def _parametros_dataset():
+    """Parámetros de preprocesado que determinan el contenido de cada recorte."""
+    paquete = "mtcnn" if DETECTOR_BACKEND in ("mtcnn", "piramide") else "opencv-python"
+    try:
+        from importlib.metadata import version
+        version_detector = version(paquete)
+    except Exception:
+        version_detector = "desconocida"
+    return {
+        "max_size": MAX_SIZE_DATASET, "tam_rostro": TAM_ROSTRO, "detector": f"{DETECTOR_BACKEND} {version_detector}",
+        "decodificacion": "draft" if DECODIFICACION_REDUCIDA else "completa",
+    }
+
+def _hash_archivo(path):
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for bloque in iter(lambda: f.read(1 << 20), b''):
+            h.update(bloque)
+    return h.hexdigest()
+
+def _cargar_manifest(output_dir):
+    path = os.path.join(output_dir, MANIFEST_FILENAME)
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def _guardar_manifest(output_dir, manifest):
+    """Escribe el manifiesto de forma atómica (archivo temporal + replace)."""
+    path = os.path.join(output_dir, MANIFEST_FILENAME)
+    tmp = path + ".tmp"
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, sort_keys=True)
+    os.replace(tmp, path)
+
+
+def crear_dataset_rostros(input_dir, output_dir, num_workers=1, incremental=True, cancelar=None):
+    """Procesa imágenes en INPUT_DIR y guarda rostros detectados en OUTPUT_DIR.
+    Con num_workers > 1 la detección se reparte entre varios procesos.
+    En modo incremental solo se procesan imágenes nuevas o modificadas (según su hash)
+    y se eliminan los recortes cuya imagen de origen ya no existe.
+    Si se activa el evento cancelar, guarda lo procesado hasta ese momento y devuelve False."""
     if not os.path.isdir(input_dir):
         return False
-        
-    shutil.rmtree(output_dir, ignore_errors=True)
+
+    parametros = _parametros_dataset()
+    manifest = _cargar_manifest(output_dir) if incremental else None
+    if manifest is None or manifest.get("parametros") != parametros:
+        # Sin manifiesto válido (o con otros parámetros) se reconstruye desde cero
+        shutil.rmtree(output_dir, ignore_errors=True)
+        manifest = {"parametros": parametros, "archivos": {}}
     os.makedirs(output_dir, exist_ok=True)
+    anteriores = manifest["archivos"]
+
+    excluir = set()
+    if DEDUPLICAR_DATASET:
+        excluir, informe_dedup = buscar_duplicados(input_dir, output_dir, UMBRAL_HAMMING)
+    detecciones_evitadas = 0
+    archivos = {}
 
+    tareas = []
+    pendientes = {}
+    clases = set()
     for clase in os.listdir(input_dir):
         clase_path = os.path.join(input_dir, clase)
         if not os.path.isdir(clase_path): continue
+        clases.add(clase)
 
         output_class_dir = os.path.join(output_dir, clase)
         os.makedirs(output_class_dir, exist_ok=True)
 
+        clase_tareas = []
         for img_name in os.listdir(clase_path):
             img_path = os.path.join(clase_path, img_name)
+            output_path = os.path.join(output_class_dir, img_name)
+            clave = f"{clase}/{img_name}"
+            if clave in excluir:
+                # Casi duplicada: no se detecta y su recorte anterior (si lo hay) se elimina abajo
+                if clave not in anteriores:
+                    detecciones_evitadas += 1
+                continue
             try:
-                MAX_SIZE = 1000
-                img_pil = Image.open(img_path)
-                
-                if max(img_pil.size) > MAX_SIZE:
-                    img_pil.thumbnail((MAX_SIZE, MAX_SIZE))
-                    
-                if img_pil.mode in ('RGBA', 'P', 'L', 'CMYK'):
-                    img_pil = img_pil.convert('RGB')
-                    
-                img = np.array(img_pil) 
-                detecciones = detector.detect_faces(img)
-                if len(detecciones) == 0: continue
-
-                x1, y1, w, h = detecciones[0]['box']
-                x1, y1 = abs(x1), abs(y1)
-                x2, y2 = x1 + w, y1 + h
-
-                rostro = img[y1:y2, x1:x2]
-                rostro = Image.fromarray(rostro).resize((150, 150))
-                rostro.save(os.path.join(output_class_dir, img_name))
-
-            except Exception as e:
+                st = os.stat(img_path)
+                previa = anteriores.get(clave)
+                # Si tamaño y fecha coinciden se reutiliza el hash guardado (evita releer el archivo)
+                if previa and previa["tam"] == st.st_size and previa["mtime"] == st.st_mtime:
+                    digest = previa["hash"]
+                else:
+                    digest = _hash_archivo(img_path)
+            except OSError as e:
                 print(f"❌ Error procesando {img_name}: {e}")
-                
-    return True
-
-def es_url_imagen(url):
-    extensiones = (".jpg", ".jpeg", ".png", ".bmp", ".gif", ".webp")
-    return url.lower().endswith(extensiones)
+                continue
+
+            entrada = {"hash": digest, "tam": st.st_size, "mtime": st.st_mtime}
+            if previa and previa["hash"] == digest and (not previa["rostro"] or os.path.exists(output_path)):
+                entrada["rostro"] = previa["rostro"]
+                archivos[clave] = entrada
+                continue
+
+            # Imagen nueva o modificada: se descarta el recorte anterior antes de detectar
+            if os.path.exists(output_path):
+                os.remove(output_path)
+            pendientes[img_path] = (clave, entrada)
+            clase_tareas.append((img_path, output_path))
+        tareas.append(clase_tareas)
+
+    # Recortes cuya imagen de origen desapareció
+    eliminadas = 0
+    for clave in set(anteriores) - set(archivos) - {c for c, _ in pendientes.values()}:
+        output_path = os.path.join(output_dir, *clave.split("/", 1))
+        if os.path.exists(output_path):
+            os.remove(output_path)
+        eliminadas += 1
+    for clase in os.listdir(output_dir):
+        if clase not in clases and os.path.isdir(os.path.join(output_dir, clase)):
+            shutil.rmtree(os.path.join(output_dir, clase), ignore_errors=True)
+
+    print(f"[DATASET] {len(archivos)} sin cambios, {len(pendientes)} por procesar, {eliminadas} eliminadas")
+    if DEDUPLICAR_DATASET:
+        print(
+            f"[DEDUP] {informe_dedup['descartadas']} casi duplicadas de {informe_dedup['imagenes']} "
+            f"({informe_dedup['ahorro_por_epoca_pct']}% menos imágenes por época), "
+            f"{detecciones_evitadas} detecciones evitadas en esta reconstrucción"
+        )
+        if informe_dedup["grupos_entre_clases"]:
+            print(f"[DEDUP] ⚠️ {informe_dedup['grupos_entre_clases']} grupos de duplicados aparecen en clases distintas")
+
+    if num_workers > 1 and len(pendientes) > TAM_LOTE_DATASET:
+        resultados = _extraer_en_paralelo(tareas, num_workers, cancelar=cancelar)
+    else:
+        resultados = _procesar_tareas(obtener_detector(), [t for clase_tareas in tareas for t in clase_tareas], cancelar)
+
+    for img_path, rostro in resultados:
+        if rostro is None: continue  # los errores se reintentan en la próxima reconstrucción
+        clave, entrada = pendientes[img_path]
+        entrada["rostro"] = rostro
+        archivos[clave] = entrada
+
+    manifest["archivos"] = archivos
+    _guardar_manifest(output_dir, manifest)
+    return not (cancelar is not None and cancelar.is_set())
+
+def construir_modelo_cnn(num_clases, tasa_aprendizaje=0.001, peso_l2=0.001, dropout=0.5):
+    """CNN de clasificación de rostros (salida softmax por clase).
+    Redimensionado a 150x150 y escalado a [0, 1] van dentro del grafo: recibe píxeles en 0-255 (uint8).
+    Los hiperparámetros por defecto son los del entrenamiento normal (ver barrido_hiperparametros.py)."""
+    from tensorflow.keras.models import Sequential
+    from tensorflow.keras.layers import Input, Resizing, Rescaling, Conv2D, MaxPooling2D, Flatten, Dense, Dropout
+    from tensorflow.keras.optimizers import Adam
+    from tensorflow.keras.regularizers import l2
+    modelo_cnn = Sequential([
+        Input(shape=(None, None, 3)), Resizing(TAM_ROSTRO, TAM_ROSTRO), Rescaling(1./255),
+        Conv2D(32,(3,3),activation='relu'), MaxPooling2D(2,2),
+        Conv2D(64,(3,3),activation='relu'), MaxPooling2D(2,2),
+        Conv2D(128,(3,3),activation='relu'), MaxPooling2D(2,2),
+        Flatten(),
+        Dense(256, activation='relu', kernel_regularizer=l2(peso_l2)), Dropout(dropout),
+        Dense(num_clases, activation='softmax') 
+    ])
+    modelo_cnn.compile(optimizer=Adam(learning_rate=tasa_aprendizaje), loss='categorical_crossentropy', metrics=['accuracy'])
+    return modelo_cnn
+
+def huella_modelo(path):
+    """Identidad barata del archivo de modelo (tamaño + fecha de modificación)."""
+    st = os.stat(path)
+    return f"{st.st_size}-{st.st_mtime_ns}"
+
+def preparar_lote_rostros(caras):
+    """Apila los recortes en un único lote uint8 (N, 150, 150, 3). El escalado lo hace el modelo.
+    Solo se redimensiona en el host para poder apilar recortes de distinto tamaño."""
+    return np.stack([
+        np.asarray(Image.fromarray(cara).convert('RGB').resize((TAM_ROSTRO, TAM_ROSTRO)), dtype=np.uint8) for cara in caras
+    ])
+
+def envolver_preprocesado(modelo):
+    """Los modelos guardados antes del preprocesado en el grafo esperan float32 en [0, 1].
+    Se envuelven con Resizing + Rescaling (capas planas, sin anidar) para que reciban uint8 como los nuevos."""
+    from tensorflow.keras.models import Model
+    from tensorflow.keras.layers import Input, Resizing, Rescaling
+    if any(isinstance(capa, Rescaling) for capa in modelo.layers):
+        return modelo
+    entrada = Input(shape=(None, None, 3))
+    x = Rescaling(1./255)(Resizing(TAM_ROSTRO, TAM_ROSTRO)(entrada))
+    for capa in modelo.layers:
+        x = capa(x)
+    return Model(entrada, x)
 
 def extraer_imagen_wikimedia(url):
-    headers = {"User-Agent": "Mozilla/5.0"}
-    html = requests.get(url, headers=headers).text
-    soup = BeautifulSoup(html, "html.parser")
-    candidates = soup.find_all("img")
-    for tag in candidates:
-        src = tag.get("src")
-        if src and ("upload.wikimedia.org" in src or src.startswith("//upload")):
-            if src.startswith("//"): src = "https:" + src
-            return src
-    raise ValueError("❌ No se pudo extraer la imagen de Wikimedia.")
+    return obtener_cliente().resolver_wikimedia(url)
 
 def cargar_imagen_url(url):
-    headers = {"User-Agent": "Mozilla/5.0"}
-    if es_url_imagen(url):
-        response = requests.get(url, headers=headers)
-        return np.array(Image.open(BytesIO(response.content)).convert("RGB"))
-    if "commons.wikimedia.org/wiki/" in url:
-        url_img = extraer_imagen_wikimedia(url)
-        response = requests.get(url_img, headers=headers)
-        return np.array(Image.open(BytesIO(response.content)).convert("RGB"))
-    raise ValueError("❌ La URL no es una imagen directa ni página compatible.")
+    """Descarga (o toma de la caché en disco) la imagen de la URL y la decodifica a RGB."""
+    datos = obtener_cliente().obtener_bytes(url)
+    return np.array(Image.open(BytesIO(datos)).convert("RGB"))
+
+
+# ===============================================================
+# --- 2. RECONOCIMIENTO (núcleo sin interfaz) ---
+# ===============================================================
+# Etapas de detectar_y_clasificar como funciones independientes, para poder
+# usarlas desde la interfaz Tkinter o desde el modo por lotes sin ventana.
+
+def ruta_clasificador(modelo_path, backend):
+    """Archivo que carga realmente cada backend de inferencia a partir del modelo .h5."""
+    if backend == "keras":
+        return modelo_path
+    if backend == "estudiante":
+        from destilacion import ruta_estudiante
+        return ruta_estudiante(modelo_path)
+    from inferencia_tflite import ruta_tflite
+    return ruta_tflite(modelo_path, backend)
+
+def huella_clasificador(modelo_path, backend):
+    """huella_modelo del archivo del backend (y de los metadatos de entrada de un .tflite)."""
+    ruta = ruta_clasificador(modelo_path, backend)
+    partes = [huella_modelo(ruta)]
+    if backend not in ("keras", "estudiante"):
+        from inferencia_tflite import ruta_metadatos
+        if os.path.exists(ruta_metadatos(ruta)):
+            partes.append(huella_modelo(ruta_metadatos(ruta)))
+    return "+".join(partes)
+
+def cargar_modelo_entrenado(modelo_path=MODELO_FILENAME, classes_path=CLASSES_FILENAME, backend="keras"):
+    """Carga el clasificador (Keras, estudiante destilado o TFLite cuantizado) y su diccionario clase -> índice."""
+    ruta = ruta_clasificador(modelo_path, backend)
+    if backend == "keras":
+        from tensorflow.keras.models import load_model
+        modelo = envolver_preprocesado(load_model(ruta))
+    elif backend == "estudiante":
+        from tensorflow.keras.models import load_model
+        modelo = load_model(ruta)
+    else:
+        from inferencia_tflite import ClasificadorTFLite
+        modelo = ClasificadorTFLite(ruta)
+    with open(classes_path, 'r') as f:
+        class_indices = json.load(f)
+    # Una predicción de prueba construye el grafo: la primera imagen real ya no paga ese coste
+    modelo.predict(np.zeros((1, TAM_ROSTRO, TAM_ROSTRO, 3), dtype=np.uint8), verbose=0)
+    return modelo, class_indices
+
+def cargar_imagen(img_source):
+    """Decodifica una ruta local o URL a un arreglo RGB."""
+    if img_source.startswith("http"):
+        return cargar_imagen_url(img_source)
+    import matplotlib.pyplot as plt
+    return plt.imread(img_source)
+
+def detectar_rostros(img, detector_local=None):
+    """Detecta rostros con el detector configurado. Devuelve (cajas [(x1, y1, x2, y2)], recortes)."""
+    detecciones = (detector_local or obtener_detector()).detect_faces(img)
+    cajas = []
+    caras = []
+    for det in detecciones:
+        x1, y1, w, h = det['box']
+        x1, y1 = abs(x1), abs(y1)
+        x2, y2 = x1 + w, y1 + h
+        cajas.append((x1, y1, x2, y2))
+        caras.append(img[y1:y2, x1:x2])
+    return cajas, caras
+
+def leer_bytes_imagen(img_source):
+    """Bytes sin decodificar de una ruta local o URL."""
+    if img_source.startswith("http"):
+        return obtener_cliente().obtener_bytes(img_source)
+    with open(img_source, 'rb') as f:
+        return f.read()
+
+def _abrir_fuente(img_source, datos=None):
+    """Devuelve una función que abre la imagen (sin decodificarla) cada vez que se llama."""
+    if datos is None and img_source.startswith("http"):
+        datos = obtener_cliente().obtener_bytes(img_source)
+    if datos is not None:
+        return lambda: Image.open(BytesIO(datos))
+    return lambda: Image.open(img_source)
+
+def _decodificar_en_tamano(abrir, ancho, alto):
+    """Decodifica la imagen al menor tamaño soportado por el decodificador que sea >= (ancho, alto)."""
+    img_pil = abrir()
+    img_pil.draft('RGB', (max(1, ancho), max(1, alto)))
+    return img_pil.convert('RGB')
+
+def cargar_imagen_reducida(img_source, lado_max=LADO_MAX_DETECCION, datos=None):
+    """Decodifica la imagen cerca de lado_max sin pasar por la resolución completa (JPEG).
+    Si ya se leyeron los bytes (datos), no se vuelven a leer.
+    Devuelve (img_reducida, escala, abrir, (ancho_original, alto_original))."""
+    abrir = _abrir_fuente(img_source, datos)
+    tam_original = abrir().size
+    img_pil = _decodificar_en_tamano(abrir, lado_max, lado_max)
+    if max(img_pil.size) > lado_max:
+        img_pil.thumbnail((lado_max, lado_max))
+    return np.array(img_pil), img_pil.size[0] / tam_original[0], abrir, tam_original
+
+def detectar_rostros_reducido(reducida, detector_local=None):
+    """Detecta sobre la imagen reducida y reescala las cajas a la resolución original.
+    Los rostros que en la versión reducida miden menos de TAM_ROSTRO se recortan de una
+    segunda lectura con la resolución justa para obtener TAM_ROSTRO píxeles.
+    Devuelve (cajas_reducidas, cajas_originales, recortes)."""
+    img, escala, abrir, (ancho, alto) = reducida
+    cajas, caras = detectar_rostros(img, detector_local)
+    cajas_originales = [tuple(int(round(v / escala)) for v in caja) for caja in cajas]
+
+    pequenos = [i for i, (x1, y1, x2, y2) in enumerate(cajas) if min(x2 - x1, y2 - y1) < TAM_ROSTRO]
+    if pequenos and escala < 1.0:
+        lado_min = min(min(x2 - x1, y2 - y1) for x1, y1, x2, y2 in (cajas_originales[i] for i in pequenos))
+        escala_necesaria = min(1.0, TAM_ROSTRO / max(lado_min, 1))
+        if escala_necesaria > escala:
+            # PIL no decodifica subregiones de un JPEG: se decodifica a la escala mínima
+            # necesaria y solo se conservan los recortes de los rostros
+            img_alta = _decodificar_en_tamano(abrir, int(ancho * escala_necesaria), int(alto * escala_necesaria))
+            escala_alta = img_alta.size[0] / ancho
+            for i in pequenos:
+                x1, y1, x2, y2 = (int(round(v * escala_alta)) for v in cajas_originales[i])
+                x2, y2 = min(x2, img_alta.size[0]), min(y2, img_alta.size[1])
+                caras[i] = np.array(img_alta.crop((x1, y1, x2, y2)))
+            del img_alta
+    return cajas, cajas_originales, caras
+
+def clasificar_rostros(modelo, idx_to_class, cajas, caras, galeria=None):
+    """Clasifica todos los recortes en una sola pasada y aplica la lógica de UMBRAL.
+    Devuelve la lista de detecciones {'box', 'clase', 'confianza', 'log'}."""
+    with LATENCIAS.medir("preprocesado"):
+        lote = preparar_lote_rostros(caras)
+    if galeria is not None:
+        with LATENCIAS.medir("prediccion"):
+            reconocidos = galeria.reconocer(lote, UMBRAL_SIMILITUD)
+        clasificaciones = [(nombre, sim) for nombre, sim, _ in reconocidos]
+        umbral = UMBRAL_SIMILITUD
+    else:
+        with LATENCIAS.medir("prediccion"):
+            salidas = modelo.predict(lote, batch_size=len(caras), verbose=0)
+        clasificaciones = []
+        for predicciones in salidas:
+            predicted_index = np.argmax(predicciones) 
+            clasificaciones.append((idx_to_class.get(predicted_index, "ERROR_CLASE"), predicciones[predicted_index]))
+        umbral = UMBRAL_CONF
+
+    rostros_detectados = []
+    for box, (predicted_class_name, confidence) in zip(cajas, clasificaciones):
+        # Lógica de UMBRAL (Se mantiene para clasificar final_class)
+        if predicted_class_name != CLASE_NO_FAMILIAR and confidence < umbral:
+            final_class = CLASE_NO_FAMILIAR.upper()
+            log_message = f"CLASE FORZADA: {final_class} | Confianza: {confidence:.4f} (Original: {predicted_class_name.upper()})"
+        else:
+            final_class = predicted_class_name.upper()
+            log_message = f"CLASE: {final_class} | Confianza: {confidence:.4f}"
+            
+        rostros_detectados.append({
+            'box': box,
+            'clase': final_class,
+            'confianza': float(confidence),
+            'log': log_message 
+        })
+    return rostros_detectados
+
+
+# ===============================================================
+# --- TRABAJOS EN SEGUNDO PLANO (sin bloquear Tkinter) ---
+# ===============================================================
+
+class EjecutorTareas:
+    """Ejecuta un trabajo pesado a la vez en un hilo de fondo.
+    Los resultados y las actualizaciones de interfaz se entregan al hilo de Tk
+    mediante una cola que se vacía periódicamente con after()."""
+
+    def __init__(self, master, intervalo_ms=50):
+        self.master = master
+        self.intervalo_ms = intervalo_ms
+        self._cola_ui = queue.Queue()
+        self._hilo = None
+        self._cancelar = threading.Event()
+        self.master.after(self.intervalo_ms, self._drenar_cola_ui)
+
+    def ocupado(self):
+        return self._hilo is not None and self._hilo.is_alive()
+
+    def enviar(self, trabajo, al_terminar, al_fallar=None):
+        """trabajo(cancelar) corre en segundo plano; al_terminar(resultado) en el hilo de Tk."""
+        if self.ocupado():
+            return False
+        self._cancelar = threading.Event()
+
+        def ejecutar(cancelar):
+            try:
+                resultado = trabajo(cancelar)
+            except Exception as e:
+                if al_fallar is not None:
+                    self.en_ui(al_fallar, e)
+                return
+            self.en_ui(al_terminar, resultado)
+
+        self._hilo = threading.Thread(target=ejecutar, args=(self._cancelar,), daemon=True)
+        self._hilo.start()
+        return True
+
+    def cancelar(self):
+        """Solicita la cancelación del trabajo en curso (se atiende en el siguiente punto de control)."""
+        if self.ocupado():
+            self._cancelar.set()
+            return True
+        return False
+
+    def cancelado(self):
+        """True si se pidió cancelar el último trabajo enviado."""
+        return self._cancelar.is_set()
+
+    def en_ui(self, funcion, *args):
+        """Programa funcion(*args) en el hilo de Tk (seguro desde cualquier hilo)."""
+        self._cola_ui.put((funcion, args))
+
+    def _drenar_cola_ui(self):
+        while True:
+            try:
+                funcion, args = self._cola_ui.get_nowait()
+            except queue.Empty:
+                break
+            funcion(*args)
+        self.master.after(self.intervalo_ms, self._drenar_cola_ui)
+
+
+def crear_progreso_entrenamiento(informar, num_muestras, cancelar=None):
+    """Callback de Keras que informa época, pérdida e imágenes/s, y detiene fit() si se pidió cancelar."""
+    from tensorflow.keras.callbacks import Callback
+
+    class ProgresoEntrenamiento(Callback):
+        def on_epoch_begin(self, epoch, logs=None):
+            self._inicio = time.perf_counter()
+
+        def on_train_batch_end(self, batch, logs=None):
+            if cancelar is not None and cancelar.is_set():
+                self.model.stop_training = True
+
+        def on_epoch_end(self, epoch, logs=None):
+            logs = logs or {}
+            segundos = time.perf_counter() - self._inicio
+            ritmo = num_muestras / segundos if segundos > 0 else 0.0
+            informar(
+                f"Época {epoch + 1}/{self.params.get('epochs', '?')} | loss: {logs.get('loss', float('nan')):.4f} | "
+                f"val_loss: {logs.get('val_loss', float('nan')):.4f} | val_acc: {logs.get('val_accuracy', float('nan')):.4f} | "
+                f"{ritmo:.1f} img/s"
+            )
+
+    return ProgresoEntrenamiento()
+
+def _medir_fase(perfil, nombre):
+    """Cronometra una fase del entrenamiento si hay un perfil activo (ver benchmark_entrenamiento.py)."""
+    return perfil.fase(nombre) if perfil is not None else contextlib.nullcontext()
+
+
+def entrenar_modelo(informar, cancelar=None, perfil=None):
+    """Crea el dataset y entrena la CNN, reanudando desde el punto de control si lo hay.
+    No necesita la interfaz: informar(mensaje, tag) recibe el progreso.
+    Devuelve (True, mensaje, (modelo, class_indices, punto_control)) o (False, mensaje, None)."""
+    informar("Iniciando Proceso de Entrenamiento...", "INICIO")
+    from tensorflow.keras.preprocessing.image import ImageDataGenerator
+    from tensorflow.keras.callbacks import EarlyStopping, ReduceLROnPlateau
+    from almacen_rostros import crear_secuencias
+    from pipeline_tfdata import crear_datasets_tf
+    from almacen_rostros import huella_dataset
+    from checkpoints_entrenamiento import crear_punto_control, directorio_punto_control
+
+    with _medir_fase(perfil, "construccion_dataset"):
+        dataset_ok = crear_dataset_rostros(INPUT_DIR, OUTPUT_DIR, num_workers=NUM_WORKERS_DATASET, cancelar=cancelar)
+    if not dataset_ok:
+        if cancelar is not None and cancelar.is_set():
+            return False, "Entrenamiento cancelado.", None
+        return False, "Error al crear dataset. Revise la carpeta './train/'.", None
+    
+    aumentos = dict(rotation_range=20, zoom_range=0.2, horizontal_flip=True)
+    with _medir_fase(perfil, "preparacion_generadores"):
+        try:
+            if PIPELINE_ENTRENAMIENTO == "tfdata":
+                # Validación sin aumento de datos; los recortes decodificados quedan en caché
+                train_gen, val_gen, class_indices, num_entrenamiento = crear_datasets_tf(
+                    OUTPUT_DIR, batch_size=32, validation_split=0.2, aumentos=aumentos
+                )
+            elif PIPELINE_ENTRENAMIENTO == "almacen":
+                # Rostros decodificados una sola vez en un arreglo uint8 leído con memmap
+                train_gen, val_gen, class_indices = crear_secuencias(
+                    OUTPUT_DIR, datagen=ImageDataGenerator(**aumentos), batch_size=32, validation_split=0.2
+                )
+                num_entrenamiento = train_gen.samples
+            else:
+                train_datagen = ImageDataGenerator(validation_split=0.2, **aumentos)
+                train_gen = train_datagen.flow_from_directory(
+                    OUTPUT_DIR, target_size=(150, 150), batch_size=32, class_mode='categorical', subset="training"
+                )
+                val_gen = train_datagen.flow_from_directory(
+                    OUTPUT_DIR, target_size=(150, 150), batch_size=32, class_mode='categorical', subset="validation"
+                )
+                class_indices = train_gen.class_indices
+                num_entrenamiento = train_gen.samples
+        except Exception as e:
+             return False, f"Error en generadores de datos: {e}. ¿Hay al menos 2 clases con imágenes?", None
+
+    num_clases = len(class_indices)
+    
+    if num_clases < 2:
+        return False, "Error: Se requieren al menos 2 clases para entrenar.", None
+
+    modelo_cnn = construir_modelo_cnn(num_clases)
+
+    parada = EarlyStopping(patience=50, restore_best_weights=True)
+    ajuste_lr = ReduceLROnPlateau(factor=0.5, patience=15)
+    callbacks = [
+        parada, ajuste_lr,
+        crear_progreso_entrenamiento(lambda m: informar(m, "ENTRENANDO"), num_entrenamiento, cancelar),
+    ]
+    if perfil is not None:
+        callbacks.append(perfil.callback(train_gen, num_entrenamiento))
+    # El punto de control va el último: guarda los contadores ya actualizados de cada época
+    punto_control = crear_punto_control(
+        directorio_punto_control(MODELO_FILENAME), class_indices,
+        f"{huella_dataset(OUTPUT_DIR)}|{PIPELINE_ENTRENAMIENTO}", [parada, ajuste_lr], CHECKPOINT_CADA_EPOCAS,
+    )
+    callbacks.append(punto_control)
+    epoca_inicial = punto_control.restaurar(modelo_cnn) if REANUDAR_ENTRENAMIENTO else 0
+    
+    if epoca_inicial:
+        informar(f"Reanudando entrenamiento desde la época {epoca_inicial} ({num_clases} clases)...", "ENTRENANDO")
+    else:
+        informar(f"Comenzando entrenamiento con {num_clases} clases...", "ENTRENANDO")
+    with _medir_fase(perfil, "entrenamiento"):
+        modelo_cnn.fit(
+            train_gen, validation_data=val_gen, epochs=EPOCAS_ENTRENAMIENTO, initial_epoch=epoca_inicial,
+            callbacks=callbacks, verbose=1,
+        )
+    if cancelar is not None and cancelar.is_set():
+        # Se conserva el modelo anterior: no se guarda un entrenamiento incompleto.
+        # El punto de control de la última época completa permite reanudarlo después
+        return False, "Entrenamiento cancelado.", None
+    return True, "Entrenamiento Completo", (modelo_cnn, class_indices, punto_control)
+
+def guardar_modelo_entrenado(modelo, class_indices):
+    """Escribe el modelo y su diccionario clase -> índice en MODELO_FILENAME y CLASSES_FILENAME."""
+    # El UserWarning sobre el formato HDF5 se mantiene (es una advertencia de Keras)
+    modelo.save(MODELO_FILENAME)
+    with open(CLASSES_FILENAME, 'w') as f:
+        json.dump(class_indices, f)
 
 
 # ===============================================================
@@ -130,7 +753,18 @@ class DeteccionRostrosApp:
         # Variables de estado del modelo y resultados
         self.modelo = None
         self.class_indices = {}
+        self.idx_to_class = {}
+        self.galeria = None
         self.num_clases = 0
+        self.servicio = None
+        self.tiempos_analisis = {}
+        # Hilo de precalentar() y el clasificador que deja cargado: (huella, backend, modelo, class_indices)
+        self._precarga = None
+        self._modelo_precargado = None
+        self.voz = TrabajadorVoz(informar=lambda mensaje, tag: self.log(mensaje, tag=tag))
+        self.cache_predicciones = None
+        if CACHE_PREDICCIONES:
+            self.cache_predicciones = CachePredicciones(MAX_PREDICCIONES_CACHE, persistente=CACHE_PREDICCIONES_DISCO)
         self.img_tk_ref = None
         self.logo_tk_ref = None
         self.last_speech_message = "Aún no se ha realizado la primera predicción. Por favor, cargue un modelo y analice una imagen."
@@ -146,11 +780,52 @@ class DeteccionRostrosApp:
         self.logo_original = self.cargar_logo(LOGO_FILENAME)
 
         self.setup_ui()
+        self.ejecutor = EjecutorTareas(master)
+        # Las dependencias pesadas se precargan cuando la ventana ya está visible
+        self.master.after(200, self.precalentar)
         
         # Binding para redimensionar el logo cuando la ventana cambia
         self.master.bind('<Configure>', self.redimensionar_logo_en_evento)
 
 
+    def precalentar(self):
+        """Arranca el motor de voz; en un hilo de fondo construye el detector, importa TensorFlow
+        y, si hay modelo guardado, carga el clasificador con su predicción de prueba (grafo ya trazado).
+        Solo la primera llamada tiene efecto: la del after() y la de benchmark_arranque.py no se suman."""
+        if self._precarga is not None:
+            return
+        self.voz.iniciar()
+        if SERVICIO_URL:
+            # Como cliente del servicio no hacen falta TensorFlow ni el detector
+            return
+
+        def trabajo():
+            inicio = time.perf_counter()
+            try:
+                obtener_detector().detect_faces(np.zeros((64, 64, 3), dtype=np.uint8))
+                if os.path.exists(MODELO_FILENAME) and os.path.exists(CLASSES_FILENAME):
+                    huella = huella_clasificador(MODELO_FILENAME, BACKEND_INFERENCIA)
+                    modelo, class_indices = cargar_modelo_entrenado(MODELO_FILENAME, CLASSES_FILENAME, BACKEND_INFERENCIA)
+                    self._modelo_precargado = (huella, BACKEND_INFERENCIA, modelo, class_indices)
+                    self.log(f"Detector y clasificador listos en {time.perf_counter() - inicio:.1f}s.", tag="PRECARGA")
+                else:
+                    import tensorflow.keras.models
+                    self.log(f"Detector y TensorFlow listos en {time.perf_counter() - inicio:.1f}s.", tag="PRECARGA")
+            except Exception as e:
+                self.log(f"Error en la precarga: {e}", tag="ERROR")
+
+        self._precarga = threading.Thread(target=trabajo, daemon=True)
+        self._precarga.start()
+
+    def _tomar_modelo_precargado(self):
+        """(modelo, class_indices) que dejó precalentar(), si sigue correspondiendo al archivo y al backend."""
+        if self._precarga is not None:
+            self._precarga.join()
+        precargado, self._modelo_precargado = self._modelo_precargado, None
+        if precargado is None or precargado[:2] != (huella_clasificador(MODELO_FILENAME, BACKEND_INFERENCIA), BACKEND_INFERENCIA):
+            return None
+        return precargado[2], precargado[3]
+
     def cargar_logo(self, filename):
         """Carga la imagen original del logo o devuelve None si falla."""
         if os.path.exists(filename):
@@ -192,128 +867,223 @@ class DeteccionRostrosApp:
             self.logo_label.image = self.logo_tk_ref
         
     # --- Método de Carga/Entrenamiento (Core) ---
-    def cargar_o_entrenar_modelo(self, load_only=False):
+    def cargar_o_entrenar_modelo(self, load_only=False, cancelar=None, perfil=None, incremental=False):
+        if load_only and SERVICIO_URL:
+            return self.conectar_servicio()
         if load_only and os.path.exists(MODELO_FILENAME) and os.path.exists(CLASSES_FILENAME):
             try:
                 self.log(f"Cargando modelo entrenado desde: {MODELO_FILENAME}", tag="CARGA")
-                self.modelo = load_model(MODELO_FILENAME)
-                with open(CLASSES_FILENAME, 'r') as f:
-                    self.class_indices = json.load(f)
+                self.modelo, self.class_indices = (
+                    self._tomar_modelo_precargado()
+                    or cargar_modelo_entrenado(MODELO_FILENAME, CLASSES_FILENAME, BACKEND_INFERENCIA)
+                )
+                self.idx_to_class = {v: k for k, v in self.class_indices.items()}
                 self.num_clases = len(self.class_indices)
+                self.cargar_galeria()
+                self.actualizar_cache_predicciones()
                 return True, "Cargado", self.num_clases
             except Exception as e:
                 return False, f"Error al cargar modelo: {e}", 0
+        if incremental and os.path.exists(MODELO_FILENAME) and os.path.exists(CLASSES_FILENAME):
+            return self.anadir_persona(cancelar)
+
+        exito, mensaje, resultado = entrenar_modelo(lambda m, tag: self.log(m, tag=tag), cancelar, perfil)
+        if not exito:
+            return False, mensaje, 0
+        modelo_cnn, class_indices, punto_control = resultado
+        self.instalar_modelo(modelo_cnn, class_indices)
+        punto_control.descartar()
+        return True, "Entrenamiento Completo", self.num_clases
 
-        self.log("Iniciando Proceso de Entrenamiento...", tag="INICIO")
+    def anadir_persona(self, cancelar=None):
+        """Añade las identidades nuevas de ./train/ reentrenando solo la cabeza densa
+        sobre las características convolucionales en caché (ver ajuste_incremental.py)."""
+        from ajuste_incremental import ajustar_nueva_persona
 
-        if not crear_dataset_rostros(INPUT_DIR, OUTPUT_DIR):
+        self.log("Añadiendo personas: ajuste de la cabeza densa sobre características en caché...", tag="INICIO")
+        dataset_ok = crear_dataset_rostros(INPUT_DIR, OUTPUT_DIR, num_workers=NUM_WORKERS_DATASET, cancelar=cancelar)
+        if not dataset_ok:
+            if cancelar is not None and cancelar.is_set():
+                return False, "Ajuste cancelado.", 0
             return False, "Error al crear dataset. Revise la carpeta './train/'.", 0
-        
-        train_datagen = ImageDataGenerator(
-            rescale=1./255, rotation_range=20, zoom_range=0.2, horizontal_flip=True, validation_split=0.2
+
+        # El ajuste parte siempre del modelo Keras guardado, aunque la app use TFLite o el servicio
+        modelo, clases_anteriores = cargar_modelo_entrenado(MODELO_FILENAME, CLASSES_FILENAME)
+        resultado = ajustar_nueva_persona(
+            modelo, clases_anteriores, OUTPUT_DIR, informar=lambda m: self.log(m, tag="ENTRENANDO"), cancelar=cancelar
         )
+        if resultado is None:
+            return False, "Ajuste cancelado.", 0
+        modelo, class_indices, informe = resultado
+        if len(class_indices) < 2:
+            return False, "Error: Se requieren al menos 2 clases para entrenar.", 0
+        self.log(
+            f"Ajuste en {informe['total_s']}s. Clases nuevas: {', '.join(informe['clases_nuevas']) or 'ninguna'}. "
+            f"Precisión val: {informe.get('val_acc')} (clases existentes: {informe.get('val_acc_clases_existentes')})",
+            tag="ENTRENANDO",
+        )
+        self.instalar_modelo(modelo, class_indices)
+        return True, "Persona añadida", self.num_clases
+
+    def instalar_modelo(self, modelo, class_indices):
+        """Guarda el modelo recién entrenado y lo pone en uso en la app (y en el servicio, si hay)."""
+        self.modelo = modelo
+        self.num_clases = len(class_indices)
+        self.class_indices = class_indices
+        self.idx_to_class = {v: k for k, v in self.class_indices.items()}
+        
+        guardar_modelo_entrenado(modelo, self.class_indices)
+        self.cargar_galeria()
+        # El modelo recién entrenado es el Keras en memoria, sea cual sea BACKEND_INFERENCIA
+        self.actualizar_cache_predicciones(backend="keras")
+        if self.servicio is not None:
+            # El servicio sigue con el modelo anterior hasta que se le pide recargarlo
+            self.servicio.recargar()
+
+    def conectar_servicio(self):
+        """Modo cliente: el modelo y el detector residen en el servicio de reconocimiento."""
+        from cliente_servicio import ClienteServicio
         try:
-            train_gen = train_datagen.flow_from_directory(
-                OUTPUT_DIR, target_size=(150, 150), batch_size=32, class_mode='categorical', subset="training"
-            )
-            val_gen = train_datagen.flow_from_directory(
-                OUTPUT_DIR, target_size=(150, 150), batch_size=32, class_mode='categorical', subset="validation"
-            )
+            self.log(f"Conectando con el servicio de reconocimiento: {SERVICIO_URL}", tag="CARGA")
+            servicio = ClienteServicio(SERVICIO_URL)
+            estado = servicio.estado()
         except Exception as e:
-             return False, f"Error en generadores de datos: {e}. ¿Hay al menos 2 clases con imágenes?", 0
-
-        self.num_clases = len(train_gen.class_indices)
-        self.class_indices = train_gen.class_indices
-        
-        if self.num_clases < 2:
-            return False, "Error: Se requieren al menos 2 clases para entrenar.", 0
+            return False, f"Error al conectar con el servicio: {e}", 0
+        self.servicio = servicio
+        # Ocupa el lugar del modelo para que la interfaz lo considere cargado
+        self.modelo = servicio
+        self.class_indices = estado["class_indices"]
+        self.idx_to_class = {v: k for k, v in self.class_indices.items()}
+        self.num_clases = len(self.class_indices)
+        return True, "Conectado al servicio", self.num_clases
+
+    def cargar_galeria(self):
+        """Activa el motor de galería de embeddings si está configurado."""
+        self.galeria = None
+        if MOTOR_RECONOCIMIENTO != "galeria":
+            return
+        self.galeria = GaleriaEmbeddings(
+            self.modelo, GALERIA_FILENAME, huella_modelo(MODELO_FILENAME), informar=lambda m: self.log(m, tag="GALERÍA")
+        )
+        personas = self.galeria.personas()
+        self.log(f"Galería de embeddings: {len(personas)} personas, {len(self.galeria.embeddings)} rostros.", tag="GALERÍA")
 
-        modelo_cnn = Sequential([
-            Conv2D(32,(3,3),activation='relu',input_shape=(150,150,3)), MaxPooling2D(2,2),
-            Conv2D(64,(3,3),activation='relu'), MaxPooling2D(2,2),
-            Conv2D(128,(3,3),activation='relu'), MaxPooling2D(2,2),
-            Flatten(),
-            Dense(256, activation='relu', kernel_regularizer=l2(0.001)), Dropout(0.5),
-            Dense(self.num_clases, activation='softmax') 
-        ])
-        modelo_cnn.compile(optimizer='adam', loss='categorical_crossentropy', metrics=['accuracy'])
-        self.modelo = modelo_cnn
-
-        callbacks = [EarlyStopping(patience=50, restore_best_weights=True), ReduceLROnPlateau(factor=0.5, patience=15)]
-        
-        self.log(f"Comenzando entrenamiento con {self.num_clases} clases...", tag="ENTRENANDO")
-        modelo_cnn.fit(train_gen, validation_data=val_gen, epochs=100, callbacks=callbacks, verbose=1)
-        
-        # El UserWarning sobre el formato HDF5 se mantiene (es una advertencia de Keras)
-        modelo_cnn.save(MODELO_FILENAME)
-        with open(CLASSES_FILENAME, 'w') as f:
-            json.dump(self.class_indices, f)
-            
-        return True, "Entrenamiento Completo", self.num_clases
+    def actualizar_cache_predicciones(self, backend=None):
+        """Invalida la caché de predicciones si cambió el modelo, la galería o la configuración."""
+        if self.cache_predicciones is None:
+            return
+        backend = backend or BACKEND_INFERENCIA
+        # Con TFLite o el estudiante, el archivo que decide las predicciones no es el .h5
+        partes = [
+            huella_clasificador(MODELO_FILENAME, backend), MOTOR_RECONOCIMIENTO, backend, DETECTOR_BACKEND,
+            str(UMBRAL_CONF), f"{DECODIFICACION_REDUCIDA}:{LADO_MAX_DETECCION}",
+        ]
+        if self.galeria is not None and os.path.exists(GALERIA_FILENAME):
+            partes.append(huella_modelo(GALERIA_FILENAME))
+        self.cache_predicciones.fijar_modelo("|".join(partes))
 
     # --- Método de Predicción (Core) ---
-    def detectar_y_clasificar(self, img_source):
+    def detectar_y_clasificar(self, img_source, cancelar=None):
         if self.modelo is None:
             return "ERROR", "Modelo no cargado. Presione 'Cargar/Entrenar'.", None
 
-        try:
-            if img_source.startswith("http"):
-                img = cargar_imagen_url(img_source)
-            else:
-                img = plt.imread(img_source)
+        def cancelado():
+            return cancelar is not None and cancelar.is_set()
 
-            img_draw = Image.fromarray(img).convert("RGB")
-            rostros_detectados = []
-            detecciones = detector.detect_faces(img)
+        if self.servicio is not None:
+            return self.detectar_con_servicio(img_source, cancelado)
+
+        try:
+            datos, en_cache = None, None
+            if self.cache_predicciones is not None or DECODIFICACION_REDUCIDA:
+                with LATENCIAS.medir("carga"):
+                    datos = leer_bytes_imagen(img_source)
+            if self.cache_predicciones is not None:
+                en_cache = self.cache_predicciones.obtener(datos)
+
+            with LATENCIAS.medir("decodificacion"):
+                if DECODIFICACION_REDUCIDA:
+                    reducida = cargar_imagen_reducida(img_source, datos=datos)
+                    img = reducida[0]
+                else:
+                    img = cargar_imagen(img_source)
+                img_draw = Image.fromarray(img).convert("RGB")
+            if en_cache is not None:
+                # Misma imagen y mismo modelo: no se repiten detección ni clasificación
+                self.log("Resultado recuperado de la caché de predicciones.", tag="CACHÉ")
+                if len(en_cache) == 0:
+                    return "RESULTADO", "❌ No se detectaron rostros.", img_draw
+                return "OK", en_cache, img_draw
+            if cancelado(): return "CANCELADO", "Análisis cancelado.", None
+
+            with LATENCIAS.medir("deteccion"):
+                if DECODIFICACION_REDUCIDA:
+                    # Las cajas se dibujan sobre la imagen reducida, en sus coordenadas
+                    cajas, _, caras = detectar_rostros_reducido(reducida)
+                else:
+                    cajas, caras = detectar_rostros(img)
+            if cancelado(): return "CANCELADO", "Análisis cancelado.", None
 
-            if len(detecciones) == 0:
+            if len(cajas) == 0:
+                rostros_detectados = []
+            else:
+                rostros_detectados = clasificar_rostros(self.modelo, self.idx_to_class, cajas, caras, self.galeria)
+            if self.cache_predicciones is not None:
+                self.cache_predicciones.guardar(datos, rostros_detectados)
+            if len(rostros_detectados) == 0:
                 return "RESULTADO", "❌ No se detectaron rostros.", img_draw
+            return "OK", rostros_detectados, img_draw
 
-            idx_to_class = {v: k for k, v in self.class_indices.items()}
+        except Exception as e:
+            return "ERROR", f"❌ Error en la clasificación: {e}", None
 
-            for det in detecciones:
-                x1, y1, w, h = det['box']
-                x1, y1 = abs(x1), abs(y1)
-                x2, y2 = x1 + w, y1 + h
-                
-                cara = img[y1:y2, x1:x2]
-                rostro_resized = Image.fromarray(cara).resize((150, 150))
-                img_array = img_to_array(rostro_resized) / 255.0
-                img_array = np.expand_dims(img_array, 0)
-
-                predicciones = self.modelo.predict(img_array, verbose=0)[0]
-                predicted_index = np.argmax(predicciones) 
-                predicted_class_name = idx_to_class.get(predicted_index, "ERROR_CLASE") 
-                confidence = predicciones[predicted_index]
-                
-                # Lógica de UMBRAL (Se mantiene para clasificar final_class)
-                if predicted_class_name != CLASE_NO_FAMILIAR and confidence < UMBRAL_CONF:
-                    final_class = CLASE_NO_FAMILIAR.upper()
-                    log_message = f"CLASE FORZADA: {final_class} | Confianza: {confidence:.4f} (Original: {predicted_class_name.upper()})"
+    def detectar_con_servicio(self, img_source, cancelado):
+        """Igual que detectar_y_clasificar, pero la detección y la clasificación las hace el servicio."""
+        try:
+            with LATENCIAS.medir("carga"):
+                datos = leer_bytes_imagen(img_source)
+            with LATENCIAS.medir("decodificacion"):
+                if DECODIFICACION_REDUCIDA:
+                    img, escala, _, _ = cargar_imagen_reducida(img_source, datos=datos)
                 else:
-                    final_class = predicted_class_name.upper()
-                    log_message = f"CLASE: {final_class} | Confianza: {confidence:.4f}"
-                    
-                rostros_detectados.append({
-                    'box': (x1, y1, x2, y2),
-                    'clase': final_class,
-                    'log': log_message 
-                })
+                    img, escala = cargar_imagen(img_source), 1.0
+                img_draw = Image.fromarray(img).convert("RGB")
+            if cancelado(): return "CANCELADO", "Análisis cancelado.", None
 
+            with LATENCIAS.medir("servicio"):
+                respuesta = self.servicio.reconocer(datos)
+            if respuesta["estado"] == "RESULTADO":
+                return "RESULTADO", "❌ No se detectaron rostros.", img_draw
+            # El servicio devuelve cajas en coordenadas de la imagen original
+            rostros_detectados = [
+                dict(r, box=tuple(int(round(v * escala)) for v in r["box"])) for r in respuesta["rostros"]
+            ]
             return "OK", rostros_detectados, img_draw
-
         except Exception as e:
             return "ERROR", f"❌ Error en la clasificación: {e}", None
 
     # --- Métodos de la UI ---
     
-    def iniciar_modelo(self, load_only):
-        self.log(f"Iniciando en modo: {'Cargar' if load_only else 'Entrenar'}", tag="INICIO")
+    def iniciar_modelo(self, load_only, incremental=False):
+        if self.ejecutor.ocupado():
+            messagebox.showwarning("Advertencia", "Hay una tarea en curso. Espere a que termine o cancélela.")
+            return
+        modo = 'Cargar' if load_only else ('Añadir Persona' if incremental else 'Entrenar')
+        self.log(f"Iniciando en modo: {modo}", tag="INICIO")
+        self.status_label.config(text="Estado: Trabajando...", fg='orange')
         
-        success, message, num_classes = self.cargar_o_entrenar_modelo(load_only)
-        self.num_clases = num_classes
+        self.ejecutor.enviar(
+            lambda cancelar: self.cargar_o_entrenar_modelo(load_only, cancelar, incremental=incremental),
+            al_terminar=self.finalizar_modelo,
+            al_fallar=lambda e: self.finalizar_modelo((False, f"Error inesperado: {e}", 0)),
+        )
+
+    def finalizar_modelo(self, resultado):
+        """Se ejecuta en el hilo de Tk cuando termina la carga o el entrenamiento."""
+        success, message, num_classes = resultado
 
         if success:
+            self.num_clases = num_classes
             self.log(f"Operación Exitosa: {message}. Clases encontradas: {self.num_clases}", tag="ÉXITO")
             self.update_clases_display()
             
@@ -323,36 +1093,29 @@ class DeteccionRostrosApp:
             self.mostrar_logo(self.master.winfo_width()) 
             # ---------------------------
             
+        elif self.ejecutor.cancelado():
+            # Cancelado por el usuario: se mantiene el modelo que hubiera antes
+            self.log(message, tag="CANCELAR")
+            self.update_clases_display()
         else:
             messagebox.showerror("Error de Modelo", message)
             self.log(f"Fallo de Operación: {message}", tag="ERROR")
             self.status_label.config(text="Estado: Error", fg='red')
             
+    def cancelar_tarea(self):
+        if self.ejecutor.cancelar():
+            self.log("Cancelación solicitada. Se detendrá en el siguiente punto de control.", tag="CANCELAR")
+        else:
+            self.log("No hay ninguna tarea en curso.", tag="CANCELAR")
+
     # --- MÉTODO DE AUDIO ASÍNCRONO ---
     def vocalizar_prediccion(self):
-        """Vocaliza el último resultado de la predicción en un hilo separado."""
-        if not self.last_speech_message or not pyttsx3:
+        """Envía el último resultado al hilo de voz (un único motor; lo nuevo sustituye a lo pendiente)."""
+        if not self.last_speech_message:
             self.log("Error: Motor de audio no disponible o mensaje vacío.", tag="ERROR_AUDIO")
             return
-
-        def run_audio(text_to_speak):
-            try:
-                # Inicializar el motor en el hilo local (clave para evitar el bloqueo)
-                local_engine = pyttsx3.init()
-                local_engine.setProperty('rate', 150)
-                
-                local_engine.say(text_to_speak)
-                local_engine.runAndWait() 
-                
-                local_engine.stop()
-                
-                self.log(f"Vocalización completada.", tag="AUDIO")
-            except Exception as e:
-                self.log(f"Error en hilo de audio: {e}. Intente reinstalar pyttsx3 y dependencias.", tag="ERROR_AUDIO")
-        
-        # Iniciar el proceso de audio en un nuevo hilo (pasando el mensaje actual)
         self.log(f"Iniciando vocalización: '{self.last_speech_message}' ", tag="AUDIO")
-        threading.Thread(target=run_audio, args=(self.last_speech_message,)).start()
+        self.voz.decir(self.last_speech_message)
 
 
     def setup_ui(self):
@@ -384,6 +1147,18 @@ class DeteccionRostrosApp:
         btn_load = tk.Button(control_frame, text="2. Solo Cargar Modelo", bg='#2196F3', fg='white', 
                              command=lambda: self.iniciar_modelo(load_only=True))
         btn_load.pack(side='left', padx=5)
+
+        btn_persona = tk.Button(control_frame, text="3. Añadir Persona", bg='#009688', fg='white', 
+                                command=lambda: self.iniciar_modelo(load_only=False, incremental=True))
+        btn_persona.pack(side='left', padx=5)
+
+        btn_cancel = tk.Button(control_frame, text="Cancelar Tarea", bg='#9E9E9E', fg='white', 
+                               command=self.cancelar_tarea)
+        btn_cancel.pack(side='left', padx=5)
+
+        btn_latencias = tk.Button(control_frame, text="Exportar Latencias", bg='#607D8B', fg='white', 
+                                  command=self.exportar_latencias)
+        btn_latencias.pack(side='left', padx=5)
         
         self.status_label = tk.Label(control_frame, text="Estado: No iniciado", fg='red', font=("Helvetica", 10, "bold"))
         self.status_label.pack(side='right', padx=5)
@@ -425,6 +1200,10 @@ class DeteccionRostrosApp:
         btn_analyze.pack(side='left', padx=5)
 
     def log(self, message, tag="INFO"):
+        # Desde hilos de fondo el registro se delega al hilo de Tk
+        if threading.current_thread() is not threading.main_thread():
+            self.ejecutor.en_ui(self.log, message, tag)
+            return
         self.log_text.config(state=tk.NORMAL)
         self.log_text.insert(tk.END, f"[{tag}] {message}\n")
         self.log_text.see(tk.END)
@@ -443,6 +1222,10 @@ class DeteccionRostrosApp:
         self.clases_text.config(state=tk.DISABLED)
 
     def analizar_imagen(self):
+        if self.ejecutor.ocupado():
+            messagebox.showwarning("Advertencia", "Hay una tarea en curso. Espere a que termine o cancélela.")
+            return
+
         self.result_display_label.config(text="")
         self.image_label.config(text="Procesando...")
         
@@ -460,7 +1243,21 @@ class DeteccionRostrosApp:
 
         self.log(f"Iniciando análisis de imagen.", tag="ANÁLISIS")
         
-        status, result, img_pil = self.detectar_y_clasificar(img_source)
+        def trabajo(cancelar):
+            self.tiempos_analisis = LATENCIAS.iniciar_analisis()
+            with LATENCIAS.medir("total"):
+                return self.detectar_y_clasificar(img_source, cancelar)
+
+        self.ejecutor.enviar(trabajo, al_terminar=self.mostrar_analisis)
+
+    def mostrar_analisis(self, resultado):
+        """Se ejecuta en el hilo de Tk con el resultado de detectar_y_clasificar."""
+        status, result, img_pil = resultado
+
+        if status == "CANCELADO":
+            self.log(result, tag="CANCELAR")
+            self.image_label.config(text="Esperando imagen...")
+            return
         
         if status == "ERROR":
             messagebox.showerror("Error de Análisis", result)
@@ -476,23 +1273,46 @@ class DeteccionRostrosApp:
             self.image_label.config(text=result)
             self.result_display_label.config(text="ANÁLISIS COMPLETO", fg='blue')
             self.last_speech_message = result 
-            self.mostrar_imagen_con_detecciones(img_pil, []) 
+            with LATENCIAS.medir("visualizacion", self.tiempos_analisis):
+                self.mostrar_imagen_con_detecciones(img_pil, []) 
             self.vocalizar_prediccion()
             
             # --- MENSAJE FINAL CONSOLIDADO ---
+            self.registrar_latencias()
             self.log("Análisis de imagen concluido.", tag="FINALIZADO")
             return
 
         if status == "OK":
-            self.mostrar_imagen_con_detecciones(img_pil, result)
+            with LATENCIAS.medir("visualizacion", self.tiempos_analisis):
+                self.mostrar_imagen_con_detecciones(img_pil, result)
             self.mostrar_resultados_clasificados(result)
             
             # --- VOCALIZACIÓN AUTOMÁTICA DESPUÉS DE MOSTRAR LA IMAGEN Y RESULTADOS ---
             self.vocalizar_prediccion() 
             
             # --- MENSAJE FINAL CONSOLIDADO ---
+            self.registrar_latencias()
             self.log("Análisis de imagen concluido.", tag="FINALIZADO")
 
+    def registrar_latencias(self):
+        """Muestra en el registro los tiempos del último análisis y los percentiles acumulados."""
+        if not LATENCIAS.activo or not self.tiempos_analisis:
+            return
+        self.log(" | ".join(f"{etapa}: {ms:.0f} ms" for etapa, ms in self.tiempos_analisis.items()), tag="LATENCIA")
+        total = LATENCIAS.percentiles().get("total")
+        if total:
+            self.log(f"Total (últimos {total['n']}): p50 {total['p50']:.0f} ms | p95 {total['p95']:.0f} ms | p99 {total['p99']:.0f} ms", tag="LATENCIA")
+
+    def exportar_latencias(self):
+        if not LATENCIAS.activo:
+            self.log("La medición de latencias está desactivada (MEDIR_LATENCIAS).", tag="LATENCIA")
+            return
+        try:
+            ruta = LATENCIAS.exportar(LATENCIAS_FILENAME)
+            self.log(f"Latencias exportadas a {ruta}", tag="LATENCIA")
+        except OSError as e:
+            self.log(f"No se pudieron exportar las latencias: {e}", tag="ERROR")
+
 
     def mostrar_resultados_clasificados(self, detections):
         CLASE_NO_FAMILIAR = 'NO FAMILIAR'
@@ -0,0 +1,102 @@
+import contextlib
+import json
+import threading
+import time
+from collections import deque
+import numpy as np
+
+# ===============================================================
+# --- LATENCIA POR ETAPA ---
+# ===============================================================
+# medir("deteccion") cronometra un bloque y guarda la muestra en una ventana móvil
+# por etapa (percentiles p50/p95/p99). Además, el hilo que llamó a iniciar_analisis()
+# acumula los tiempos de su análisis actual para mostrarlos en el registro de Tk.
+# Desactivado, medir() devuelve un contexto vacío compartido: sin reloj ni bloqueo.
+
+LATENCIAS_FILENAME = "latencias.json"
+_NULO = contextlib.nullcontext()
+
+
+class _Cronometro:
+    __slots__ = ("registro", "etapa", "destino", "inicio")
+
+    def __init__(self, registro, etapa, destino):
+        self.registro, self.etapa, self.destino = registro, etapa, destino
+
+    def __enter__(self):
+        self.inicio = time.perf_counter()
+
+    def __exit__(self, *exc):
+        ms = (time.perf_counter() - self.inicio) * 1000
+        self.registro.registrar(self.etapa, ms, self.destino)
+        return False
+
+
+class RegistroLatencias:
+    def __init__(self, ventana=1000, activo=True):
+        self.ventana = ventana
+        self.activo = activo
+        self.lock = threading.Lock()
+        self._muestras = {}
+        self._local = threading.local()
+
+    def iniciar_analisis(self):
+        """Empieza a acumular los tiempos del análisis en curso en este hilo y los devuelve."""
+        self._local.tiempos = {}
+        return self._local.tiempos
+
+    def medir(self, etapa, destino=None):
+        if not self.activo:
+            return _NULO
+        return _Cronometro(self, etapa, destino)
+
+    def registrar(self, etapa, ms, destino=None):
+        with self.lock:
+            if etapa not in self._muestras:
+                self._muestras[etapa] = deque(maxlen=self.ventana)
+            self._muestras[etapa].append(ms)
+        if destino is None:
+            destino = getattr(self._local, "tiempos", None)
+        if destino is not None:
+            destino[etapa] = destino.get(etapa, 0.0) + ms
+
+    def percentiles(self):
+        """{etapa: {'n', 'p50', 'p95', 'p99'}} en milisegundos sobre la ventana móvil."""
+        with self.lock:
+            muestras = {etapa: np.array(m) for etapa, m in self._muestras.items() if m}
+        resumen = {}
+        for etapa, m in muestras.items():
+            p50, p95, p99 = np.percentile(m, [50, 95, 99])
+            resumen[etapa] = {"n": len(m), "p50": round(p50, 2), "p95": round(p95, 2), "p99": round(p99, 2)}
+        return resumen
+
+    def exportar(self, ruta=LATENCIAS_FILENAME):
+        with self.lock:
+            muestras = {etapa: [round(v, 3) for v in m] for etapa, m in self._muestras.items()}
+        with open(ruta, 'w', encoding='utf-8') as f:
+            json.dump({"percentiles_ms": self.percentiles(), "muestras_ms": muestras}, f, ensure_ascii=False, indent=2)
+        return ruta
+
+    def limpiar(self):
+        with self.lock:
+            self._muestras.clear()
+
+
+# Registro compartido por la aplicación, el servicio y los scripts
+LATENCIAS = RegistroLatencias()
+
+
+# ===============================================================
+# --- INFORMES JSON DE LOS BENCHMARKS ---
+# ===============================================================
+
+def anadir_argumento_salida(parser):
+    parser.add_argument("--salida", help="Archivo JSON donde guardar el informe")
+
+def guardar_informe(informe, salida=None):
+    """Imprime el informe en JSON y, si se indica `salida`, lo guarda también en ese archivo."""
+    texto = json.dumps(informe, ensure_ascii=False, indent=2)
+    print(texto)
+    if salida:
+        with open(salida, 'w', encoding='utf-8') as f:
+            f.write(texto)
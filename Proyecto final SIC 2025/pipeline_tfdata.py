@@ -0,0 +1,115 @@
+import numpy as np
+import time
+import argparse
+import json
+
+from almacen_rostros import _listar_recortes, dividir_validacion, TAM_ROSTRO
+
+# ===============================================================
+# --- PIPELINE tf.data PARA ENTRENAMIENTO ---
+# ===============================================================
+# Sustituto de train_gen/val_gen (ImageDataGenerator.flow_from_directory):
+#   lectura + decodificación en paralelo -> caché en memoria (uint8) -> barajado
+#   -> lotes -> aumento vectorizado en paralelo (solo entrenamiento) -> prefetch.
+# Los lotes de validación viajan en uint8; el escalado a [0, 1] está en el modelo.
+# La validación no lleva aumento de datos.
+# tf.io.decode_image no lee TIFF ni PPM (sí los acepta EXTENSIONES_VALIDAS, como
+# flow_from_directory): esos recortes se decodifican con PIL dentro del mismo map.
+
+EXTENSIONES_TF = ('.png', '.jpg', '.jpeg', '.bmp')
+
+
+def _capa_aumento(rotacion_grados=20, zoom=0.2, volteo=True):
+    """Mismo aumento que el ImageDataGenerator original (rotación, zoom, volteo horizontal)."""
+    from tensorflow.keras import Sequential, layers
+    capas = []
+    if volteo:
+        capas.append(layers.RandomFlip("horizontal"))
+    if rotacion_grados:
+        capas.append(layers.RandomRotation(rotacion_grados / 360.0, fill_mode="nearest"))
+    if zoom:
+        capas.append(layers.RandomZoom((-zoom, zoom), fill_mode="nearest"))
+    return Sequential(capas)
+
+def _decodificar_pil(ruta):
+    from PIL import Image
+    return np.asarray(Image.open(ruta.decode('utf-8')).convert('RGB'), dtype=np.uint8)
+
+def _dataset_desde_archivos(rutas, etiquetas, num_clases, batch_size, aumento=None, barajar=False):
+    import tensorflow as tf
+    AUTOTUNE = tf.data.AUTOTUNE
+
+    def decodificar(ruta, nativa, etiqueta):
+        img = tf.cond(
+            nativa,
+            lambda: tf.io.decode_image(tf.io.read_file(ruta), channels=3, expand_animations=False),
+            lambda: tf.ensure_shape(tf.numpy_function(_decodificar_pil, [ruta], tf.uint8), [None, None, 3]),
+        )
+        img = tf.image.resize(img, (TAM_ROSTRO, TAM_ROSTRO), method="nearest")
+        return tf.cast(img, tf.uint8), tf.one_hot(etiqueta, num_clases)
+
+    nativas = np.array([ruta.lower().endswith(EXTENSIONES_TF) for ruta in rutas], dtype=bool)
+    ds = tf.data.Dataset.from_tensor_slices((rutas, nativas, etiquetas))
+    # Se guarda en caché la imagen decodificada en uint8 (4 veces menos memoria que float32)
+    ds = ds.map(decodificar, num_parallel_calls=AUTOTUNE).cache()
+    if barajar:
+        ds = ds.shuffle(len(rutas), reshuffle_each_iteration=True)
+    ds = ds.batch(batch_size)
+    # Sin escalar: el modelo recibe 0-255 y escala en su grafo. Solo el aumento necesita float
+    if aumento is not None:
+        ds = ds.map(lambda x, y: (aumento(tf.cast(x, tf.float32), training=True), y), num_parallel_calls=AUTOTUNE)
+    return ds.prefetch(AUTOTUNE)
+
+
+def crear_datasets_tf(dataset_dir, batch_size=32, validation_split=0.2, aumentos=None):
+    """Devuelve (train_ds, val_ds, class_indices, num_train) con el mismo reparto
+    entrenamiento/validación que flow_from_directory(subset=...)."""
+    aumentos = aumentos if aumentos is not None else dict(rotation_range=20, zoom_range=0.2, horizontal_flip=True)
+    clases, archivos = _listar_recortes(dataset_dir)
+    class_indices = {clase: i for i, clase in enumerate(clases)}
+    rutas = np.array([ruta for _, ruta in archivos])
+    etiquetas = np.array([class_indices[clase] for clase, _ in archivos], dtype=np.int32)
+    train_idx, val_idx = dividir_validacion(etiquetas, validation_split)
+
+    aumento = _capa_aumento(aumentos.get("rotation_range", 0), aumentos.get("zoom_range", 0), aumentos.get("horizontal_flip", False))
+    train_ds = _dataset_desde_archivos(rutas[train_idx], etiquetas[train_idx], len(clases), batch_size, aumento, barajar=True)
+    val_ds = _dataset_desde_archivos(rutas[val_idx], etiquetas[val_idx], len(clases), batch_size)
+    return train_ds, val_ds, class_indices, len(train_idx)
+
+
+# ===============================================================
+# --- COMPARACIÓN: imágenes/s del pipeline de entrada ---
+# ===============================================================
+
+def _imagenes_por_segundo(iterable, pasos):
+    n = 0
+    inicio = time.perf_counter()
+    for i, (x, _) in enumerate(iterable):
+        if i >= pasos:
+            break
+        n += len(x)
+    return n / (time.perf_counter() - inicio)
+
+def comparar_con_generador(dataset_dir, epocas=2, batch_size=32):
+    """Mide solo la entrada (sin entrenar): ImageDataGenerator vs tf.data, época a época."""
+    from tensorflow.keras.preprocessing.image import ImageDataGenerator
+
+    datagen = ImageDataGenerator(rotation_range=20, zoom_range=0.2, horizontal_flip=True, validation_split=0.2)
+    train_gen = datagen.flow_from_directory(
+        dataset_dir, target_size=(TAM_ROSTRO, TAM_ROSTRO), batch_size=batch_size, class_mode='categorical', subset="training"
+    )
+    pasos = len(train_gen)
+    generador = [round(_imagenes_por_segundo(train_gen, pasos), 1) for _ in range(epocas)]
+
+    train_ds, _, _, _ = crear_datasets_tf(dataset_dir, batch_size)
+    # La primera época de tf.data incluye decodificar y llenar la caché
+    tfdata = [round(_imagenes_por_segundo(train_ds, pasos), 1) for _ in range(epocas)]
+    return {"imagenes_por_s_generador": generador, "imagenes_por_s_tfdata": tfdata}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Imágenes/s: ImageDataGenerator vs pipeline tf.data.")
+    parser.add_argument("--dataset", default="./dataset_rostros/")
+    parser.add_argument("--epocas", type=int, default=2)
+    args = parser.parse_args()
+    print(json.dumps(comparar_con_generador(args.dataset, args.epocas), ensure_ascii=False, indent=2))
@@ -0,0 +1,237 @@
+import argparse
+import glob
+import json
+import os
+import queue
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from main import (
+    cargar_modelo_entrenado, cargar_imagen, detectar_rostros, clasificar_rostros, huella_modelo,
+    cargar_imagen_reducida, detectar_rostros_reducido, leer_bytes_imagen,
+    MODELO_FILENAME, CLASSES_FILENAME, MOTOR_RECONOCIMIENTO, BACKEND_INFERENCIA, DECODIFICACION_REDUCIDA,
+)
+from galeria_embeddings import GaleriaEmbeddings, GALERIA_FILENAME
+
+# ===============================================================
+# --- RECONOCIMIENTO POR LOTES (sin Tkinter) ---
+# ===============================================================
+# Tres etapas solapadas conectadas por colas acotadas:
+#   carga/decodificación (varios hilos) -> detección MTCNN -> clasificación CNN
+# Cada imagen produce una línea JSON con cajas, clase, confianza y tiempos por etapa.
+# Con --servicio no se carga ningún modelo: las imágenes se envían a servicio_reconocimiento.py,
+# que agrupa en micro-lotes los rostros de las peticiones concurrentes.
+
+EXTENSIONES_IMAGEN = (".jpg", ".jpeg", ".png", ".bmp", ".gif", ".webp")
+_FIN = object()
+
+
+def listar_fuentes(entrada):
+    """Acepta un directorio, un archivo .txt con una ruta/URL por línea, o un patrón glob."""
+    if os.path.isdir(entrada):
+        fuentes = []
+        for raiz, _, archivos in os.walk(entrada):
+            fuentes.extend(os.path.join(raiz, a) for a in archivos if a.lower().endswith(EXTENSIONES_IMAGEN))
+        return sorted(fuentes)
+    if os.path.isfile(entrada) and entrada.lower().endswith(".txt"):
+        with open(entrada, 'r', encoding='utf-8') as f:
+            return [linea.strip() for linea in f if linea.strip() and not linea.startswith("#")]
+    return sorted(glob.glob(entrada, recursive=True))
+
+
+def _ms(inicio):
+    return round((time.perf_counter() - inicio) * 1000, 2)
+
+def _etapa_carga(fuentes_q, salida_q):
+    while True:
+        item = fuentes_q.get()
+        if item is _FIN:
+            salida_q.put(_FIN)
+            return
+        indice, fuente = item
+        r = {"indice": indice, "fuente": fuente, "img": None, "error": None, "tiempos_ms": {}}
+        inicio = time.perf_counter()
+        try:
+            r["img"] = cargar_imagen_reducida(fuente) if DECODIFICACION_REDUCIDA else cargar_imagen(fuente)
+        except Exception as e:
+            r["error"] = f"❌ Error cargando imagen: {e}"
+        r["tiempos_ms"]["carga"] = _ms(inicio)
+        salida_q.put(r)
+
+def _etapa_deteccion(entrada_q, salida_q, num_cargadores):
+    fines = 0
+    while fines < num_cargadores:
+        r = entrada_q.get()
+        if r is _FIN:
+            fines += 1
+            continue
+        if r["error"] is None:
+            inicio = time.perf_counter()
+            try:
+                if DECODIFICACION_REDUCIDA:
+                    # En el JSON se informan las cajas en coordenadas de la imagen original
+                    _, cajas, caras = detectar_rostros_reducido(r["img"])
+                else:
+                    cajas, caras = detectar_rostros(r["img"])
+                # Copias de los recortes: así la imagen completa se libera antes de clasificar
+                r["cajas"], r["caras"] = cajas, [cara.copy() for cara in caras]
+            except Exception as e:
+                r["error"] = f"❌ Error en la detección: {e}"
+            r["tiempos_ms"]["deteccion"] = _ms(inicio)
+        r["img"] = None
+        salida_q.put(r)
+    salida_q.put(_FIN)
+
+def _etapa_clasificacion(entrada_q, modelo, idx_to_class, galeria, escribir, max_lote):
+    """Agrupa los rostros de las imágenes ya detectadas (hasta max_lote imágenes) en una sola pasada."""
+    terminado = False
+    while not terminado:
+        pendientes = [entrada_q.get()]
+        while len(pendientes) < max_lote:
+            try:
+                pendientes.append(entrada_q.get_nowait())
+            except queue.Empty:
+                break
+        validos = [r for r in pendientes if r is not _FIN]
+        terminado = len(validos) != len(pendientes)
+
+        con_rostros = [r for r in validos if r["error"] is None and r.get("cajas")]
+        if con_rostros:
+            cajas = [caja for r in con_rostros for caja in r["cajas"]]
+            caras = [cara for r in con_rostros for cara in r["caras"]]
+            inicio = time.perf_counter()
+            try:
+                detecciones = clasificar_rostros(modelo, idx_to_class, cajas, caras, galeria)
+            except Exception as e:
+                detecciones = None
+                for r in con_rostros:
+                    r["error"] = f"❌ Error en la clasificación: {e}"
+            total_ms = _ms(inicio)
+            pos = 0
+            for r in con_rostros:
+                n = len(r["cajas"])
+                if detecciones is not None:
+                    r["rostros"] = detecciones[pos:pos + n]
+                # Tiempo del lote repartido según el número de rostros de cada imagen
+                r["tiempos_ms"]["clasificacion"] = round(total_ms * n / len(cajas), 2)
+                pos += n
+
+        for r in validos:
+            escribir(_a_json(r))
+
+def _a_json(r):
+    if r["error"] is not None:
+        estado = "ERROR"
+    elif not r.get("cajas"):
+        estado = "RESULTADO"
+    else:
+        estado = "OK"
+    salida = {"indice": r["indice"], "fuente": r["fuente"], "estado": estado, "rostros": [], "tiempos_ms": r["tiempos_ms"]}
+    if estado == "ERROR":
+        salida["error"] = r["error"]
+    for det in r.get("rostros", []):
+        salida["rostros"].append({
+            "box": [int(v) for v in det["box"]],
+            "clase": det["clase"],
+            "confianza": round(det["confianza"], 4),
+        })
+    return json.dumps(salida, ensure_ascii=False)
+
+
+def ejecutar_lote(entrada, salida=None, cargadores=4, tam_cola=32, max_lote=8):
+    fuentes = listar_fuentes(entrada)
+    if not fuentes:
+        print(f"❌ No se encontraron imágenes en '{entrada}'.", file=sys.stderr)
+        return 0
+
+    modelo, class_indices = cargar_modelo_entrenado(MODELO_FILENAME, CLASSES_FILENAME, BACKEND_INFERENCIA)
+    idx_to_class = {v: k for k, v in class_indices.items()}
+    galeria = None
+    if MOTOR_RECONOCIMIENTO == "galeria":
+        galeria = GaleriaEmbeddings(modelo, GALERIA_FILENAME, huella_modelo(MODELO_FILENAME))
+
+    fuentes_q = queue.Queue()
+    for item in enumerate(fuentes):
+        fuentes_q.put(item)
+    for _ in range(cargadores):
+        fuentes_q.put(_FIN)
+    cargadas_q = queue.Queue(maxsize=tam_cola)
+    detectadas_q = queue.Queue(maxsize=tam_cola)
+
+    hilos = [threading.Thread(target=_etapa_carga, args=(fuentes_q, cargadas_q), daemon=True) for _ in range(cargadores)]
+    hilos.append(threading.Thread(target=_etapa_deteccion, args=(cargadas_q, detectadas_q, cargadores), daemon=True))
+    for hilo in hilos:
+        hilo.start()
+
+    archivo = open(salida, 'w', encoding='utf-8') if salida else sys.stdout
+    inicio = time.perf_counter()
+    try:
+        def escribir(linea):
+            archivo.write(linea + "\n")
+            archivo.flush()
+        _etapa_clasificacion(detectadas_q, modelo, idx_to_class, galeria, escribir, max_lote)
+    finally:
+        if salida:
+            archivo.close()
+
+    segundos = time.perf_counter() - inicio
+    print(f"[LOTE] {len(fuentes)} imágenes en {segundos:.1f}s ({len(fuentes) / segundos:.2f} img/s)", file=sys.stderr)
+    return len(fuentes)
+
+
+def ejecutar_lote_servicio(entrada, url, salida=None, concurrentes=8):
+    from cliente_servicio import ClienteServicio
+
+    fuentes = listar_fuentes(entrada)
+    if not fuentes:
+        print(f"❌ No se encontraron imágenes en '{entrada}'.", file=sys.stderr)
+        return 0
+    cliente = ClienteServicio(url)
+
+    def procesar(item):
+        indice, fuente = item
+        r = {"indice": indice, "fuente": fuente, "error": None, "tiempos_ms": {}}
+        inicio = time.perf_counter()
+        try:
+            datos = leer_bytes_imagen(fuente)
+            r["tiempos_ms"]["carga"] = _ms(inicio)
+            respuesta = cliente.reconocer(datos)
+            r["tiempos_ms"].update(respuesta["tiempos_ms"])
+            r["cajas"] = r["rostros"] = respuesta["rostros"]
+        except Exception as e:
+            r["error"] = f"❌ Error en el servicio: {e}"
+        r["tiempos_ms"]["total"] = _ms(inicio)
+        return _a_json(r)
+
+    archivo = open(salida, 'w', encoding='utf-8') if salida else sys.stdout
+    inicio = time.perf_counter()
+    try:
+        with ThreadPoolExecutor(max_workers=concurrentes) as pool:
+            for linea in pool.map(procesar, enumerate(fuentes)):
+                archivo.write(linea + "\n")
+                archivo.flush()
+    finally:
+        if salida:
+            archivo.close()
+
+    segundos = time.perf_counter() - inicio
+    print(f"[LOTE] {len(fuentes)} imágenes en {segundos:.1f}s ({len(fuentes) / segundos:.2f} img/s) vía {url}", file=sys.stderr)
+    return len(fuentes)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Reconocimiento de rostros por lotes (salida JSONL).")
+    parser.add_argument("entrada", help="Directorio, patrón glob o archivo .txt con rutas/URLs")
+    parser.add_argument("-o", "--salida", help="Archivo JSONL de salida (por defecto, salida estándar)")
+    parser.add_argument("--cargadores", type=int, default=4, help="Hilos de carga/decodificación")
+    parser.add_argument("--cola", type=int, default=32, help="Tamaño máximo de cada cola entre etapas")
+    parser.add_argument("--max-lote", type=int, default=8, help="Imágenes agrupadas por pasada del modelo")
+    parser.add_argument("--servicio", help="URL de servicio_reconocimiento.py (p. ej. http://127.0.0.1:8765)")
+    args = parser.parse_args()
+    if args.servicio:
+        # Peticiones concurrentes: tantas como hilos de carga
+        ejecutar_lote_servicio(args.entrada, args.servicio, args.salida, args.cargadores)
+    else:
+        ejecutar_lote(args.entrada, args.salida, args.cargadores, args.cola, args.max_lote)
@@ -0,0 +1,167 @@
+import argparse
+import json
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from io import BytesIO
+import numpy as np
+from PIL import Image
+
+from main import (
+    cargar_modelo_entrenado, detectar_rostros, clasificar_rostros, huella_modelo,
+    cargar_imagen_reducida, detectar_rostros_reducido,
+    MODELO_FILENAME, CLASSES_FILENAME, MOTOR_RECONOCIMIENTO, BACKEND_INFERENCIA, DECODIFICACION_REDUCIDA,
+)
+from galeria_embeddings import GaleriaEmbeddings, GALERIA_FILENAME
+
+# ===============================================================
+# --- SERVICIO LOCAL DE RECONOCIMIENTO ---
+# ===============================================================
+# Mantiene el modelo y el detector cargados en un único proceso y atiende peticiones HTTP:
+#   GET  /estado     -> clases del modelo y configuración
+#   POST /reconocer  -> cuerpo: bytes de la imagen; respuesta: JSON con rostros y tiempos
+#   POST /recargar   -> vuelve a leer el modelo del disco (tras entrenar)
+# La detección se hace en el hilo de cada petición; los recortes de peticiones simultáneas
+# se agrupan durante una ventana corta (VENTANA_MS) y se clasifican en una sola pasada.
+# La aplicación Tk (SERVICIO_URL en main.py) y reconocimiento_lote.py (--servicio)
+# pueden usarlo como clientes ligeros (cliente_servicio.py), sin cargar TensorFlow.
+
+PUERTO = 8765
+VENTANA_MS = 10
+MAX_ROSTROS_LOTE = 64
+
+
+class AgrupadorClasificacion:
+    """Reúne los rostros de varias peticiones y los clasifica juntos (micro-lotes)."""
+
+    def __init__(self, ventana_ms=VENTANA_MS, max_rostros=MAX_ROSTROS_LOTE):
+        self.ventana = ventana_ms / 1000
+        self.max_rostros = max_rostros
+        self._cola = queue.Queue()
+        self.lock = threading.Lock()
+        self.cargar()
+        threading.Thread(target=self._bucle, daemon=True).start()
+
+    def cargar(self):
+        modelo, class_indices = cargar_modelo_entrenado(MODELO_FILENAME, CLASSES_FILENAME, BACKEND_INFERENCIA)
+        galeria = None
+        if MOTOR_RECONOCIMIENTO == "galeria":
+            galeria = GaleriaEmbeddings(modelo, GALERIA_FILENAME, huella_modelo(MODELO_FILENAME))
+        with self.lock:
+            self.modelo, self.galeria = modelo, galeria
+            self.class_indices = class_indices
+            self.idx_to_class = {v: k for k, v in class_indices.items()}
+            self.huella = huella_modelo(MODELO_FILENAME)
+
+    def clasificar(self, cajas, caras):
+        """Bloquea hasta que el lote que incluye estos rostros se haya clasificado."""
+        futuro = Future()
+        self._cola.put((cajas, caras, futuro))
+        return futuro.result()
+
+    def _bucle(self):
+        while True:
+            pendientes = [self._cola.get()]
+            n = len(pendientes[0][1])
+            limite = time.perf_counter() + self.ventana
+            while n < self.max_rostros:
+                restante = limite - time.perf_counter()
+                if restante <= 0:
+                    break
+                try:
+                    pendientes.append(self._cola.get(timeout=restante))
+                except queue.Empty:
+                    break
+                n += len(pendientes[-1][1])
+
+            cajas = [caja for p in pendientes for caja in p[0]]
+            caras = [cara for p in pendientes for cara in p[1]]
+            try:
+                with self.lock:
+                    detecciones = clasificar_rostros(self.modelo, self.idx_to_class, cajas, caras, self.galeria)
+            except Exception as e:
+                for _, _, futuro in pendientes:
+                    futuro.set_exception(e)
+                continue
+            pos = 0
+            for p_cajas, _, futuro in pendientes:
+                futuro.set_result(detecciones[pos:pos + len(p_cajas)])
+                pos += len(p_cajas)
+
+
+def reconocer_bytes(agrupador, datos):
+    """Detecta y clasifica una imagen. Las cajas se devuelven en coordenadas de la imagen original."""
+    tiempos = {}
+    inicio = time.perf_counter()
+    if DECODIFICACION_REDUCIDA:
+        _, cajas, caras = detectar_rostros_reducido(cargar_imagen_reducida("", datos=datos))
+    else:
+        cajas, caras = detectar_rostros(np.array(Image.open(BytesIO(datos)).convert('RGB')))
+    tiempos["deteccion"] = round((time.perf_counter() - inicio) * 1000, 2)
+    if not cajas:
+        return {"estado": "RESULTADO", "rostros": [], "tiempos_ms": tiempos}
+
+    inicio = time.perf_counter()
+    detecciones = agrupador.clasificar(cajas, caras)
+    tiempos["clasificacion"] = round((time.perf_counter() - inicio) * 1000, 2)
+    rostros = [
+        {"box": [int(v) for v in d["box"]], "clase": d["clase"], "confianza": round(d["confianza"], 4), "log": d["log"]}
+        for d in detecciones
+    ]
+    return {"estado": "OK", "rostros": rostros, "tiempos_ms": tiempos}
+
+
+def crear_servidor(agrupador, host="127.0.0.1", puerto=PUERTO):
+    class Manejador(BaseHTTPRequestHandler):
+        def _responder(self, codigo, cuerpo):
+            datos = json.dumps(cuerpo, ensure_ascii=False).encode('utf-8')
+            self.send_response(codigo)
+            self.send_header("Content-Type", "application/json; charset=utf-8")
+            self.send_header("Content-Length", str(len(datos)))
+            self.end_headers()
+            self.wfile.write(datos)
+
+        def do_GET(self):
+            if self.path != "/estado":
+                return self._responder(404, {"error": "Ruta desconocida"})
+            self._responder(200, {
+                "class_indices": agrupador.class_indices, "huella_modelo": agrupador.huella,
+                "motor": MOTOR_RECONOCIMIENTO, "backend": BACKEND_INFERENCIA,
+            })
+
+        def do_POST(self):
+            try:
+                if self.path == "/reconocer":
+                    datos = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                    self._responder(200, reconocer_bytes(agrupador, datos))
+                elif self.path == "/recargar":
+                    agrupador.cargar()
+                    self._responder(200, {"huella_modelo": agrupador.huella})
+                else:
+                    self._responder(404, {"error": "Ruta desconocida"})
+            except Exception as e:
+                self._responder(500, {"estado": "ERROR", "error": f"❌ Error en el servicio: {e}"})
+
+        def log_message(self, formato, *args):
+            pass
+
+    return ThreadingHTTPServer((host, puerto), Manejador)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Servicio local de reconocimiento con micro-lotes.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--puerto", type=int, default=PUERTO)
+    parser.add_argument("--ventana-ms", type=float, default=VENTANA_MS, help="Espera máxima para agrupar rostros")
+    parser.add_argument("--max-rostros", type=int, default=MAX_ROSTROS_LOTE)
+    args = parser.parse_args()
+
+    agrupador = AgrupadorClasificacion(args.ventana_ms, args.max_rostros)
+    servidor = crear_servidor(agrupador, args.host, args.puerto)
+    print(f"[SERVICIO] Escuchando en http://{args.host}:{args.puerto} ({len(agrupador.class_indices)} clases)")
+    try:
+        servidor.serve_forever()
+    except KeyboardInterrupt:
+        servidor.server_close()
@@ -0,0 +1,169 @@
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+from collections import OrderedDict
+
+from descarga_imagenes import CacheDisco
+
+# ===============================================================
+# --- VOZ (un único motor pyttsx3 en un hilo permanente) ---
+# ===============================================================
+# Todo el audio pasa por un solo hilo que crea el motor una vez y lo reutiliza:
+# nunca hay dos motores a la vez. Solo se guarda el último mensaje pendiente; si llega
+# uno nuevo mientras se habla, el actual se interrumpe en la siguiente palabra.
+# Los mensajes que se repiten se sintetizan a WAV una vez (.cache_voz/, con expulsión LRU
+# por tamaño) y luego se reproducen en segundo plano, sin pasar por el sintetizador;
+# un mensaje nuevo corta el clip que esté sonando.
+
+CACHE_VOZ_DIR = ".cache_voz"
+CACHE_VOZ_MAX_BYTES = 20 * 1024 * 1024
+VELOCIDAD = 150
+MENSAJES_FRECUENTES = ("❌ No se detectaron rostros.",)
+REPETICIONES_PARA_CACHE = 2
+MAX_MENSAJES_CONTADOS = 256
+
+
+def _reproductor_wav():
+    """(reproducir(ruta), detener(reproduccion)) con lo que haya en el sistema, o None.
+    reproducir no bloquea: devuelve la reproducción en curso para poder cortarla."""
+    if sys.platform == "win32":
+        import winsound
+        def reproducir(ruta):
+            winsound.PlaySound(ruta, winsound.SND_FILENAME | winsound.SND_ASYNC)
+            return ruta
+        return reproducir, lambda _: winsound.PlaySound(None, 0)
+    programa = shutil.which("afplay") or shutil.which("aplay") or shutil.which("paplay")
+    if programa is None:
+        return None
+    def detener(proceso):
+        if proceso.poll() is None:
+            proceso.terminate()
+    return (
+        lambda ruta: subprocess.Popen([programa, ruta], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL),
+        detener,
+    )
+
+
+class TrabajadorVoz:
+    def __init__(self, informar=print, cache_dir=CACHE_VOZ_DIR, velocidad=VELOCIDAD):
+        self.informar = informar
+        self.cache_dir = cache_dir
+        self.velocidad = velocidad
+        self._cond = threading.Condition()
+        self._pendiente = None
+        self._hilo = None
+        self._motor = None
+        self._conexion = None
+        # Solo se cuentan los últimos mensajes distintos: los más antiguos se olvidan
+        self._repeticiones = OrderedDict()
+        self._reproductor = _reproductor_wav()
+        self._reproduccion = None
+        self._cache = None
+
+    def iniciar(self):
+        """Arranca el hilo de voz (y el motor) si aún no está en marcha."""
+        with self._cond:
+            if self._hilo is None:
+                self._hilo = threading.Thread(target=self._bucle, daemon=True)
+                self._hilo.start()
+
+    def decir(self, texto):
+        """Encola el mensaje; sustituye a cualquier mensaje que aún no se haya dicho."""
+        self.iniciar()
+        with self._cond:
+            self._pendiente = texto
+            self._cond.notify()
+
+    def _clave_cache(self, texto):
+        return f"{self.velocidad}|{texto}"
+
+    def _contar(self, texto):
+        """Suma una repetición del mensaje y devuelve cuántas lleva."""
+        n = self._repeticiones.pop(texto, 0) + 1
+        self._repeticiones[texto] = n
+        if len(self._repeticiones) > MAX_MENSAJES_CONTADOS:
+            self._repeticiones.popitem(last=False)
+        return n
+
+    def _hay_pendiente(self):
+        return self._pendiente is not None
+
+    def _al_empezar_palabra(self, name, location, length):
+        # Un resultado más reciente deja obsoleto el mensaje que se está diciendo
+        if self._hay_pendiente():
+            self._motor.stop()
+
+    def _bucle(self):
+        try:
+            import pyttsx3
+            self._motor = pyttsx3.init()
+            self._motor.setProperty('rate', self.velocidad)
+            self._conexion = self._motor.connect('started-word', self._al_empezar_palabra)
+        except Exception as e:
+            self.informar(f"Error al iniciar el motor de audio: {e}. Intente reinstalar pyttsx3 y dependencias.", "ERROR_AUDIO")
+            return
+        if self._reproductor is not None:
+            self._cache = CacheDisco(self.cache_dir, CACHE_VOZ_MAX_BYTES)
+        self._precalcular(MENSAJES_FRECUENTES)
+
+        while True:
+            with self._cond:
+                while self._pendiente is None:
+                    self._cond.wait()
+                texto, self._pendiente = self._pendiente, None
+            try:
+                self._hablar(texto)
+                self.informar("Vocalización completada.", "AUDIO")
+                if self._contar(texto) >= REPETICIONES_PARA_CACHE and not self._hay_pendiente():
+                    self._precalcular((texto,))
+            except Exception as e:
+                self.informar(f"Error en hilo de audio: {e}.", "ERROR_AUDIO")
+
+    def _detener_reproduccion(self):
+        if self._reproduccion is not None:
+            self._reproductor[1](self._reproduccion)
+            self._reproduccion = None
+
+    def _hablar(self, texto):
+        # El clip anterior puede seguir sonando en segundo plano: el mensaje nuevo lo sustituye
+        self._detener_reproduccion()
+        ruta = self._cache.ruta_existente("voz", self._clave_cache(texto)) if self._cache is not None else None
+        if ruta is not None:
+            self._reproduccion = self._reproductor[0](ruta)
+            return
+        self._motor.say(texto)
+        self._motor.runAndWait()
+
+    def _precalcular(self, textos):
+        """Sintetiza a WAV los mensajes indicados que aún no estén en caché."""
+        if self._cache is None:
+            return
+        # Al sintetizar a archivo no se interrumpe: un WAV a medias no sirve de caché
+        self._motor.disconnect(self._conexion)
+        try:
+            self._sintetizar(textos)
+        finally:
+            self._conexion = self._motor.connect('started-word', self._al_empezar_palabra)
+
+    def _sintetizar(self, textos):
+        for texto in textos:
+            clave = self._clave_cache(texto)
+            if self._cache.ruta_existente("voz", clave) is not None or self._hay_pendiente():
+                continue
+            # Se sintetiza fuera de la caché: un WAV a medio escribir nunca cuenta ni se reproduce
+            descriptor, tmp = tempfile.mkstemp(suffix=".wav")
+            os.close(descriptor)
+            try:
+                self._motor.save_to_file(texto, tmp)
+                self._motor.runAndWait()
+                with open(tmp, 'rb') as f:
+                    datos = f.read()
+                if datos:
+                    self._cache.escribir("voz", clave, datos)
+            except Exception:
+                pass
+            finally:
+                os.remove(tmp)